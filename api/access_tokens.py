@@ -0,0 +1,177 @@
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+import jwt
+from django.conf import settings
+from django.utils import timezone
+from .models import AuthToken, RevokedAccessToken
+import logging
+
+logger = logging.getLogger(__name__)
+
+ALGORITHM = 'HS256'
+
+
+def access_token_lifetime():
+    return getattr(settings, 'ACCESS_TOKEN_LIFETIME', 300)
+
+
+def issue_access_token(company, token_obj):
+    """
+    Sign a short-lived access token for a refresh token (an AuthToken).
+
+    The refresh token's id travels in the jti claim, so revoking it revokes
+    every access token issued from it.
+    """
+    now = int(time.time())
+    expires_at = now + access_token_lifetime()
+    claims = {
+        'sub': str(token_obj.user_id),
+        'cid': str(company.id),
+        'jti': str(token_obj.id),
+        'iat': now,
+        'exp': expires_at,
+    }
+    access_token = jwt.encode(claims, company.jwt_signing_key, algorithm=ALGORITHM)
+    return access_token, datetime.fromtimestamp(expires_at, dt_timezone.utc)
+
+
+def decode_access_token(company, access_token):
+    """Verify an access token's signature, expiry and company, raising jwt.InvalidTokenError"""
+    claims = jwt.decode(
+        access_token,
+        company.jwt_signing_key,
+        algorithms=[ALGORITHM],
+        options={'require': ['sub', 'cid', 'jti', 'exp']},
+    )
+    if claims['cid'] != str(company.id):
+        raise jwt.InvalidTokenError('Access token was issued for another company')
+    return claims
+
+
+def access_token_data(company, token_obj):
+    """Get the access token fields added to login responses, if the company uses them"""
+    if not company.jwt_access_tokens:
+        return {}
+    access_token, expires_at = issue_access_token(company, token_obj)
+    return {
+        "access_token": access_token,
+        "access_expires_at": expires_at,
+        "token_type": "Bearer",
+    }
+
+
+def refresh_access_token(company, refresh_token):
+    """Issue a new access token for an active, unexpired refresh token, or return None"""
+    token_obj = AuthToken.objects.filter(
+        token_hash=AuthToken.hash_token(refresh_token),
+        company=company,
+        is_active=True,
+        expires_at__gt=timezone.now()
+    ).first()
+    if token_obj is None:
+        return None
+    return access_token_data(company, token_obj)
+
+
+class RevocationList:
+    """
+    Per-process set of revoked refresh token ids.
+
+    Entries only need to live as long as the access tokens issued from them
+    (or AUTH_TOKEN_CACHE_TTL, if longer), so the set stays small. Revocations are stored in RevokedAccessToken and
+    every worker polls that table at most once per
+    ACCESS_TOKEN_REVOCATION_POLL_INTERVAL seconds, so access token checks
+    between polls never touch the database.
+    """
+
+    def __init__(self):
+        self._revoked = {}
+        self._lock = threading.Lock()
+        self._poll_lock = threading.Lock()
+        self._next_poll = 0.0
+        self._polled_at = None
+
+    @property
+    def poll_interval(self):
+        return getattr(settings, 'ACCESS_TOKEN_REVOCATION_POLL_INTERVAL', 2)
+
+    @property
+    def clock_skew(self):
+        return getattr(settings, 'TENANT_CONFIG_CLOCK_SKEW', 5)
+
+    def is_revoked(self, jti):
+        self.poll()
+        expires_at = self._revoked.get(str(jti))
+        return expires_at is not None and expires_at > time.time()
+
+    def add(self, jti, expires_at):
+        with self._lock:
+            self._revoked[str(jti)] = expires_at.timestamp()
+
+    def poll(self, force=False):
+        """Pick up revocations made by other workers since the last poll"""
+        now = time.monotonic()
+        if not force and now < self._next_poll:
+            return
+        # Wait for the initial load so no request is checked against an empty set
+        if not self._poll_lock.acquire(blocking=self._polled_at is None):
+            # Another thread is already polling
+            return
+
+        try:
+            self._next_poll = now + self.poll_interval
+            started_at = timezone.now()
+
+            rows = RevokedAccessToken.objects.filter(expires_at__gt=started_at)
+            if self._polled_at is not None:
+                rows = rows.filter(created_at__gte=self._polled_at - timedelta(seconds=self.clock_skew))
+
+            with self._lock:
+                for jti, expires_at in rows.values_list('jti', 'expires_at'):
+                    self._revoked[str(jti)] = expires_at.timestamp()
+                # Forget entries whose access tokens have all expired
+                cutoff = time.time()
+                for jti in [jti for jti, expires_at in self._revoked.items() if expires_at <= cutoff]:
+                    del self._revoked[jti]
+
+            self._polled_at = started_at
+        except Exception as e:
+            logger.error(f"Error polling revoked access tokens: {str(e)}")
+        finally:
+            self._poll_lock.release()
+
+
+revoked_access_tokens = RevocationList()
+
+
+def revoke_access_tokens(token_obj):
+    """Revoke the access tokens issued from a refresh token, on every worker"""
+    revoke_access_token_ids([token_obj.id])
+
+
+def revoke_access_token_ids(token_ids):
+    """Revoke the access tokens issued from many refresh tokens with one insert"""
+    # Entries must also outlive any authentication cached for the tokens on other workers
+    lifetime = max(access_token_lifetime(), getattr(settings, 'AUTH_TOKEN_CACHE_TTL', 0))
+    expires_at = timezone.now() + timedelta(seconds=lifetime)
+    RevokedAccessToken.objects.bulk_create(
+        [RevokedAccessToken(jti=token_id, expires_at=expires_at) for token_id in token_ids],
+        update_conflicts=True,
+        unique_fields=['jti'],
+        update_fields=['expires_at', 'created_at']
+    )
+    for token_id in token_ids:
+        revoked_access_tokens.add(token_id, expires_at)
+
+    # Rows are only needed until the access tokens they cover have expired
+    RevokedAccessToken.objects.filter(expires_at__lte=timezone.now()).delete()
+
+
+def is_access_token_revoked(claims):
+    try:
+        jti = uuid.UUID(claims['jti'])
+    except (TypeError, ValueError):
+        return True
+    return revoked_access_tokens.is_revoked(jti)
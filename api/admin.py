@@ -1,10 +1,113 @@
 
+from datetime import timedelta
 from django.contrib import admin
-from .models import ApiLog
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+from companies.models import Company
+from .models import ApiLog, BackgroundJob
+
+
+class TimeRangeFilter(admin.SimpleListFilter):
+    """Limit API logs to a recent time range, the last day by default, so only those partitions are read"""
+    title = 'time range'
+    parameter_name = 'range'
+    RANGES = {'1d': timedelta(days=1), '7d': timedelta(days=7), '30d': timedelta(days=30), '90d': timedelta(days=90)}
+    
+    def lookups(self, request, model_admin):
+        return (('1d', 'Last day'), ('7d', 'Last 7 days'), ('30d', 'Last 30 days'), ('90d', 'Last 90 days'), ('all', 'All'))
+    
+    def value(self):
+        return super().value() or '1d'
+    
+    def choices(self, changelist):
+        for lookup, title in self.lookup_choices:
+            yield {
+                'selected': self.value() == lookup,
+                'query_string': changelist.get_query_string({self.parameter_name: lookup}),
+                'display': title,
+            }
+    
+    def queryset(self, request, queryset):
+        if self.value() in self.RANGES:
+            return queryset.filter(created_at__gte=timezone.now() - self.RANGES[self.value()])
+        return queryset
+
+
+class CompanyFilter(admin.SimpleListFilter):
+    """Filter API logs by company with an exact match, which the (company_id, created_at) index serves"""
+    title = 'company'
+    parameter_name = 'company'
+    
+    def lookups(self, request, model_admin):
+        return [(str(company_id), name) for company_id, name in Company.objects.order_by('name').values_list('id', 'name')]
+    
+    def queryset(self, request, queryset):
+        if self.value():
+            try:
+                return queryset.filter(company_id=self.value())
+            except ValidationError as e:
+                raise IncorrectLookupParameters(e)
+        return queryset
+
+
+class MethodFilter(admin.SimpleListFilter):
+    """Filter API logs by method from a fixed list, rather than a DISTINCT over every partition"""
+    title = 'method'
+    parameter_name = 'method'
+    
+    def lookups(self, request, model_admin):
+        return [(method, method) for method in ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')]
+    
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(method=self.value())
+        return queryset
+
+
+class StatusClassFilter(admin.SimpleListFilter):
+    """Filter API logs by status class (2xx, 4xx, ...)"""
+    title = 'status'
+    parameter_name = 'status'
+    
+    def lookups(self, request, model_admin):
+        return [(str(first), f'{first}xx') for first in (2, 3, 4, 5)]
+    
+    def queryset(self, request, queryset):
+        if self.value() in ('2', '3', '4', '5'):
+            first = int(self.value()) * 100
+            return queryset.filter(status_code__gte=first, status_code__lt=first + 100)
+        return queryset
+
 
 @admin.register(ApiLog)
 class ApiLogAdmin(admin.ModelAdmin):
     list_display = ('company_id', 'endpoint', 'method', 'status_code', 'ip_address', 'created_at')
-    list_filter = ('method', 'status_code')
-    search_fields = ('company_id', 'endpoint', 'ip_address')
-    readonly_fields = ('company_id', 'endpoint', 'method', 'request_data', 'response_data', 'status_code', 'ip_address', 'user_agent', 'created_at')
+    list_filter = (TimeRangeFilter, CompanyFilter, MethodFilter, StatusClassFilter)
+    search_fields = ('endpoint', 'ip_address')
+    ordering = ('-created_at',)
+    # Counting the unfiltered table would read every partition
+    show_full_result_count = False
+    readonly_fields = ('company_id', 'endpoint', 'method', 'request_body', 'response_body', 'headers', 'status_code', 'ip_address', 'user_agent', 'created_at')
+    exclude = ('request_data', 'response_data')
+    
+    @admin.display(description='Request data')
+    def request_body(self, obj):
+        return obj.get_request_data()
+    
+    @admin.display(description='Response data')
+    def response_body(self, obj):
+        return obj.get_response_data()
+
+
+@admin.register(BackgroundJob)
+class BackgroundJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'task', 'status', 'attempts', 'max_attempts', 'run_at', 'locked_by', 'updated_at')
+    list_filter = ('task', 'status')
+    readonly_fields = ('task', 'payload', 'attempts', 'locked_by', 'locked_at', 'last_error', 'created_at', 'updated_at')
+    actions = ['retry_jobs']
+
+    @admin.action(description='Retry selected dead jobs')
+    def retry_jobs(self, request, queryset):
+        count = queryset.filter(status='dead').update(status='queued', attempts=0, run_at=timezone.now())
+        self.message_user(request, f"{count} job(s) queued for retry")
@@ -0,0 +1,108 @@
+import hashlib
+import hmac
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from django.conf import settings
+from companies.models import Company
+from companies.cache import tenant_cache, get_company
+
+
+def key_digest(api_key):
+    return hashlib.sha256(api_key.bytes).digest()
+
+
+class RejectedKeyCache:
+    """
+    Bounded, least-recently-used set of (company id, key digest) pairs that
+    recently failed verification, so repeated bad requests skip the lookup.
+
+    A company's entries are dropped whenever the tenant config cache drops
+    the company, so a created company or rotated key is accepted by every
+    worker within TENANT_CONFIG_POLL_INTERVAL.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def size(self):
+        return getattr(settings, 'API_KEY_NEGATIVE_CACHE_SIZE', 10000)
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'API_KEY_NEGATIVE_CACHE_TTL', 60)
+
+    def __contains__(self, key):
+        with self._lock:
+            expires = self._entries.get(key)
+            if expires is None:
+                return False
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return False
+            self._entries.move_to_end(key)
+            return True
+
+    def add(self, key):
+        if not self.size:
+            return
+        with self._lock:
+            self._entries[key] = time.monotonic() + self.ttl
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def forget(self, company_id=None):
+        """Drop a company's entries, e.g. after it is created or its key is rotated, or all entries"""
+        if company_id is None:
+            self.clear()
+            return
+        company_id = str(company_id)
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == company_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+rejected_api_keys = RejectedKeyCache()
+tenant_cache.on_invalidate(rejected_api_keys.forget)
+
+
+def verify_api_key(company_id, api_key):
+    """
+    Get the company an API key belongs to, or None if the key or company ID is wrong.
+
+    The key is checked against a digest of the company's key kept in the
+    tenant config cache, so rotating a key (saving the company) takes effect
+    as soon as that cache drops the company.
+    """
+    try:
+        company_id = str(uuid.UUID(str(company_id)))
+        api_key = uuid.UUID(str(api_key))
+    except ValueError:
+        return None
+
+    digest = key_digest(api_key)
+    # Poll before trusting a rejection, so companies changed on other workers are forgotten
+    tenant_cache.poll()
+    if (company_id, digest) in rejected_api_keys:
+        return None
+
+    try:
+        company = get_company(company_id)
+    except Company.DoesNotExist:
+        company = None
+
+    if company is not None:
+        expected = tenant_cache.get(company_id, 'api_key_digest', lambda: key_digest(company.api_key))
+        if hmac.compare_digest(expected, digest):
+            return company
+
+    rejected_api_keys.add((company_id, digest))
+    return None
@@ -0,0 +1,457 @@
+import asyncio
+import time
+from functools import partial
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
+from rest_framework.authentication import SessionAuthentication, BasicAuthentication
+from companies.models import Company
+from verification.models import VerificationCode
+from .db_handlers import insert_data, authenticate_user
+from .validators import aget_validation_plan
+from .tasks import enqueue
+from .authentication import ApiKeyAuthentication, TokenAuthentication, JWTAuthentication
+from .passwords import PasswordHasherBusy
+from .access_tokens import refresh_access_token, revoke_access_tokens
+from .throttling import CompanyAnonRateThrottle, CompanyUserRateThrottle
+from .models import AuthToken
+from .concurrency import concurrency_limiter
+from .log_writer import api_log_writer
+from .profiles import project_profile
+from .handlers import (
+    server_error, hasher_busy, arequest_company, validation_failed, verification_field_of, field_missing,
+    issue_code, welcome_messages, submitted, storage_error, use_code, verify_submit_input_error,
+    request_password_reset, reset_password, resend_code, login_identifier, login_response, logout_token,
+    logout_lookup, invalid_token, logged_out, cached_not_modified, profile_result, parse_wait,
+    status_company_error, verification_status, company_key_required, introspection_input, introspect_tokens,
+    refresh_input, refreshed, revoke_tokens,
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def call_and_release(func, *args, **kwargs):
+    try:
+        return func(*args, **kwargs)
+    finally:
+        # Executor threads outlive the request, so close any control-plane
+        # connection the call opened as request_finished would
+        close_old_connections()
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Run blocking work (tenant DB calls, email/SMS providers) in the default
+    executor so it does not hold the event loop or the thread-sensitive
+    executor that Django uses for ORM calls.
+    """
+    return await sync_to_async(partial(call_and_release, func, *args, **kwargs), thread_sensitive=False)()
+
+
+async def send_welcome(company, data):
+    """Queue the welcome email and SMS, or send them concurrently without the task runner"""
+    await asyncio.gather(*[
+        run_blocking(enqueue, name, **payload) for name, payload in welcome_messages(company, data)
+    ])
+
+
+async def store_submission(company, data):
+    """Async variant of handlers.store_submission(), sending the welcome email and SMS concurrently"""
+    try:
+        inserted_id = await run_blocking(insert_data, company, data)
+        await send_welcome(company, data)
+        return submitted(inserted_id)
+    except Exception as e:
+        return storage_error(e)
+
+
+async def validate(company, data):
+    """
+    Run the company's validation plan off the event loop; custom validators
+    may spend their whole time budget or wait on the validator pool.
+    """
+    return await run_blocking(validation_failed, data, await aget_validation_plan(company))
+
+
+class AsyncAPIView(APIView):
+    """
+    APIView whose handlers are coroutines.
+
+    Django marks the view as async when every handler is a coroutine function,
+    so under ASGI it runs on the event loop instead of a sync adapter.
+    Authentication, permission and throttle checks are synchronous in DRF and
+    run in the default executor.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await run_blocking(self.initial, request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+class AsyncUniversalSubmitAPIView(AsyncAPIView):
+    """
+    Async universal API endpoint for submitting form data
+    """
+    authentication_classes = [ApiKeyAuthentication]
+    permission_classes = [AllowAny]
+    throttle_classes = [CompanyAnonRateThrottle]
+    throttle_scope = 'submit'
+
+    async def post(self, request):
+        try:
+            company, error = await arequest_company(request)
+            if error:
+                return error
+
+            # Get form data
+            data = request.data
+
+            # Validate data against company-specific validation rules
+            error = await validate(company, data)
+            if error:
+                return error
+
+            # Handle verification if required
+            if company.verification_method != 'none':
+                verification_field = verification_field_of(company)
+                error = field_missing(data, verification_field)
+                if error:
+                    return error
+                return await run_blocking(
+                    issue_code, company, verification_field, data[verification_field], 'verification',
+                    'Verification code', requires_verification=True
+                )
+
+            # Insert data into database and queue the welcome email/SMS
+            return await store_submission(company, data)
+        except Exception as e:
+            return server_error(e, 'submit')
+
+class AsyncVerifyAndSubmitAPIView(AsyncAPIView):
+    """
+    Async API endpoint for verifying a code and submitting form data
+    """
+    authentication_classes = [ApiKeyAuthentication]
+    permission_classes = [AllowAny]
+    throttle_classes = [CompanyAnonRateThrottle]
+    throttle_scope = 'verify_submit'
+
+    async def post(self, request):
+        try:
+            company, error = await arequest_company(request)
+            if error:
+                return error
+
+            # Get verification code and form data
+            code = request.data.get('verification_code')
+            data = request.data.get('data')
+            error = verify_submit_input_error(code, data)
+            if error:
+                return error
+
+            # Validate data against company-specific validation rules
+            error = await validate(company, data)
+            if error:
+                return error
+
+            verification_field = verification_field_of(company)
+            error = field_missing(data, verification_field)
+            if error:
+                return error
+
+            _, error = await run_blocking(use_code, company, code, verification_field, data)
+            if error:
+                return error
+
+            return await store_submission(company, data)
+        except Exception as e:
+            return server_error(e, 'verify-submit')
+
+class AsyncPasswordResetRequestAPIView(AsyncAPIView):
+    """
+    Async API endpoint for requesting a password reset
+    """
+    authentication_classes = [ApiKeyAuthentication]
+    permission_classes = [AllowAny]
+    throttle_classes = [CompanyAnonRateThrottle]
+    throttle_scope = 'password_reset'
+
+    async def post(self, request):
+        try:
+            company, error = await arequest_company(request)
+            if error:
+                return error
+            return await run_blocking(request_password_reset, company, request.data)
+        except Exception as e:
+            return server_error(e, 'password-reset-request')
+
+class AsyncPasswordResetVerifyAPIView(AsyncAPIView):
+    """
+    Async API endpoint for verifying a password reset code and setting a new password
+    """
+    authentication_classes = [ApiKeyAuthentication]
+    permission_classes = [AllowAny]
+    throttle_classes = [CompanyAnonRateThrottle]
+    throttle_scope = 'password_reset'
+
+    async def post(self, request):
+        try:
+            company, error = await arequest_company(request)
+            if error:
+                return error
+            return await run_blocking(reset_password, company, request.data)
+        except Exception as e:
+            return server_error(e, 'password-reset-verify')
+
+
+class AsyncResendVerificationAPIView(AsyncAPIView):
+    """
+    Async API endpoint for resending a verification code
+    """
+    authentication_classes = [ApiKeyAuthentication]
+    permission_classes = [AllowAny]
+    throttle_classes = [CompanyAnonRateThrottle]
+    throttle_scope = 'resend_verification'
+
+    async def post(self, request):
+        try:
+            company, error = await arequest_company(request)
+            if error:
+                return error
+            return await run_blocking(resend_code, company, request.data)
+        except Exception as e:
+            return server_error(e, 'resend-verification')
+
+
+class AsyncLoginAPIView(AsyncAPIView):
+    """
+    Async API endpoint for user login
+    """
+    authentication_classes = [ApiKeyAuthentication]
+    permission_classes = [AllowAny]
+    throttle_classes = [CompanyAnonRateThrottle]
+    throttle_scope = 'login'
+
+    async def post(self, request):
+        try:
+            company, error = await arequest_company(request)
+            if error:
+                return error
+
+            # Get login credentials
+            data = request.data
+            identifier, error = login_identifier(data)
+            if error:
+                return error
+
+            # Authenticate user
+            try:
+                user = await run_blocking(authenticate_user, company, *identifier, data['password'])
+            except PasswordHasherBusy:
+                return hasher_busy()
+
+            if not user:
+                return Response({"error": "Invalid credentials"}, status=status.HTTP_401_UNAUTHORIZED)
+
+            token_obj = await AuthToken.agenerate_token(company, user.get('id', user.get('_id')))
+            return login_response(company, user, token_obj)
+
+        except Exception as e:
+            return server_error(e, 'login')
+
+class AsyncLogoutAPIView(AsyncAPIView):
+    """
+    Async API endpoint for user logout
+    """
+    authentication_classes = [ApiKeyAuthentication, TokenAuthentication, JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [CompanyUserRateThrottle]
+    throttle_scope = 'logout'
+
+    async def post(self, request):
+        try:
+            presented, error = logout_token(request)
+            if error:
+                return error
+
+            company, error = await arequest_company(request)
+            if error:
+                return error
+
+            # Deactivate token
+            lookup = logout_lookup(request, *presented, company)
+            if lookup is None:
+                return invalid_token()
+            try:
+                token_obj = await AuthToken.objects.aget(**lookup)
+            except AuthToken.DoesNotExist:
+                return invalid_token()
+            token_obj.is_active = False
+            await token_obj.asave()
+            if company.jwt_access_tokens:
+                await run_blocking(revoke_access_tokens, token_obj)
+            return logged_out()
+
+        except Exception as e:
+            return server_error(e, 'logout')
+
+class AsyncUserProfileAPIView(AsyncAPIView):
+    """
+    Async API endpoint for getting user profile
+    """
+    authentication_classes = [ApiKeyAuthentication, TokenAuthentication, JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [CompanyUserRateThrottle]
+    throttle_scope = 'profile'
+
+    async def get(self, request):
+        try:
+            # User is already authenticated by TokenAuthentication
+            token = request.auth if isinstance(request.auth, AuthToken) else None
+            if_none_match = request.headers.get('If-None-Match')
+
+            response = cached_not_modified(token, if_none_match)
+            if response:
+                return response
+
+            # Return user data (excluding password)
+            profile = await run_blocking(project_profile, request.user)
+            return profile_result(profile, token, if_none_match)
+
+        except AuthenticationFailed:
+            # The token's user no longer exists in the company database
+            raise
+        except Exception as e:
+            return server_error(e, 'user profile')
+
+
+class AsyncVerificationStatusAPIView(AsyncAPIView):
+    """Async variant of VerificationStatusAPIView; the only one that long-polls with ?wait=, without holding a thread"""
+    authentication_classes = [ApiKeyAuthentication]
+    permission_classes = [AllowAny]
+    throttle_classes = [CompanyAnonRateThrottle]
+    throttle_scope = 'verification_status'
+
+    async def get(self, request, verification_id):
+        try:
+            company_id = request.headers.get('X-Company-ID')
+            error = status_company_error(company_id)
+            if error:
+                return error
+
+            deadline = time.monotonic() + parse_wait(request)
+            lookup = VerificationCode.objects.filter(id=verification_id, company_id=company_id)
+            while True:
+                row = await lookup.values_list('delivery_status', 'delivery_error').afirst()
+                if row is None or row[0] != 'queued' or time.monotonic() >= deadline:
+                    return verification_status(verification_id, row)
+                await asyncio.sleep(getattr(settings, 'VERIFICATION_STATUS_POLL_INTERVAL', 0.5))
+
+        except Exception as e:
+            return server_error(e, 'verification status')
+
+
+class AsyncTokenIntrospectionAPIView(AsyncAPIView):
+    """Async variant of TokenIntrospectionAPIView"""
+    authentication_classes = [ApiKeyAuthentication]
+    permission_classes = [AllowAny]
+    throttle_classes = [CompanyAnonRateThrottle]
+    throttle_scope = 'token'
+
+    async def post(self, request):
+        try:
+            # Only the company itself may introspect its tokens
+            company = request.user
+            if not isinstance(company, Company):
+                return company_key_required()
+
+            query, error = introspection_input(request.data)
+            if error:
+                return error
+            return Response({"tokens": await run_blocking(introspect_tokens, company, *query)})
+
+        except Exception as e:
+            return server_error(e, 'token introspection')
+
+
+class AsyncTokenRefreshAPIView(AsyncAPIView):
+    """Async variant of TokenRefreshAPIView"""
+    authentication_classes = [ApiKeyAuthentication]
+    permission_classes = [AllowAny]
+    throttle_classes = [CompanyAnonRateThrottle]
+    throttle_scope = 'token'
+
+    async def post(self, request):
+        try:
+            company, error = await arequest_company(request)
+            if error:
+                return error
+
+            refresh_token, error = refresh_input(company, request.data)
+            if error:
+                return error
+            return refreshed(await run_blocking(refresh_access_token, company, refresh_token))
+
+        except Exception as e:
+            return server_error(e, 'token refresh')
+
+
+class AsyncTokenRevokeAPIView(AsyncAPIView):
+    """Async variant of TokenRevokeAPIView"""
+    authentication_classes = [ApiKeyAuthentication]
+    permission_classes = [AllowAny]
+    throttle_classes = [CompanyAnonRateThrottle]
+    throttle_scope = 'token'
+
+    async def post(self, request):
+        try:
+            # Only the company itself may revoke its tokens
+            company = request.user
+            if not isinstance(company, Company):
+                return company_key_required()
+            return await run_blocking(revoke_tokens, company, request.data)
+
+        except Exception as e:
+            return server_error(e, 'token revoke')
+
+
+class AsyncLoadMetricsAPIView(AsyncAPIView):
+    """
+    Async API endpoint exposing this worker's adaptive concurrency limits and API log writer counters
+    """
+    authentication_classes = [SessionAuthentication, BasicAuthentication]
+    permission_classes = [IsAdminUser]
+    throttle_classes = []
+
+    async def get(self, request):
+        return Response({
+            "endpoint_classes": concurrency_limiter.metrics(),
+            "api_log": api_log_writer.counters(),
+        })
@@ -0,0 +1,57 @@
+import time
+from django.conf import settings
+from django.core.cache import cache
+
+
+def token_cache_enabled():
+    return bool(getattr(settings, 'AUTH_TOKEN_CACHE_TTL', 0))
+
+
+def _cache_key(token_hash):
+    # AuthToken.token_hash is already a digest, so raw tokens never reach the cache backend
+    return 'auth_token:' + token_hash
+
+
+def get_cached_token(token_hash):
+    """
+    Get the cached (token id, company id, user id, expiry timestamp) for a token, if any.
+
+    The cache backend may be per-process, so hits are also checked against the
+    revocation list every worker polls; a token deactivated on another worker
+    stops being served within ACCESS_TOKEN_REVOCATION_POLL_INTERVAL seconds.
+    """
+    if not token_cache_enabled():
+        return None
+    entry = cache.get(_cache_key(token_hash))
+    if entry is None or entry[3] <= time.time():
+        return None
+    from .access_tokens import revoked_access_tokens
+    if revoked_access_tokens.is_revoked(entry[0]):
+        return None
+    return entry
+
+
+def cache_token(token_obj):
+    """Cache an active token, never past its expiry"""
+    ttl = getattr(settings, 'AUTH_TOKEN_CACHE_TTL', 0)
+    if not ttl:
+        return
+    expires_at = token_obj.expires_at.timestamp()
+    ttl = min(ttl, int(expires_at - time.time()))
+    if ttl > 0:
+        entry = (str(token_obj.id), str(token_obj.company_id), token_obj.user_id, expires_at)
+        cache.set(_cache_key(token_obj.token_hash), entry, ttl)
+
+
+def invalidate_tokens(tokens, revoke=True):
+    """
+    Drop cached entries for tokens that were changed, deactivated or deleted, given as (id, token hash) pairs.
+
+    With revoke, the ids are revoked as well, so workers whose cache backend
+    still holds the entries stop accepting them at their next revocation poll.
+    """
+    if tokens and token_cache_enabled():
+        cache.delete_many([_cache_key(token_hash) for _, token_hash in tokens])
+        if revoke:
+            from .access_tokens import revoke_access_token_ids
+            revoke_access_token_ids([token_id for token_id, _ in tokens])
@@ -1,11 +1,18 @@
 
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
+from collections.abc import Mapping
+from datetime import datetime, timezone as dt_timezone
 from companies.models import Company
+from companies.cache import get_company
 from rest_framework.exceptions import AuthenticationFailed
 from django.utils import timezone
+from .api_keys import verify_api_key
+from .auth_cache import get_cached_token, cache_token
+from .access_tokens import decode_access_token, is_access_token_revoked
 from .models import AuthToken
 from .db_handlers import get_user_by_id
+import jwt
 import logging
 
 logger = logging.getLogger(__name__)
@@ -26,12 +33,47 @@ class ApiKeyAuthentication(BaseAuthentication):
         if not company_id:
             return None
         
-        try:
-            # Find company by ID and API key
-            company = Company.objects.get(id=company_id, api_key=api_key)
-            return (company, None)
-        except Company.DoesNotExist:
+        # Check the key against the cached company; recently rejected keys skip the lookup
+        company = verify_api_key(company_id, api_key)
+        if company is None:
             raise AuthenticationFailed('Invalid API key or company ID')
+        return (company, None)
+
+
+class TenantUser(Mapping):
+    """
+    User authenticated by token. The record is fetched from the company's
+    database on first access, so views that only need the ids skip that read.
+    """
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, company, user_id):
+        self.company = company
+        self.pk = user_id
+        self._record = None
+
+    @property
+    def record(self):
+        if self._record is None:
+            user = get_user_by_id(self.company, self.pk)
+            if not user:
+                raise AuthenticationFailed('User not found')
+            self._record = user
+        return self._record
+
+    def __getitem__(self, key):
+        return self.record[key]
+
+    def __iter__(self):
+        return iter(self.record)
+
+    def __len__(self):
+        return len(self.record)
+
+    def __bool__(self):
+        # Permission checks test the user's truthiness; don't load the record for it
+        return True
 
 
 class TokenAuthentication(BaseAuthentication):
@@ -59,14 +101,29 @@ class TokenAuthentication(BaseAuthentication):
             
         try:
             # Find company by ID
-            company = Company.objects.get(id=company_id)
+            company = get_company(company_id)
         except Company.DoesNotExist:
             return None
             
         try:
+            token_hash = AuthToken.hash_token(token)
+            
+            # Use the cached token unless it belongs to another company
+            cached = get_cached_token(token_hash)
+            if cached is not None and cached[1] == str(company.id):
+                token_id, _, user_id, expires_at = cached
+                token_obj = AuthToken(
+                    id=token_id,
+                    company=company,
+                    user_id=user_id,
+                    token_hash=token_hash,
+                    expires_at=datetime.fromtimestamp(expires_at, dt_timezone.utc),
+                )
+                return (TenantUser(company, user_id), token_obj)
+
             # Find token in database
             token_obj = AuthToken.objects.get(
-                token=token,
+                token_hash=token_hash,
                 company=company,
                 is_active=True
             )
@@ -76,17 +133,59 @@ class TokenAuthentication(BaseAuthentication):
                 token_obj.is_active = False
                 token_obj.save()
                 raise AuthenticationFailed('Token has expired')
+
+            cache_token(token_obj)
                 
-            # Get user from company's database
-            user = get_user_by_id(company, token_obj.user_id)
-            if not user:
-                raise AuthenticationFailed('User not found')
-                
-            # Return authenticated user and token
-            return (user, token_obj)
+            # Return authenticated user and token; the user record is loaded when a view reads it
+            return (TenantUser(company, token_obj.user_id), token_obj)
             
         except AuthToken.DoesNotExist:
             return None
         except Exception as e:
             logger.error(f"Error authenticating token: {str(e)}")
-            return None
\ No newline at end of file
+            return None
+
+
+class JWTAuthentication(BaseAuthentication):
+    """
+    Signed access tokens (Authorization: Bearer ...) for companies with
+    jwt_access_tokens enabled. Verification needs no database read.
+    """
+
+    def authenticate(self, request):
+        auth_header = request.headers.get('Authorization')
+        if not auth_header:
+            return None
+
+        parts = auth_header.split()
+        if parts[0].lower() != 'bearer' or len(parts) != 2:
+            return None
+
+        company_id = request.headers.get('X-Company-ID')
+        if not company_id:
+            return None
+
+        try:
+            company = get_company(company_id)
+        except Company.DoesNotExist:
+            return None
+
+        if not company.jwt_access_tokens:
+            return None
+
+        try:
+            claims = decode_access_token(company, parts[1])
+        except jwt.InvalidTokenError:
+            raise AuthenticationFailed('Invalid or expired access token')
+
+        if is_access_token_revoked(claims):
+            raise AuthenticationFailed('Access token has been revoked')
+
+        # Stand-in for the refresh token the access token was issued from
+        token_obj = AuthToken(
+            id=claims['jti'],
+            company=company,
+            user_id=claims['sub'],
+            expires_at=datetime.fromtimestamp(claims['exp'], dt_timezone.utc),
+        )
+        return (TenantUser(company, claims['sub']), token_obj)
@@ -0,0 +1,116 @@
+import threading
+import time
+from django.conf import settings
+
+# Endpoint classes by path prefix, most important first; other /api/ paths are 'normal'
+ENDPOINT_CLASSES = (
+    ('critical', ('/api/submit/', '/api/verify-submit/', '/api/verification-status/')),
+    ('normal', ()),
+    ('low', ('/api/resend-verification/', '/api/profile/')),
+)
+
+
+def endpoint_class(path):
+    """Get the endpoint class a request path is limited under, or None if it is not limited"""
+    if not path.startswith('/api/') or path.startswith('/api/metrics/'):
+        # Metrics must stay reachable under overload
+        return None
+    for name, prefixes in ENDPOINT_CLASSES:
+        if path.startswith(prefixes):
+            return name
+    return 'normal'
+
+
+class AIMDLimit:
+    """
+    Concurrency limit for one endpoint class, adjusted from observed latency.
+
+    A slower than LOAD_SHEDDING_TARGET_LATENCY or failed (5xx) request cuts
+    the limit by LOAD_SHEDDING_BACKOFF, at most once per window: requests
+    admitted before the last cut were already running under the old limit,
+    so their completions don't cut it again. Once a full window (limit
+    requests) finishes within the target while the limit is in use, the
+    limit grows by one.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.limit = float(getattr(settings, 'LOAD_SHEDDING_INITIAL_LIMIT', 20))
+        self.in_flight = 0
+        self.shed = 0
+        self.latency = 0.0
+        # When the limit was last cut, and fast requests finished since the window started
+        self.cut_at = float('-inf')
+        self.clean = 0
+
+    @property
+    def saturated(self):
+        return self.in_flight >= int(self.limit)
+
+    def on_done(self, latency, failed):
+        self.in_flight -= 1
+        # Exponentially weighted latency, for the metrics
+        self.latency = latency if not self.latency else 0.9 * self.latency + 0.1 * latency
+        if failed or latency > getattr(settings, 'LOAD_SHEDDING_TARGET_LATENCY', 0.5):
+            self.clean = 0
+            now = time.monotonic()
+            if now - latency >= self.cut_at:
+                self.limit = max(self.limit * getattr(settings, 'LOAD_SHEDDING_BACKOFF', 0.9),
+                                 getattr(settings, 'LOAD_SHEDDING_MIN_LIMIT', 2))
+                self.cut_at = now
+        elif self.in_flight * 2 >= self.limit:
+            # Only grow a limit that is actually being used
+            self.clean += 1
+            if self.clean >= self.limit:
+                self.clean = 0
+                self.limit = min(self.limit + 1, getattr(settings, 'LOAD_SHEDDING_MAX_LIMIT', 200))
+
+
+class ConcurrencyLimiter:
+    """
+    Per-process adaptive concurrency limits, one per endpoint class.
+
+    A request is shed when its class is at its limit, or when a more
+    important class is, so low-priority work gives way first and signup and
+    verification keep their capacity.
+    """
+
+    def __init__(self):
+        self._limits = {name: AIMDLimit(name) for name, _ in ENDPOINT_CLASSES}
+        self._lock = threading.Lock()
+
+    def acquire(self, name):
+        """Admit a request of an endpoint class, returning False if it should be shed"""
+        with self._lock:
+            # Check this class and every more important one
+            for other, _ in ENDPOINT_CLASSES:
+                if self._limits[other].saturated:
+                    self._limits[name].shed += 1
+                    return False
+                if other == name:
+                    break
+            self._limits[name].in_flight += 1
+            return True
+
+    def release(self, name, latency, failed=False):
+        with self._lock:
+            self._limits[name].on_done(latency, failed)
+
+    def metrics(self):
+        with self._lock:
+            return {
+                name: {
+                    'limit': int(limit.limit),
+                    'in_flight': limit.in_flight,
+                    'shed': limit.shed,
+                    'latency_ms': round(limit.latency * 1000, 1),
+                }
+                for name, limit in self._limits.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._limits = {name: AIMDLimit(name) for name, _ in ENDPOINT_CLASSES}
+
+
+concurrency_limiter = ConcurrencyLimiter()
@@ -0,0 +1,214 @@
+import ast
+import builtins
+import multiprocessing
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from django.conf import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+VALIDATOR_FILENAME = '<custom_validator>'
+
+# Builtins available to custom validators. Anything that can import modules,
+# touch files or reach into interpreter internals is left out.
+SAFE_BUILTIN_NAMES = (
+    'abs', 'all', 'any', 'bool', 'dict', 'enumerate', 'filter', 'float', 'frozenset',
+    'int', 'isinstance', 'len', 'list', 'map', 'max', 'min', 'range', 'reversed',
+    'round', 'set', 'sorted', 'str', 'sum', 'tuple', 'zip',
+    'Exception', 'TypeError', 'ValueError', 'None', 'True', 'False',
+)
+SAFE_BUILTINS = {name: getattr(builtins, name) for name in SAFE_BUILTIN_NAMES}
+
+
+class UnsafeValidatorError(Exception):
+    """Raised when a custom validator uses constructs the sandbox does not allow"""
+
+
+class ValidatorTimeoutError(BaseException):
+    """
+    Raised when a custom validator runs past its time budget. It derives from
+    BaseException so validators that catch Exception cannot swallow it.
+    """
+
+
+# Syntax a validator may use. Anything else (imports, try/with, classes, lambdas,
+# nested functions, yield/await, global/nonlocal, ...) is rejected.
+ALLOWED_NODES = (
+    ast.Module, ast.FunctionDef, ast.arguments, ast.arg, ast.Return, ast.Assign, ast.AugAssign,
+    ast.If, ast.For, ast.While, ast.Break, ast.Continue, ast.Pass, ast.Expr,
+    ast.BoolOp, ast.BinOp, ast.UnaryOp, ast.Compare, ast.IfExp, ast.Call, ast.keyword,
+    ast.Constant, ast.Name, ast.Attribute, ast.Subscript, ast.Slice, ast.Starred,
+    ast.List, ast.Tuple, ast.Set, ast.Dict,
+    ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp, ast.comprehension,
+    ast.JoinedStr, ast.FormattedValue,
+    ast.Load, ast.Store,
+    ast.boolop, ast.operator, ast.unaryop, ast.cmpop,
+)
+
+# Methods of the plain values a validator receives. Every other attribute is
+# rejected, which keeps out generator, frame, code and traceback internals
+# (gi_frame, f_back, f_globals, tb_frame, ...) as well as str.format.
+ALLOWED_ATTRIBUTES = frozenset((
+    # str
+    'capitalize', 'casefold', 'count', 'endswith', 'find', 'index', 'isalnum', 'isalpha',
+    'isdecimal', 'isdigit', 'islower', 'isnumeric', 'isspace', 'isupper', 'join', 'lower',
+    'lstrip', 'partition', 'replace', 'rfind', 'rpartition', 'rsplit', 'rstrip', 'split',
+    'splitlines', 'startswith', 'strip', 'title', 'upper', 'zfill',
+    # list, dict and set
+    'append', 'extend', 'insert', 'pop', 'remove', 'sort', 'reverse', 'copy',
+    'get', 'keys', 'values', 'items',
+    'add', 'difference', 'intersection', 'issubset', 'issuperset', 'union',
+    # numbers
+    'is_integer',
+))
+
+
+def check_source(tree):
+    """
+    Check validator source against an allowlist of syntax and attribute names.
+
+    Functions may only be defined at module level and take no decorators, so
+    validators cannot build generators, coroutines or closures of their own.
+    """
+    for node in ast.walk(tree):
+        if not isinstance(node, ALLOWED_NODES):
+            raise UnsafeValidatorError(f'{type(node).__name__} is not allowed in custom validators')
+        if isinstance(node, ast.FunctionDef) and (node not in tree.body or node.decorator_list):
+            raise UnsafeValidatorError('Functions may only be defined at module level, without decorators')
+        if isinstance(node, ast.Attribute) and node.attr not in ALLOWED_ATTRIBUTES:
+            raise UnsafeValidatorError(f'Access to attribute {node.attr} is not allowed')
+        if isinstance(node, ast.Name) and node.id.startswith('__'):
+            raise UnsafeValidatorError(f'Access to name {node.id} is not allowed')
+
+
+def build_validator(source):
+    """Compile validator source once and return its validate_custom function"""
+    tree = ast.parse(source, VALIDATOR_FILENAME, 'exec')
+    check_source(tree)
+    code = compile(tree, VALIDATOR_FILENAME, 'exec')
+
+    namespace = {'__builtins__': SAFE_BUILTINS}
+    exec(code, namespace)
+    function = namespace.get('validate_custom')
+    if not callable(function):
+        raise UnsafeValidatorError('Custom validator must define validate_custom(value)')
+    return function
+
+
+def call_with_budget(function, value, timeout):
+    """
+    Call a validator, aborting it once it has run for more than timeout seconds.
+
+    The budget is enforced by an opcode-level trace hook on the validator's own
+    frames, so it stops Python-level loops but not a single long-running builtin
+    call.
+    """
+    if not timeout:
+        return function(value)
+
+    deadline = time.monotonic() + timeout
+
+    def trace_opcodes(frame, event, arg):
+        if time.monotonic() > deadline:
+            raise ValidatorTimeoutError('Custom validator exceeded its time budget')
+        return trace_opcodes
+
+    def trace_calls(frame, event, arg):
+        if frame.f_code.co_filename == VALIDATOR_FILENAME:
+            # Line events alone miss tight single-line loops
+            frame.f_trace_opcodes = True
+            return trace_opcodes(frame, event, arg)
+        return None
+
+    previous = sys.gettrace()
+    sys.settrace(trace_calls)
+    try:
+        return function(value)
+    finally:
+        sys.settrace(previous)
+
+
+# Validators compiled inside pool worker processes, keyed by source
+_worker_validators = {}
+
+
+def run_in_worker(source, value, timeout):
+    """Pool worker entry point: compile the validator once per process and run it"""
+    function = _worker_validators.get(source)
+    if function is None:
+        function = _worker_validators[source] = build_validator(source)
+    return call_with_budget(function, value, timeout)
+
+
+def warm_worker():
+    """No-op task used to start pool workers before the first validator runs"""
+    return True
+
+
+class ValidatorPool:
+    """Warm process pool that isolates custom validators from request workers"""
+
+    def __init__(self):
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                workers = getattr(settings, 'CUSTOM_VALIDATOR_WORKERS', 2)
+                executor = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+                # Start every worker now so process startup never counts
+                # against a validator's time budget
+                for future in [executor.submit(warm_worker) for _ in range(workers)]:
+                    future.result()
+                self._executor = executor
+            return self._executor
+
+    def run(self, source, value, timeout):
+        executor = self.get_executor()
+        future = executor.submit(run_in_worker, source, value, timeout)
+        try:
+            # Allow for IPC on top of the in-worker budget
+            return future.result(timeout=timeout * 2 + 0.1 if timeout else None)
+        except FutureTimeoutError:
+            self.recycle(executor)
+            raise ValidatorTimeoutError('Custom validator exceeded its time budget')
+        except BrokenProcessPool:
+            self.recycle(executor)
+            raise
+
+    def recycle(self, executor):
+        """Replace a pool whose worker is stuck in a validator"""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        logger.warning("Recycling custom validator pool after a validator timed out")
+        # ProcessPoolExecutor has no public way to kill a busy worker
+        for process in list(getattr(executor, '_processes', {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+validator_pool = ValidatorPool()
+
+
+class CustomValidator:
+    """A custom_validator rule compiled once and run in a restricted namespace"""
+
+    def __init__(self, source):
+        self.source = source
+        self.function = build_validator(source)
+        self.timeout = getattr(settings, 'CUSTOM_VALIDATOR_TIMEOUT', 0.05)
+        self.use_pool = getattr(settings, 'CUSTOM_VALIDATOR_MODE', 'inline') == 'process'
+
+    def __call__(self, value):
+        if self.use_pool:
+            return validator_pool.run(self.source, value, self.timeout)
+        return call_with_budget(self.function, value, self.timeout)
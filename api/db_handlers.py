@@ -4,8 +4,14 @@ import mysql.connector
 import sqlite3
 import json
 import hashlib
-import bcrypt
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from django.conf import settings
 import logging
+from .passwords import PasswordHasherBusy, hash_password, check_password
+from .profiles import invalidate_profile_etag
 
 logger = logging.getLogger(__name__)
 
@@ -92,12 +98,164 @@ def get_mysql_connection_string(connection_string):
 # SQLite connections
 def get_sqlite_connection(company):
     """Get SQLite connection using parameters"""
-    conn = sqlite3.connect(company.db_name)
+    # Pooled connections are handed to whichever thread borrows them next
+    conn = sqlite3.connect(company.db_name, check_same_thread=False)
     return conn
 
 def get_sqlite_connection_string(connection_string):
     """Get SQLite connection using connection string"""
-    return sqlite3.connect(connection_string)
+    return sqlite3.connect(connection_string, check_same_thread=False)
+
+
+class TenantConnectionPool:
+    """
+    Per-process pool of tenant database connections.
+
+    Idle SQL connections are kept per company and connection settings (so an
+    edited company gets fresh connections) and reused by later requests,
+    together with each driver's statement cache. MongoDB clients pool
+    internally, so one database handle is kept per company.
+    """
+
+    def __init__(self):
+        self._idle = {}
+        self._mongo = {}
+        self._lock = threading.Lock()
+
+    @property
+    def size(self):
+        return getattr(settings, 'TENANT_DB_POOL_SIZE', 4)
+
+    @property
+    def max_idle(self):
+        return getattr(settings, 'TENANT_DB_POOL_MAX_IDLE', 300)
+
+    def key(self, company):
+        return (
+            str(company.id), company.db_type, company.connection_type, company.connection_string,
+            company.db_host, company.db_port, company.db_name, company.db_user, company.db_password,
+        )
+
+    @contextmanager
+    def connection(self, company):
+        """Borrow a connection (a database handle for MongoDB) for the duration of a with block"""
+        key = self.key(company)
+        if company.db_type == 'mongodb':
+            db = self._mongo.get(key)
+            if db is None:
+                db = get_db_connection(company)
+                with self._lock:
+                    self._forget_company(key[0])
+                    self._mongo[key] = db
+            yield db
+            return
+
+        conn = self._checkout(key) or get_db_connection(company)
+        try:
+            yield conn
+        except BaseException:
+            # The connection may be mid-transaction or broken; don't reuse it
+            close_quietly(conn)
+            raise
+        try:
+            # End the read transaction so the next borrower sees fresh data
+            conn.rollback()
+        except Exception:
+            close_quietly(conn)
+            return
+        self._checkin(key, conn)
+
+    def _checkout(self, key):
+        cutoff = time.monotonic() - self.max_idle
+        with self._lock:
+            idle = self._idle.get(key)
+            while idle:
+                conn, since = idle.pop()
+                if since >= cutoff:
+                    return conn
+                # Servers drop long-idle connections; don't hand out a dead one
+                close_quietly(conn)
+        return None
+
+    def _checkin(self, key, conn):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle is None:
+                self._forget_company(key[0])
+                idle = self._idle[key] = []
+            if len(idle) < self.size:
+                idle.append((conn, time.monotonic()))
+                return
+        close_quietly(conn)
+
+    def _forget_company(self, company_id):
+        # Drop connections opened with a company's previous settings
+        for key in [key for key in self._idle if key[0] == company_id]:
+            for conn, _ in self._idle.pop(key):
+                close_quietly(conn)
+        for key in [key for key in self._mongo if key[0] == company_id]:
+            self._mongo.pop(key).client.close()
+
+    def clear(self):
+        with self._lock:
+            for idle in self._idle.values():
+                for conn, _ in idle:
+                    close_quietly(conn)
+            self._idle.clear()
+            for db in self._mongo.values():
+                db.client.close()
+            self._mongo.clear()
+
+
+def close_quietly(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+tenant_pool = TenantConnectionPool()
+
+# Columns login looks users up by
+IDENTIFIER_COLUMNS = ('email', 'phone')
+
+# Identifier quote and parameter placeholder per SQL dialect
+SQL_DIALECTS = {
+    'postgresql': ('"', '%s'),
+    'mysql': ('`', '%s'),
+    'sqlite': ('"', '?'),
+}
+
+
+def quote_name(db_type, name):
+    """Quote a table or column name for a SQL dialect"""
+    quote = SQL_DIALECTS[db_type][0]
+    return quote + name.replace(quote, quote * 2) + quote
+
+
+def sql_errors(db_type):
+    """Driver errors raised for a missing table or column"""
+    return {
+        'postgresql': psycopg2.ProgrammingError,
+        'mysql': mysql.connector.ProgrammingError,
+        'sqlite': sqlite3.OperationalError,
+    }[db_type]
+
+
+@lru_cache(maxsize=1024)
+def select_statement(db_type, table_name, column):
+    """Build the single-row lookup statement for a table and column"""
+    placeholder = SQL_DIALECTS[db_type][1]
+    return (
+        f"SELECT * FROM {quote_name(db_type, table_name)} "
+        f"WHERE {quote_name(db_type, column)} = {placeholder} LIMIT 1"
+    )
+
+
+def mongo_id(value):
+    """Convert a stringified ObjectId back, leaving other IDs alone"""
+    from bson import ObjectId
+    return ObjectId(value) if isinstance(value, str) and ObjectId.is_valid(value) else value
 
 def table_exists(conn, table_name, db_type):
     """Check if a table exists in the database"""
@@ -189,6 +347,15 @@ def create_table(conn, table_name, data, db_type):
             create_sql = f'CREATE TABLE "{table_name}" ({", ".join(column_defs)});'
             cursor.execute(create_sql)
             conn.commit()
+        
+        # Index the columns users log in with, so credential lookups stay a single index probe
+        for column in IDENTIFIER_COLUMNS:
+            if column in data:
+                cursor.execute(
+                    f"CREATE INDEX {quote_name(db_type, f'{table_name}_{column}_idx')} "
+                    f"ON {quote_name(db_type, table_name)} ({quote_name(db_type, column)})"
+                )
+        conn.commit()
             
         return True
     except Exception as e:
@@ -351,86 +518,78 @@ def find_user(company, query):
 
 def update_user_password(company, user, new_password):
     """Update a user's password in the database"""
+    # Hash the password in the hasher pool; raises PasswordHasherBusy when it is saturated
+    hashed_password = hash_password(company, new_password)
+    return store_password_hash(company, user, hashed_password)
+
+
+def store_password_hash(company, user, hashed_password):
+    """Write an already hashed password to a user's record"""
+    try:
+        return write_password_hash(company, user, hashed_password)
+    finally:
+        # Once the write has committed, so a concurrent profile GET cannot cache the old ETag again
+        invalidate_profile_etag(company.id, user.get('id', user.get('_id')))
+
+
+def write_password_hash(company, user, hashed_password):
     db_type = company.db_type
     table_name = company.target_table
     
-    # Hash the password
-    hashed_password = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-    
-    # Get database connection
-    conn = get_db_connection(company)
-    
-    try:
+    with tenant_pool.connection(company) as conn:
         if db_type == 'mongodb':
             # MongoDB update
-            collection = conn[table_name]
-            result = collection.update_one(
-                {'_id': user['_id']},
+            result = conn[table_name].update_one(
+                {'_id': mongo_id(user['_id'])},
                 {'$set': {'password': hashed_password}}
             )
             return result.modified_count > 0
         
-        elif db_type == 'postgresql':
-            # Check if table exists
-            if not table_exists(conn, table_name, db_type):
-                return False
-                
-            # PostgreSQL update
-            cursor = conn.cursor()
-            
-            # Create SQL query
-            sql_query = f"UPDATE \"{table_name}\" SET \"password\" = %s WHERE id = %s"
-            
-            # Execute query
-            cursor.execute(sql_query, [hashed_password, user['id']])
-            
-            # Commit transaction
-            conn.commit()
-            
-            return cursor.rowcount > 0
-        
-        elif db_type == 'mysql':
-            # Check if table exists
-            if not table_exists(conn, table_name, db_type):
-                return False
-                
-            # MySQL update
-            cursor = conn.cursor()
-            
-            # Create SQL query
-            sql_query = f"UPDATE `{table_name}` SET `password` = %s WHERE id = %s"
-            
-            # Execute query
-            cursor.execute(sql_query, [hashed_password, user['id']])
-            
-            # Commit transaction
-            conn.commit()
-            
-            return cursor.rowcount > 0
-        
-        elif db_type == 'sqlite':
-            # Check if table exists
-            if not table_exists(conn, table_name, db_type):
-                return False
-                
-            # SQLite update
-            cursor = conn.cursor()
-            
-            # Create SQL query
-            sql_query = f"UPDATE \"{table_name}\" SET \"password\" = ? WHERE id = ?"
-            
-            # Execute query
+        # SQL update by primary key
+        quote, placeholder = SQL_DIALECTS[db_type]
+        sql_query = (
+            f"UPDATE {quote_name(db_type, table_name)} SET {quote}password{quote} = {placeholder} "
+            f"WHERE {quote}id{quote} = {placeholder}"
+        )
+        cursor = conn.cursor()
+        try:
             cursor.execute(sql_query, [hashed_password, user['id']])
-            
-            # Commit transaction
-            conn.commit()
-            
-            return cursor.rowcount > 0
+        except sql_errors(db_type) as e:
+            # Missing table or column
+            logger.error(f"Error storing password hash: {str(e)}")
+            return False
+        conn.commit()
+        return cursor.rowcount > 0
+
+
+def select_one(company, column, value):
+    """
+    Fetch the first row of the target table whose column equals value, as a dict.
+
+    One statement on a pooled connection; the SQL text is built once per
+    table and column. A missing table or column reads as no match.
+    """
+    db_type = company.db_type
+    table_name = company.target_table
     
-    finally:
-        # Close connection
-        if db_type != 'mongodb':
-            conn.close()
+    with tenant_pool.connection(company) as conn:
+        if db_type == 'mongodb':
+            if column == 'id':
+                column, value = '_id', mongo_id(value)
+            user = conn[table_name].find_one({column: value})
+            if user:
+                user['_id'] = str(user['_id'])
+            return user
+        
+        cursor = conn.cursor()
+        try:
+            cursor.execute(select_statement(db_type, table_name, column), (value,))
+        except sql_errors(db_type):
+            return None
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return dict(zip([desc[0] for desc in cursor.description], row))
 
 
 def authenticate_user(company, identifier_field, identifier_value, password):
@@ -447,53 +606,35 @@ def authenticate_user(company, identifier_field, identifier_value, password):
         dict: User data if authentication is successful, None otherwise
     """
     try:
-        # Get database connection
-        conn = get_db_connection(company)
-        cursor = conn.cursor(dictionary=True)
-        
-        # Get table name and fields
-        table_name = company.user_table_name
-        
-        # Escape table name to prevent SQL injection
-        table_name = conn.converter.escape(table_name)
-        
-        # Escape identifier field to prevent SQL injection
-        identifier_field = conn.converter.escape(identifier_field)
-        
-        # Query to find the user
-        query = f"SELECT * FROM {table_name} WHERE {identifier_field} = %s LIMIT 1"
-        cursor.execute(query, (identifier_value,))
-        
-        user = cursor.fetchone()
+        user = select_one(company, identifier_field, identifier_value)
         
         if not user:
             return None
             
         # Check if password field exists
-        if 'password' not in user:
+        if not user.get('password'):
             return None
             
-        # Check if password matches
-        stored_password = user['password']
+        # Check the password in the hasher pool (bcrypt, or plaintext for legacy records)
+        matches, new_hash = check_password(company, password, user['password'])
+        if not matches:
+            return None
         
-        # Check if the stored password is already a bcrypt hash
-        if stored_password.startswith('$2b$') or stored_password.startswith('$2a$') or stored_password.startswith('$2y$'):
-            # Verify the password using bcrypt
-            if bcrypt.checkpw(password.encode('utf-8'), stored_password.encode('utf-8')):
-                return user
-        else:
-            # If not using bcrypt, do a direct comparison (not recommended but for compatibility)
-            if password == stored_password:
-                return user
-                
-        return None
+        if new_hash:
+            # Upgrade plaintext or outdated-cost hashes while the plaintext is at hand
+            try:
+                store_password_hash(company, user, new_hash)
+                user['password'] = new_hash
+            except Exception as e:
+                logger.error(f"Error rehashing password: {str(e)}")
+        
+        return user
         
+    except PasswordHasherBusy:
+        raise
     except Exception as e:
         logger.error(f"Error authenticating user: {str(e)}")
         return None
-    finally:
-        if 'conn' in locals() and conn:
-            conn.close()
 
 def get_user_by_id(company, user_id):
     """
@@ -507,32 +648,55 @@ def get_user_by_id(company, user_id):
         dict: User data if found, None otherwise
     """
     try:
-        # Get database connection
-        conn = get_db_connection(company)
-        cursor = conn.cursor(dictionary=True)
-        
-        # Get table name
-        table_name = company.user_table_name
-        
-        # Escape table name to prevent SQL injection
-        table_name = conn.converter.escape(table_name)
-        
-        # Get primary key field
-        primary_key = company.user_table_primary_key or 'id'
+        return select_one(company, 'id', user_id)
+    except Exception as e:
+        logger.error(f"Error getting user by ID: {str(e)}")
+        return None
+
+def get_users_by_ids(company, user_ids, fields=None):
+    """
+    Get many users from the target table in one query
+    
+    Args:
+        company: Company model instance
+        user_ids: IDs of the users to retrieve
+        fields: Column names to project, or None for all columns
         
-        # Escape primary key field to prevent SQL injection
-        primary_key = conn.converter.escape(primary_key)
+    Returns:
+        dict: User data keyed by str(user ID), for the users that were found
+    """
+    db_type = company.db_type
+    table_name = company.target_table
+    user_ids = list(user_ids)
+    if not user_ids:
+        return {}
+    
+    with tenant_pool.connection(company) as conn:
+        if db_type == 'mongodb':
+            # MongoDB find with $in
+            ids = [mongo_id(user_id) for user_id in user_ids]
+            projection = {field: 1 for field in fields} if fields else None
+            users = {}
+            for user in conn[table_name].find({'_id': {'$in': ids}}, projection):
+                user['_id'] = str(user['_id'])
+                users[user['_id']] = user
+            return users
         
-        # Query to find the user
-        query = f"SELECT * FROM {table_name} WHERE {primary_key} = %s LIMIT 1"
-        cursor.execute(query, (user_id,))
+        # Always select the id so rows can be matched back to their IDs
+        quote, placeholder = SQL_DIALECTS[db_type]
+        columns = '*' if not fields else ', '.join(quote_name(db_type, field) for field in ['id', *fields])
+        placeholders = ', '.join([placeholder] * len(user_ids))
+        sql_query = f"SELECT {columns} FROM {quote_name(db_type, table_name)} WHERE {quote}id{quote} IN ({placeholders})"
         
-        user = cursor.fetchone()
-        return user
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql_query, user_ids)
+        except sql_errors(db_type):
+            return {}
+        names = [desc[0] for desc in cursor.description]
         
-    except Exception as e:
-        logger.error(f"Error getting user by ID: {str(e)}")
-        return None
-    finally:
-        if 'conn' in locals() and conn:
-            conn.close()
\ No newline at end of file
+        users = {}
+        for row in cursor.fetchall():
+            user = dict(zip(names, row))
+            users[str(user['id'])] = user
+        return users
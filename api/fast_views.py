@@ -0,0 +1,147 @@
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.views import exception_handler
+from .api_keys import verify_api_key
+from .parsers import get_payload
+from .renderers import FastJSONRenderer
+from .views import UniversalSubmitAPIView, VerifyAndSubmitAPIView, LoginAPIView
+
+json_renderer = FastJSONRenderer()
+
+
+class LeanRequest:
+    """
+    Minimal stand-in for DRF's Request.
+
+    Carries only what the public handlers and CompanyAnonRateThrottle read:
+    headers, META, the body and the authenticated user. Like request.data in
+    DRF, the JSON body is parsed on first access, and a parse error is raised
+    to the handler.
+    """
+
+    def __init__(self, request, user, auth=None):
+        self._request = request
+        self._data = None
+        self.headers = request.headers
+        self.META = request.META
+        self.method = request.method
+        self.user = user
+        self.auth = auth
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = {}
+            payload = get_payload(self._request)
+            if payload.body:
+                try:
+                    self._data = payload.parse()
+                except ValueError as exc:
+                    raise exceptions.ParseError('JSON parse error - %s' % str(exc))
+        return self._data
+
+
+def render_json(response, view_headers):
+    """Render an unrendered DRF Response as the JSON renderer and finalize_response would"""
+    rendered = HttpResponse(
+        json_renderer.render(response.data),
+        status=response.status_code,
+        content_type=json_renderer.media_type
+    )
+    for key, value in response.items():
+        if key.lower() != 'content-type':
+            rendered[key] = value
+
+    vary = view_headers.get('Vary')
+    if vary:
+        patch_vary_headers(rendered, [vary])
+    for key, value in view_headers.items():
+        if key != 'Vary':
+            rendered[key] = value
+    # Keep the unrendered data for ApiLogMiddleware
+    rendered.data = response.data
+    return rendered
+
+
+def wants_drf(request):
+    """
+    Decide whether a request needs the full DRF view.
+
+    The lean path only serves JSON in and JSON out; form posts, the browsable
+    API and explicit format overrides go through DRF unchanged.
+    """
+    if request.method != 'POST' or 'format' in request.GET:
+        return True
+    accept = request.headers.get('Accept', '')
+    if accept and ('text/html' in accept or ('application/json' not in accept and '*/*' not in accept)):
+        return True
+    if request.headers.get('Content-Length', '0') not in ('', '0'):
+        content_type = request.content_type or ''
+        if content_type != 'application/json' and not content_type.endswith('+json'):
+            return True
+    return False
+
+
+def authenticate(request):
+    """
+    Mirror ApiKeyAuthentication.
+
+    Returns (company, None) or None, or raises AuthenticationFailed.
+    """
+    api_key = request.headers.get('X-API-Key')
+    company_id = request.headers.get('X-Company-ID')
+    if not api_key or not company_id:
+        return None
+
+    company = verify_api_key(company_id, api_key)
+    if company is None:
+        exc = exceptions.AuthenticationFailed('Invalid API key or company ID')
+        # ApiKeyAuthentication has no WWW-Authenticate header, so DRF answers 403
+        exc.status_code = 403
+        raise exc
+    return (company, None)
+
+
+def lean_view(view_class):
+    """
+    Build a lean dispatcher for one of the public POST endpoints.
+
+    It runs the same authentication and throttle checks as the DRF view,
+    rejecting bad requests before the body is parsed, then calls the view's
+    own handler so responses are identical.
+    """
+    drf_view = view_class.as_view()
+    throttle_classes = view_class.throttle_classes
+    view_headers = view_class().default_response_headers
+
+    @csrf_exempt
+    def view(request, *args, **kwargs):
+        if wants_drf(request):
+            return drf_view(request, *args, **kwargs)
+
+        try:
+            auth = authenticate(request)
+            user, token = auth if auth else (AnonymousUser(), None)
+            lean_request = LeanRequest(request, user, token)
+
+            for throttle_class in throttle_classes:
+                throttle = throttle_class()
+                if not throttle.allow_request(lean_request, view_class):
+                    raise exceptions.Throttled(throttle.wait())
+
+        except exceptions.APIException as exc:
+            return render_json(exception_handler(exc, {}), view_headers)
+
+        response = view_class().post(lean_request, *args, **kwargs)
+        return render_json(response, view_headers)
+
+    view.view_class = view_class
+    return view
+
+
+submit_view = lean_view(UniversalSubmitAPIView)
+verify_and_submit_view = lean_view(VerifyAndSubmitAPIView)
+login_view = lean_view(LoginAPIView)
@@ -0,0 +1,510 @@
+import re
+import uuid
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.response import Response
+from rest_framework import status
+from companies.models import Company
+from companies.cache import get_company, aget_company
+from verification.models import VerificationCode
+from email_service.utils import generate_verification_code, send_email
+from verification.utils import send_sms
+from .db_handlers import insert_data, find_user, update_user_password, get_users_by_ids
+from .validators import validate_data
+from .tasks import enqueue, queue_verification, verification_dispatch_async, welcome_context
+from .passwords import PasswordHasherBusy
+from .access_tokens import access_token_data
+from .models import AuthToken
+from .profiles import profile_etag, etag_matches, get_cached_etag, cache_etag, profile_response, not_modified
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Request and response logic shared by the views in views.py and their async
+# twins in async_views.py. Helpers that touch a database or a provider are
+# plain functions; the async views run them with run_blocking().
+
+
+def server_error(e, api_name):
+    logger.error(f"Unexpected error in {api_name} API: {str(e)}", exc_info=True)
+    return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def hasher_busy():
+    """Response for requests turned away by a saturated password hasher"""
+    return Response(
+        {"error": "Too many password checks in progress, please retry"},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={'Retry-After': '1'}
+    )
+
+
+def company_id_missing():
+    return Response({"error": "X-Company-ID header is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+
+def company_not_found():
+    return Response({"error": "Company not found"}, status=status.HTTP_404_NOT_FOUND)
+
+
+def request_company(request):
+    """Get the company named by X-Company-ID, as (company, None) or (None, error response)"""
+    company_id = request.headers.get('X-Company-ID')
+    if not company_id:
+        return None, company_id_missing()
+    try:
+        return get_company(company_id), None
+    except Company.DoesNotExist:
+        return None, company_not_found()
+
+
+async def arequest_company(request):
+    """Async variant of request_company(); cache hits stay on the event loop"""
+    company_id = request.headers.get('X-Company-ID')
+    if not company_id:
+        return None, company_id_missing()
+    try:
+        return await aget_company(company_id), None
+    except Company.DoesNotExist:
+        return None, company_not_found()
+
+
+def validation_failed(data, plan):
+    """Run a company's validation plan, returning an error response or None"""
+    try:
+        validate_data(data, plan)
+    except Exception as e:
+        return Response({"error": "Validation failed", "details": e.detail if hasattr(e, 'detail') else str(e)},
+                        status=status.HTTP_400_BAD_REQUEST)
+    return None
+
+
+def verification_field_of(company):
+    return 'email' if company.verification_method == 'email' else 'phone'
+
+
+def field_missing(data, verification_field, purpose='verification'):
+    """Error response if data lacks the field codes are sent to, otherwise None"""
+    if verification_field in data:
+        return None
+    return Response(
+        {"error": f"{verification_field.capitalize()} is required for {purpose}"},
+        status=status.HTTP_400_BAD_REQUEST
+    )
+
+
+def no_user_found(verification_field):
+    return Response({"error": f"No user found with this {verification_field}"}, status=status.HTTP_404_NOT_FOUND)
+
+
+def deliver_code(company, verification_field, template_type, recipient, code):
+    """Send a code by email or SMS, depending on the verification field"""
+    if verification_field == 'email':
+        return send_email(
+            company_id=company.id,
+            template_type=template_type,
+            recipient=recipient,
+            context={'code': code}
+        )
+    # phone verification
+    return send_sms(
+        company_id=company.id,
+        template_type=template_type,
+        phone_number=recipient,
+        context={'code': code}
+    )
+
+
+def issue_code(company, verification_field, recipient, template_type, message, requires_verification=False):
+    """
+    Create a verification code and deliver it, or queue it for the task runner.
+
+    message is the response text up to the recipient, e.g. "Verification code".
+    """
+    code = generate_verification_code()
+    verification = VerificationCode.objects.create(
+        company=company,
+        **{verification_field: recipient},
+        code=code,
+        expires_at=timezone.now() + timezone.timedelta(hours=1),
+        delivery_status='queued' if verification_dispatch_async() else 'sent'
+    )
+    extra = {"requires_verification": True} if requires_verification else {}
+
+    # Deliver in the background and let the client poll the delivery state
+    if verification.delivery_status == 'queued':
+        queue_verification(verification, template_type)
+        return Response({
+            "message": f"{message} is being sent to {recipient}",
+            "verification_id": verification.id,
+            **extra,
+            "state": verification.delivery_status
+        }, status=status.HTTP_202_ACCEPTED)
+
+    result = deliver_code(company, verification_field, template_type, recipient, code)
+    if not result['success']:
+        verification.delete()
+        return Response({"error": result['error']}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    return Response({
+        "message": f"{message} sent to {recipient}",
+        "verification_id": verification.id,
+        **extra
+    })
+
+
+def welcome_messages(company, data):
+    """Get the (task, payload) pairs for the welcome email and SMS a submission triggers"""
+    messages = []
+    if 'email' in data:
+        messages.append(('send_email', {
+            'company_id': company.id,
+            'template_type': 'welcome',
+            'recipient': data['email'],
+            'context': welcome_context(data),
+        }))
+    if 'phone' in data:
+        messages.append(('send_sms', {
+            'company_id': company.id,
+            'template_type': 'welcome',
+            'phone_number': data['phone'],
+            'context': welcome_context(data),
+        }))
+    return messages
+
+
+def submitted(inserted_id):
+    return Response({
+        "success": True,
+        "message": "Data submitted successfully",
+        "id": inserted_id
+    })
+
+
+def storage_error(e):
+    logger.error(f"Error in database operation: {str(e)}", exc_info=True)
+    return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def store_submission(company, data):
+    """Insert submitted data and queue the welcome messages"""
+    try:
+        inserted_id = insert_data(company, data)
+        for name, payload in welcome_messages(company, data):
+            enqueue(name, **payload)
+        return submitted(inserted_id)
+    except Exception as e:
+        return storage_error(e)
+
+
+def use_code(company, code, verification_field, data):
+    """
+    Find an unused code for the submitted identifier and mark it used.
+
+    Returns (verification, None) or (None, error response).
+    """
+    try:
+        verification = VerificationCode.objects.get(
+            company=company, code=code, is_used=False, **{verification_field: data[verification_field]}
+        )
+    except VerificationCode.DoesNotExist:
+        return None, Response({"error": "Invalid verification code"}, status=status.HTTP_400_BAD_REQUEST)
+
+    if verification.is_expired:
+        return None, Response({"error": "Verification code has expired"}, status=status.HTTP_400_BAD_REQUEST)
+
+    verification.is_used = True
+    verification.save()
+    return verification, None
+
+
+def verify_submit_input_error(code, data):
+    if not code:
+        return Response({"error": "Verification code is required"}, status=status.HTTP_400_BAD_REQUEST)
+    if not data:
+        return Response({"error": "Form data is required"}, status=status.HTTP_400_BAD_REQUEST)
+    return None
+
+
+def request_password_reset(company, data):
+    """Send a password reset code to an existing user"""
+    verification_field = verification_field_of(company)
+    error = field_missing(data, verification_field, 'password reset')
+    if error:
+        return error
+
+    if not find_user(company, {verification_field: data[verification_field]}):
+        return no_user_found(verification_field)
+
+    return issue_code(company, verification_field, data[verification_field], 'password_reset', 'Password reset code')
+
+
+def reset_input_error(data):
+    if not data.get('verification_code'):
+        return Response({"error": "Verification code is required"}, status=status.HTTP_400_BAD_REQUEST)
+    if not data.get('new_password'):
+        return Response({"error": "New password is required"}, status=status.HTTP_400_BAD_REQUEST)
+    if not data.get('confirm_password'):
+        return Response({"error": "Confirm password is required"}, status=status.HTTP_400_BAD_REQUEST)
+    if data['new_password'] != data['confirm_password']:
+        return Response({"error": "Passwords do not match"}, status=status.HTTP_400_BAD_REQUEST)
+    return None
+
+
+def reset_password(company, data):
+    """Check a password reset code and set the new password"""
+    error = reset_input_error(data)
+    if error:
+        return error
+
+    verification_field = verification_field_of(company)
+    error = field_missing(data, verification_field)
+    if error:
+        return error
+
+    verification, error = use_code(company, data['verification_code'], verification_field, data)
+    if error:
+        return error
+
+    user = find_user(company, {verification_field: data[verification_field]})
+    if not user:
+        return no_user_found(verification_field)
+
+    try:
+        update_user_password(company, user, data['new_password'])
+        return Response({
+            "success": True,
+            "message": "Password updated successfully"
+        })
+    except PasswordHasherBusy:
+        # Give the code back so the client can retry
+        verification.is_used = False
+        verification.save(update_fields=['is_used'])
+        return hasher_busy()
+    except Exception as e:
+        logger.error(f"Error updating password: {str(e)}", exc_info=True)
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def resend_code(company, data):
+    """Replace the pending codes of a user or registration with a new one"""
+    verification_field = verification_field_of(company)
+    error = field_missing(data, verification_field)
+    if error:
+        return error
+
+    recipient = data[verification_field]
+    pending = VerificationCode.objects.filter(company=company, **{verification_field: recipient}, is_used=False)
+
+    # Without a user, there must be a registration waiting for its code
+    if not find_user(company, {verification_field: recipient}) and not pending.exists():
+        return Response(
+            {"error": f"No pending registration found for this {verification_field}"},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+    # Invalidate any existing verification codes
+    pending.update(is_used=True)
+
+    return issue_code(company, verification_field, recipient, 'verification', 'New verification code')
+
+
+def login_identifier(data):
+    """Get the (field, value) a login names the user by, or (None, error response)"""
+    if 'password' not in data:
+        return None, Response({"error": "Password is required"}, status=status.HTTP_400_BAD_REQUEST)
+    if 'email' in data and data['email']:
+        return ('email', data['email']), None
+    if 'phone' in data and data['phone']:
+        return ('phone', data['phone']), None
+    return None, Response({"error": "Email or phone is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+
+def login_response(company, user, token_obj):
+    return Response({
+        "token": token_obj.token,
+        "expires_at": token_obj.expires_at,
+        **access_token_data(company, token_obj),
+        "user": {k: v for k, v in user.items() if k != 'password'}  # Exclude password from response
+    })
+
+
+def logout_token(request):
+    """
+    Get the scheme and token of a logout request's Authorization header,
+    as ((scheme, token), None) or (None, error response).
+    """
+    auth_header = request.headers.get('Authorization')
+    if not auth_header:
+        return None, Response({"error": "Authorization header is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+    # 'Token ' or, for access tokens, 'Bearer '
+    parts = auth_header.split()
+    if parts[0].lower() not in ('token', 'bearer') or len(parts) != 2:
+        return None, Response({"error": "Invalid Authorization header format"}, status=status.HTTP_400_BAD_REQUEST)
+    return (parts[0].lower(), parts[1]), None
+
+
+def logout_lookup(request, scheme, token, company):
+    """Get the AuthToken filter for the token being logged out, or None if it did not verify"""
+    if scheme == 'bearer':
+        # Access tokens carry their refresh token's id; request.auth is only set if it verified
+        if not isinstance(request.auth, AuthToken):
+            return None
+        return {'id': request.auth.id, 'company': company}
+    return {'token_hash': AuthToken.hash_token(token), 'company': company}
+
+
+def invalid_token():
+    return Response({"error": "Invalid token"}, status=status.HTTP_400_BAD_REQUEST)
+
+
+def logged_out():
+    return Response({"message": "Successfully logged out"})
+
+
+def cached_not_modified(token, if_none_match):
+    """Answer a profile revalidation from the ETag cache without serializing the profile"""
+    if if_none_match and token is not None:
+        etag = get_cached_etag(token.company_id, token.user_id)
+        if etag and etag_matches(etag, if_none_match):
+            return not_modified(etag)
+    return None
+
+
+def profile_result(profile, token, if_none_match):
+    etag = profile_etag(profile)
+    if token is not None:
+        cache_etag(token.company_id, token.user_id, etag)
+    if if_none_match and etag_matches(etag, if_none_match):
+        return not_modified(etag)
+    return profile_response(profile, etag)
+
+
+def parse_wait(request):
+    """Get the long-poll timeout requested with ?wait=, capped by VERIFICATION_STATUS_MAX_WAIT"""
+    try:
+        wait = float(request.query_params.get('wait', 0))
+    except ValueError:
+        wait = 0
+    return max(0, min(wait, getattr(settings, 'VERIFICATION_STATUS_MAX_WAIT', 10)))
+
+
+def is_uuid(value):
+    try:
+        uuid.UUID(value)
+        return True
+    except ValueError:
+        return False
+
+
+def status_company_error(company_id):
+    if not company_id:
+        return company_id_missing()
+    if not is_uuid(company_id):
+        return Response({"error": "Invalid X-Company-ID header"}, status=status.HTTP_400_BAD_REQUEST)
+    return None
+
+
+def verification_state(verification_id, delivery_status, delivery_error):
+    response = {"verification_id": verification_id, "state": delivery_status}
+    if delivery_status == 'failed':
+        response["error"] = delivery_error
+    return response
+
+
+def verification_status(verification_id, row):
+    if row is None:
+        return Response({"error": "Verification not found"}, status=status.HTTP_404_NOT_FOUND)
+    return Response(verification_state(verification_id, *row))
+
+
+def company_key_required():
+    return Response({"error": "X-Company-ID and X-API-Key headers are required"}, status=status.HTTP_401_UNAUTHORIZED)
+
+
+# Projected user fields must be plain column names
+FIELD_NAME_PATTERN = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+def introspection_input(data):
+    """Get (tokens, fields) from an introspection request, or (None, error response)"""
+    tokens = data.get('tokens')
+    fields = data.get('fields') or []
+
+    if not isinstance(tokens, list) or not all(isinstance(token, str) for token in tokens):
+        return None, Response({"error": "tokens must be a list of strings"}, status=status.HTTP_400_BAD_REQUEST)
+
+    max_tokens = getattr(settings, 'TOKEN_INTROSPECTION_MAX_TOKENS', 100)
+    if len(tokens) > max_tokens:
+        return None, Response({"error": f"At most {max_tokens} tokens can be introspected per request"},
+                              status=status.HTTP_400_BAD_REQUEST)
+
+    if not isinstance(fields, list) or not all(isinstance(f, str) and FIELD_NAME_PATTERN.match(f) for f in fields):
+        return None, Response({"error": "fields must be a list of column names"}, status=status.HTTP_400_BAD_REQUEST)
+    return (tokens, fields), None
+
+
+def introspect_tokens(company, tokens, fields=None):
+    """
+    Look up many tokens of a company with one AuthToken query
+
+    Returns one result per token, in order. When fields are given, the
+    projected user fields of active tokens are fetched in one tenant query.
+    """
+    now = timezone.now()
+    hashes = {token: AuthToken.hash_token(token) for token in tokens}
+    found = {
+        row['token_hash']: row
+        for row in AuthToken.objects.filter(
+            company=company, token_hash__in=set(hashes.values()), is_active=True
+        ).values('token_hash', 'user_id', 'expires_at')
+    }
+
+    results = []
+    for token in tokens:
+        row = found.get(hashes[token])
+        if row is None or row['expires_at'] <= now:
+            results.append({"token": token, "active": False})
+        else:
+            results.append({"token": token, "active": True, "user_id": row['user_id'], "expires_at": row['expires_at']})
+
+    if fields:
+        # Never hand out password hashes
+        fields = [field for field in fields if field != 'password']
+        users = get_users_by_ids(company, {r['user_id'] for r in results if r['active']}, fields)
+        for result in results:
+            if result['active']:
+                user = users.get(str(result['user_id']))
+                result['user'] = {k: v for k, v in user.items() if k in fields} if user else None
+
+    return results
+
+
+def refresh_input(company, data):
+    """Get the refresh token of a refresh request, or (None, error response)"""
+    if not company.jwt_access_tokens:
+        return None, Response({"error": "Access tokens are not enabled for this company"}, status=status.HTTP_400_BAD_REQUEST)
+
+    refresh_token = data.get('refresh_token')
+    if not refresh_token or not isinstance(refresh_token, str):
+        return None, Response({"error": "refresh_token is required"}, status=status.HTTP_400_BAD_REQUEST)
+    return refresh_token, None
+
+
+def refreshed(data):
+    if data is None:
+        return Response({"error": "Invalid or expired refresh token"}, status=status.HTTP_401_UNAUTHORIZED)
+    return Response(data)
+
+
+def revoke_tokens(company, data):
+    """Revoke every token of one user ({"user_id": ...}) or of the whole company ({"all": true})"""
+    user_id = data.get('user_id')
+    if data.get('all') is True:
+        revoked = AuthToken.revoke_all_for_company(company)
+    elif isinstance(user_id, (str, int)) and str(user_id):
+        revoked = AuthToken.revoke_all_for_user(company, str(user_id))
+    else:
+        return Response({"error": "user_id or all is required"}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({"revoked": revoked})
@@ -0,0 +1,177 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+from .models import ApiLog
+import logging
+
+logger = logging.getLogger(__name__)
+
+TABLE = ApiLog._meta.db_table
+DEFAULT_PARTITION = f'{TABLE}_default'
+
+# On PostgreSQL, ApiLog is a table partitioned by created_at into one table per
+# day or month (API_LOG_PARTITION_INTERVAL), plus a default partition for rows
+# outside every range. Queries that filter on created_at only touch the
+# partitions in range, and retention drops whole partitions. Other databases
+# keep a single table and purge old rows with batched deletes.
+
+
+def partitioning_supported():
+    return connection.vendor == 'postgresql'
+
+
+def partition_interval():
+    return getattr(settings, 'API_LOG_PARTITION_INTERVAL', 'month')
+
+
+def partition_bounds(moment, interval=None):
+    """Get the [start, end) range of the partition holding a timestamp"""
+    moment = moment.astimezone(dt_timezone.utc)
+    if (interval or partition_interval()) == 'day':
+        start = datetime(moment.year, moment.month, moment.day, tzinfo=dt_timezone.utc)
+        return start, start + timedelta(days=1)
+    start = datetime(moment.year, moment.month, 1, tzinfo=dt_timezone.utc)
+    end = datetime(moment.year + moment.month // 12, moment.month % 12 + 1, 1, tzinfo=dt_timezone.utc)
+    return start, end
+
+
+def partition_name(start, interval=None):
+    suffix = start.strftime('%Y%m%d' if (interval or partition_interval()) == 'day' else '%Y%m')
+    return f'{TABLE}_p{suffix}'
+
+
+def parse_partition_name(name):
+    """Get the [start, end) range of a partition from its name, or None for other tables"""
+    suffix = name[len(TABLE) + 2:] if name.startswith(f'{TABLE}_p') else ''
+    if not suffix.isdigit() or len(suffix) not in (6, 8):
+        return None
+    interval = 'day' if len(suffix) == 8 else 'month'
+    start = datetime.strptime(suffix, '%Y%m%d' if interval == 'day' else '%Y%m').replace(tzinfo=dt_timezone.utc)
+    return partition_bounds(start, interval)
+
+
+def is_partitioned():
+    if not partitioning_supported():
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = %s",
+            [TABLE]
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions():
+    """Get {partition name: (start, end)} for the ranged partitions of the ApiLog table"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits i "
+            "JOIN pg_class parent ON parent.oid = i.inhparent "
+            "JOIN pg_class child ON child.oid = i.inhrelid "
+            "WHERE parent.relname = %s",
+            [TABLE]
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = {}
+    for name in names:
+        bounds = parse_partition_name(name)
+        if bounds is not None:
+            partitions[name] = bounds
+    return partitions
+
+
+def create_partition(cursor, start, end, interval=None):
+    """
+    Create the partition for [start, end).
+
+    PostgreSQL refuses to create a partition while the default partition
+    holds rows in its range, so such rows are first moved into a standalone
+    table, which is then attached as the partition. Run it in a transaction.
+    """
+    quote = connection.ops.quote_name
+    name = quote(partition_name(start, interval))
+    default = quote(DEFAULT_PARTITION)
+
+    # Keep new rows out of the default partition until the range is covered
+    cursor.execute(f"LOCK TABLE {default} IN EXCLUSIVE MODE")
+    cursor.execute(f"SELECT 1 FROM {default} WHERE created_at >= %s AND created_at < %s LIMIT 1", [start, end])
+    if cursor.fetchone() is None:
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {quote(TABLE)} FOR VALUES FROM (%s) TO (%s)",
+            [start, end]
+        )
+        return
+
+    cursor.execute(f"CREATE TABLE {name} (LIKE {quote(TABLE)} INCLUDING DEFAULTS)")
+    cursor.execute(
+        f"INSERT INTO {name} SELECT * FROM {default} WHERE created_at >= %s AND created_at < %s", [start, end]
+    )
+    cursor.execute(f"DELETE FROM {default} WHERE created_at >= %s AND created_at < %s", [start, end])
+    # Indexes of the partitioned table are built on the new partition as it is attached
+    cursor.execute(f"ALTER TABLE {quote(TABLE)} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)", [start, end])
+
+
+def ensure_partitions(ahead=None):
+    """
+    Create the partitions for now and the next few intervals, so new rows never land in the default partition.
+
+    Each partition is created in its own transaction; one that fails is
+    logged and skipped. Returns (created partition names, failed partition names).
+    """
+    if not is_partitioned():
+        return [], []
+    ahead = getattr(settings, 'API_LOG_PARTITIONS_AHEAD', 2) if ahead is None else ahead
+    existing = list_partitions()
+    created = []
+    failed = []
+    start, end = partition_bounds(timezone.now())
+    for _ in range(ahead + 1):
+        name = partition_name(start)
+        if name not in existing:
+            try:
+                with transaction.atomic(), connection.cursor() as cursor:
+                    create_partition(cursor, start, end)
+                created.append(name)
+            except DatabaseError as e:
+                logger.error(f"Error creating API log partition {name}: {str(e)}")
+                failed.append(name)
+        start, end = partition_bounds(end)
+    return created, failed
+
+
+def purge_logs(cutoff):
+    """
+    Remove API logs created before cutoff.
+
+    Partitions that end by the cutoff are dropped whole; rows of a partition
+    that straddles it are kept until the whole partition has expired. Without
+    partitioning, rows are deleted in batches along the created_at index.
+    Returns (dropped partition names, deleted row count).
+    """
+    if not is_partitioned():
+        return [], delete_in_batches(ApiLog.objects.filter(created_at__lt=cutoff))
+
+    quote = connection.ops.quote_name
+    dropped = []
+    for name, (start, end) in sorted(list_partitions().items(), key=lambda item: item[1]):
+        if end > cutoff:
+            continue
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE {quote(name)}")
+        dropped.append(name)
+
+    # Stragglers that fell outside every range
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {quote(DEFAULT_PARTITION)} WHERE created_at < %s", [cutoff])
+        deleted = cursor.rowcount
+    return dropped, deleted
+
+
+def delete_in_batches(queryset, batch_size=5000):
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += ApiLog.objects.filter(id__in=ids).delete()[0]
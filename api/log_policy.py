@@ -0,0 +1,103 @@
+import base64
+import json
+import random
+import zlib
+from django.conf import settings
+from rest_framework.utils.encoders import JSONEncoder
+from companies.models import Company
+from companies.cache import tenant_cache, get_company
+
+# Credentials are never logged, whatever the allowlist says
+SENSITIVE_HEADERS = {'authorization', 'x-api-key', 'cookie', 'proxy-authorization'}
+
+# Marks bodies stored by encode_body() in an envelope; request bodies with this key are escaped
+ENVELOPE_KEY = '_log_envelope'
+
+
+class LogPolicy:
+    """How a company's API requests are logged: sampling, body size, headers and compression"""
+
+    def __init__(self, options=None):
+        options = options or {}
+        self.sample_rate = options.get('sample_rate', getattr(settings, 'API_LOG_SAMPLE_RATE', 1.0))
+        self.max_body_bytes = options.get('max_body_bytes', getattr(settings, 'API_LOG_MAX_BODY_BYTES', 65536))
+        self.compress_over = options.get('compress_over', getattr(settings, 'API_LOG_COMPRESS_OVER', 0))
+        headers = options.get('headers', getattr(settings, 'API_LOG_HEADERS', []))
+        self.headers = {header.lower() for header in headers} - SENSITIVE_HEADERS
+
+    def should_log(self, status_code):
+        """Log every non-2xx response, and the sampled share of 2xx responses"""
+        if not 200 <= status_code < 300 or self.sample_rate >= 1:
+            return True
+        return random.random() < self.sample_rate
+
+    def filter_headers(self, headers):
+        """Keep the allowlisted headers, or None if there are none"""
+        kept = {key: value for key, value in headers.items() if key.lower() in self.headers}
+        return kept or None
+
+    def encode_body(self, data, size_hint=None):
+        """
+        Prepare a request or response body for storage.
+
+        Bodies within the limits are stored as they are. Larger ones are
+        serialized, cut to max_body_bytes and/or zlib-compressed, and stored
+        in an envelope that decode_body() reads back. size_hint is the size
+        the body was received or rendered at as JSON, if known; bodies whose
+        hint is under half of every limit are not serialized again to measure.
+        """
+        limits = [limit for limit in (self.max_body_bytes, self.compress_over) if limit]
+        if data is None or not limits or (size_hint is not None and size_hint * 2 < min(limits)):
+            return escape_body(data)
+
+        raw = json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        size = len(raw)
+        truncated = bool(self.max_body_bytes) and size > self.max_body_bytes
+        compressed = bool(self.compress_over) and min(size, self.max_body_bytes or size) > self.compress_over
+        if not truncated and not compressed:
+            return escape_body(data)
+
+        if truncated:
+            raw = raw[:self.max_body_bytes]
+        if compressed:
+            kind, stored = 'zlib', base64.b64encode(zlib.compress(raw)).decode('ascii')
+        else:
+            kind, stored = 'text', raw.decode('utf-8', errors='ignore')
+        return {ENVELOPE_KEY: kind, 'size': size, 'truncated': truncated, 'data': stored}
+
+
+def escape_body(data):
+    """Wrap a body that has the envelope key itself, so decode_body() returns it unchanged"""
+    if isinstance(data, dict) and ENVELOPE_KEY in data:
+        return {ENVELOPE_KEY: 'body', 'data': data}
+    return data
+
+
+def decode_body(value):
+    """Read back a body stored by LogPolicy.encode_body()"""
+    if not isinstance(value, dict) or ENVELOPE_KEY not in value:
+        return value
+    kind = value[ENVELOPE_KEY]
+    if kind == 'body':
+        return value['data']
+    if kind == 'zlib':
+        text = zlib.decompress(base64.b64decode(value['data'])).decode('utf-8', errors='ignore')
+    elif kind == 'text':
+        text = value['data']
+    else:
+        return value
+    if value['truncated']:
+        return f"{text}...[truncated, {value['size']} bytes]"
+    return json.loads(text)
+
+
+def get_log_policy(company_id):
+    """
+    Get a company's logging policy from the tenant config cache, or None for
+    an unknown company. Misses are not cached, so made-up company IDs cannot
+    fill the cache.
+    """
+    try:
+        return tenant_cache.get(company_id, 'log_policy', lambda: LogPolicy(get_company(company_id).log_policy))
+    except Company.DoesNotExist:
+        return None
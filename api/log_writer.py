@@ -0,0 +1,134 @@
+import atexit
+import os
+import threading
+from collections import deque
+from django.conf import settings
+from django.db import close_old_connections
+from .models import ApiLog
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ApiLogWriter:
+    """
+    Bounded in-process queue of ApiLog records, written by a background thread.
+
+    Records are inserted with bulk_create once API_LOG_BATCH_SIZE are queued
+    or every API_LOG_FLUSH_INTERVAL milliseconds, so responses never wait on
+    the INSERT. When API_LOG_QUEUE_SIZE records are waiting, the oldest are
+    dropped and counted. Whatever is queued is written when the process exits.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._queue = deque()
+        self._ready = threading.Condition(self._lock)
+        self._thread = None
+        self._stopping = False
+        self._pid = os.getpid()
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    @property
+    def queue_size(self):
+        return getattr(settings, 'API_LOG_QUEUE_SIZE', 10000)
+
+    @property
+    def batch_size(self):
+        return getattr(settings, 'API_LOG_BATCH_SIZE', 200)
+
+    @property
+    def flush_interval(self):
+        return getattr(settings, 'API_LOG_FLUSH_INTERVAL', 500) / 1000
+
+    def write(self, log):
+        """Queue an unsaved ApiLog for the background thread"""
+        with self._lock:
+            if self._pid != os.getpid():
+                # Forked worker: the parent's queue and thread are not ours
+                self._reset()
+            if self._thread is None:
+                self._start()
+            if len(self._queue) >= self.queue_size:
+                self._queue.popleft()
+                self.dropped += 1
+            self._queue.append(log)
+            if len(self._queue) >= self.batch_size:
+                self._ready.notify()
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._run, name='api-log-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def _take(self):
+        batch = []
+        while self._queue and len(batch) < self.batch_size:
+            batch.append(self._queue.popleft())
+        return batch
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if len(self._queue) < self.batch_size and not self._stopping:
+                    self._ready.wait(self.flush_interval)
+                batch = self._take()
+                done = self._stopping and not self._queue
+            if batch:
+                self._write(batch)
+            if done:
+                return
+
+    def _write(self, batch):
+        try:
+            ApiLog.objects.bulk_create(batch)
+            self.written += len(batch)
+        except Exception as e:
+            logger.error(f"Error writing {len(batch)} API logs, retrying one by one: {str(e)}")
+            # Don't let one bad record cost the whole batch
+            for log in batch:
+                try:
+                    log.save()
+                    self.written += 1
+                except Exception:
+                    self.failed += 1
+        finally:
+            # This thread outlives requests, so nothing else closes its connection
+            close_old_connections()
+
+    def flush(self):
+        """Write everything queued so far on the calling thread"""
+        while True:
+            with self._lock:
+                batch = self._take()
+            if not batch:
+                return
+            self._write(batch)
+
+    def stop(self, timeout=5):
+        """Let the background thread drain the queue and exit"""
+        with self._lock:
+            thread = self._thread
+            self._stopping = True
+            self._ready.notify()
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+        # Anything the thread could not get to in time
+        self.flush()
+
+    def counters(self):
+        with self._lock:
+            return {
+                'queued': len(self._queue),
+                'written': self.written,
+                'dropped': self.dropped,
+                'failed': self.failed,
+            }
+
+
+api_log_writer = ApiLogWriter()
@@ -0,0 +1,38 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from api.log_partitions import ensure_partitions, purge_logs, is_partitioned
+
+
+class Command(BaseCommand):
+    help = (
+        'Create upcoming API log partitions and drop those past API_LOG_RETENTION_DAYS; '
+        'run it daily (e.g. from cron). Without PostgreSQL partitioning, old rows are deleted in batches.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int,
+                            help='Keep this many days of logs (default: API_LOG_RETENTION_DAYS, 0 keeps all)')
+
+    def handle(self, *args, **options):
+        created, failed = ensure_partitions()
+        for name in created:
+            self.stdout.write(f'Created partition {name}')
+        for name in failed:
+            self.stderr.write(self.style.ERROR(
+                f'Could not create partition {name}; rows for its range stay in the default partition '
+                f'until it is created by hand (see the log for the database error)'
+            ))
+
+        retention_days = options['retention_days']
+        if retention_days is None:
+            retention_days = getattr(settings, 'API_LOG_RETENTION_DAYS', 90)
+        if not retention_days:
+            return
+
+        dropped, deleted = purge_logs(timezone.now() - timedelta(days=retention_days))
+        for name in dropped:
+            self.stdout.write(f'Dropped partition {name}')
+        if deleted or not is_partitioned():
+            self.stdout.write(f'Deleted {deleted} expired log row(s)')
@@ -0,0 +1,101 @@
+import os
+import tempfile
+import time
+import uuid
+from django.core.management.base import BaseCommand, CommandError
+from companies.models import Company
+from api.db_handlers import (
+    get_db_connection, table_exists, create_table, select_statement, select_one, tenant_pool, close_quietly
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the login credential lookup: a fresh connection per lookup (as before pooling) '
+        'against one statement on a pooled connection. Without --company, a temporary SQLite '
+        'tenant with an indexed email column is built.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', help='ID of an existing company to measure against')
+        parser.add_argument('--field', default='email', help='Identifier column to look up by')
+        parser.add_argument('--value', help='Identifier value to look up (required with --company)')
+        parser.add_argument('--users', type=int, default=10000, help='Rows in the temporary tenant table')
+        parser.add_argument('--number', type=int, default=1000, help='Lookups per round')
+        parser.add_argument('--rounds', type=int, default=5)
+
+    def handle(self, *args, **options):
+        path = None
+        if options['company']:
+            if not options['value']:
+                raise CommandError('--value is required with --company')
+            try:
+                company = Company.objects.get(id=options['company'])
+            except Company.DoesNotExist:
+                raise CommandError('Company not found')
+            field, value = options['field'], options['value']
+        else:
+            fd, path = tempfile.mkstemp(suffix='.sqlite3')
+            os.close(fd)
+            company = Company(
+                id=uuid.uuid4(), name='benchmark', db_type='sqlite', connection_type='params',
+                db_name=path, target_table='users'
+            )
+            field = 'email'
+            value = f"user{options['users'] // 2}@example.com"
+            self._populate(company, options['users'])
+
+        def unpooled():
+            conn = get_db_connection(company)
+            try:
+                if company.db_type == 'mongodb':
+                    return conn[company.target_table].find_one({field: value})
+                if not table_exists(conn, company.target_table, company.db_type):
+                    return None
+                cursor = conn.cursor()
+                cursor.execute(select_statement(company.db_type, company.target_table, field), (value,))
+                return cursor.fetchone()
+            finally:
+                if company.db_type == 'mongodb':
+                    conn.client.close()
+                else:
+                    close_quietly(conn)
+
+        def pooled():
+            return select_one(company, field, value)
+
+        def measure(lookup):
+            best = None
+            found = None
+            for _ in range(options['rounds']):
+                started = time.perf_counter()
+                for _ in range(options['number']):
+                    found = lookup()
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            return best / options['number'], found is not None
+
+        try:
+            before, found = measure(unpooled)
+            after, _ = measure(pooled)
+        finally:
+            tenant_pool.clear()
+            if path:
+                os.remove(path)
+
+        self.stdout.write(f"{'backend':<12} {'found':>6} {'fresh (us)':>11} {'pooled (us)':>12} {'speedup':>8}")
+        self.stdout.write(
+            f"{company.db_type:<12} {str(found):>6} {before * 1e6:>11.1f} {after * 1e6:>12.1f} {before / after:>7.1f}x"
+        )
+
+    def _populate(self, company, users):
+        conn = get_db_connection(company)
+        try:
+            create_table(conn, company.target_table, {'email': '', 'name': '', 'password': ''}, company.db_type)
+            conn.executemany(
+                'INSERT INTO users (email, name, password) VALUES (?, ?, ?)',
+                [(f'user{i}@example.com', f'User {i}', 'x') for i in range(users)]
+            )
+            conn.commit()
+        finally:
+            conn.close()
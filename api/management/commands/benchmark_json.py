@@ -0,0 +1,93 @@
+import json
+import timeit
+from io import BytesIO
+import uuid
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from api.parsers import loads
+from api.renderers import FastJSONRenderer
+
+
+def sample_payloads():
+    """Typical request and response bodies for the submit, login and profile endpoints"""
+    user = {
+        'id': 1042,
+        'uuid': uuid.uuid4(),
+        'email': 'jane.doe@example.com',
+        'first_name': 'Jane',
+        'last_name': 'Doe',
+        'phone': '+15555550123',
+        'is_active': True,
+        'balance': Decimal('1250.75'),
+        'created_at': datetime(2024, 3, 1, 9, 30, 12, 345678, tzinfo=dt_timezone.utc),
+        'last_login': datetime(2024, 6, 18, 17, 5, 0, tzinfo=dt_timezone.utc),
+    }
+    submit_request = {
+        'email': 'jane.doe@example.com',
+        'first_name': 'Jane',
+        'last_name': 'Doe',
+        'phone': '+15555550123',
+        'password': 's3cret-Passw0rd',
+        'confirm_password': 's3cret-Passw0rd',
+        'company_name': 'Acme Corp',
+        'newsletter': True,
+        'age': 34,
+    }
+    return {
+        'submit': (
+            submit_request,
+            {'success': True, 'message': 'Data submitted successfully', 'id': 1042},
+        ),
+        'login': (
+            {'email': 'jane.doe@example.com', 'password': 's3cret-Passw0rd'},
+            {'token': 'f' * 64, 'expires_at': datetime.now(dt_timezone.utc), 'user': user},
+        ),
+        'profile': (
+            None,
+            {'user': user},
+        ),
+    }
+
+
+class Command(BaseCommand):
+    help = "Benchmark DRF's JSON renderer and parser against the orjson-backed classes used by the api app"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--number', type=int, default=20000, help='Operations per measurement')
+
+    def handle(self, *args, **options):
+        number = options['number']
+        drf_renderer = JSONRenderer()
+        fast_renderer = FastJSONRenderer()
+        drf_parser = JSONParser()
+
+        self.stdout.write(f"{'payload':<8} {'op':<7} {'DRF (us)':>9} {'fast (us)':>10} {'speedup':>8}")
+        for name, (request_body, response_data) in sample_payloads().items():
+            drf_bytes = drf_renderer.render(response_data)
+            fast_bytes = fast_renderer.render(response_data)
+            if json.loads(drf_bytes) != json.loads(fast_bytes):
+                self.stderr.write(f'{name}: rendered output differs\n  DRF:  {drf_bytes}\n  fast: {fast_bytes}')
+
+            results = [(
+                'render',
+                timeit.timeit(lambda: drf_renderer.render(response_data), number=number),
+                timeit.timeit(lambda: fast_renderer.render(response_data), number=number),
+            )]
+
+            if request_body is not None:
+                body = json.dumps(request_body).encode()
+                results.append((
+                    'parse',
+                    timeit.timeit(lambda: drf_parser.parse(BytesIO(body)), number=number),
+                    timeit.timeit(lambda: loads(body), number=number),
+                ))
+
+            for op, drf_time, fast_time in results:
+                self.stdout.write(
+                    f"{name:<8} {op:<7} {drf_time / number * 1e6:>9.2f} {fast_time / number * 1e6:>10.2f} "
+                    f"{drf_time / fast_time:>7.1f}x"
+                )
+
@@ -0,0 +1,52 @@
+import timeit
+from django.core.management.base import BaseCommand, CommandError
+from api.parsers import loads, msgpack_loads, msgpack
+from api.renderers import FastJSONRenderer, MessagePackRenderer
+from .benchmark_json import sample_payloads
+
+
+class Command(BaseCommand):
+    help = 'Compare MessagePack with JSON on payload size and encode/decode cost for typical API bodies'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--number', type=int, default=20000, help='Operations per measurement')
+        parser.add_argument('--batch', type=int, default=100,
+                            help='Also measure a batch submission of this many records')
+
+    def handle(self, *args, **options):
+        if msgpack is None:
+            raise CommandError('msgpack is not installed')
+
+        number = options['number']
+        json_renderer = FastJSONRenderer()
+        msgpack_renderer = MessagePackRenderer()
+
+        bodies = []
+        for name, (request_body, response_data) in sample_payloads().items():
+            if request_body is not None:
+                bodies.append((f'{name} req', request_body))
+            bodies.append((f'{name} resp', response_data))
+        if options['batch']:
+            submit_request = sample_payloads()['submit'][0]
+            bodies.append((f"batch x{options['batch']}", [dict(submit_request) for _ in range(options['batch'])]))
+
+        self.stdout.write(
+            f"{'body':<14} {'JSON (B)':>9} {'msgpack (B)':>12} "
+            f"{'JSON enc/dec (us)':>18} {'msgpack enc/dec (us)':>21}"
+        )
+        for name, data in bodies:
+            runs = max(1, number // (len(data) if isinstance(data, list) else 1))
+            json_bytes = json_renderer.render(data)
+            msgpack_bytes = msgpack_renderer.render(data)
+            if loads(json_bytes) != msgpack_loads(msgpack_bytes):
+                self.stderr.write(f'{name}: decoded MessagePack differs from JSON')
+
+            json_encode = timeit.timeit(lambda: json_renderer.render(data), number=runs) / runs * 1e6
+            json_decode = timeit.timeit(lambda: loads(json_bytes), number=runs) / runs * 1e6
+            msgpack_encode = timeit.timeit(lambda: msgpack_renderer.render(data), number=runs) / runs * 1e6
+            msgpack_decode = timeit.timeit(lambda: msgpack_loads(msgpack_bytes), number=runs) / runs * 1e6
+
+            self.stdout.write(
+                f"{name:<14} {len(json_bytes):>9} {len(msgpack_bytes):>12} "
+                f"{f'{json_encode:.2f}/{json_decode:.2f}':>18} {f'{msgpack_encode:.2f}/{msgpack_decode:.2f}':>21}"
+            )
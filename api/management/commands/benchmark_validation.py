@@ -0,0 +1,107 @@
+import timeit
+from django.core.management.base import BaseCommand
+from rest_framework import serializers
+from api.validators import validate_data, validate_batch, compile_validation_rules
+
+
+def build_rules(field_count, custom=False):
+    """Build a rule set mixing the supported rule types across field_count fields"""
+    rules = {}
+    for i in range(field_count):
+        kind = i % 4
+        if kind == 0:
+            rules[f'email_{i}'] = {'required': True, 'type': 'email', 'max_length': 255}
+        elif kind == 1:
+            rules[f'name_{i}'] = {'required': True, 'type': 'string', 'min_length': 2, 'max_length': 100}
+        elif kind == 2:
+            rules[f'code_{i}'] = {'type': 'string', 'pattern': r'^[A-Z]{2}[0-9]{4}$'}
+        else:
+            rules[f'age_{i}'] = {'type': 'number'}
+            if custom:
+                rules[f'age_{i}']['custom_validator'] = (
+                    "def validate_custom(value): return True if value >= 18 else 'Must be at least 18 years old'"
+                )
+    return rules
+
+
+def build_record(rules):
+    """Build a record that passes the rules from build_rules"""
+    record = {}
+    for field in rules:
+        if field.startswith('email_'):
+            record[field] = 'user@example.com'
+        elif field.startswith('name_'):
+            record[field] = 'Jane Doe'
+        elif field.startswith('code_'):
+            record[field] = 'AB1234'
+        else:
+            record[field] = 42
+    return record
+
+
+class Command(BaseCommand):
+    help = 'Benchmark validation with rules compiled per request against a cached validation plan'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='5,10,25,50,100', help='Comma-separated field counts')
+        parser.add_argument('--number', type=int, default=2000, help='Validations per measurement')
+        parser.add_argument('--custom', action='store_true', help='Include custom_validator rules')
+        parser.add_argument('--batch', type=int, default=0,
+                            help='Also compare row-by-row and columnar validation of this many records')
+
+    def handle(self, *args, **options):
+        number = options['number']
+        self.stdout.write(f"{'fields':>6} {'per call (us)':>14} {'cached plan (us)':>17} {'speedup':>8}")
+
+        for size in [int(s) for s in options['sizes'].split(',')]:
+            rules = build_rules(size, custom=options['custom'])
+            record = build_record(rules)
+            plan = compile_validation_rules(rules)
+
+            # Sanity check: both paths must accept the record
+            try:
+                validate_data(record, rules)
+                validate_data(record, plan)
+            except serializers.ValidationError as e:
+                self.stderr.write(f"Benchmark record failed validation: {e.detail}")
+                return
+
+            uncached = min(timeit.repeat(lambda: validate_data(record, rules), number=number, repeat=3))
+            cached = min(timeit.repeat(lambda: validate_data(record, plan), number=number, repeat=3))
+
+            self.stdout.write(
+                f"{size:>6} {uncached / number * 1e6:>14.2f} {cached / number * 1e6:>17.2f} "
+                f"{uncached / cached:>7.1f}x"
+            )
+
+        if options['batch']:
+            self.benchmark_batch(options)
+
+    def benchmark_batch(self, options):
+        count = options['batch']
+        self.stdout.write('')
+        self.stdout.write(f"Batches of {count} records")
+        self.stdout.write(f"{'fields':>6} {'row by row (ms)':>16} {'columnar (ms)':>14} {'speedup':>8}")
+
+        for size in [int(s) for s in options['sizes'].split(',')]:
+            rules = build_rules(size, custom=options['custom'])
+            plan = compile_validation_rules(rules)
+            records = [build_record(rules) for _ in range(count)]
+
+            def row_by_row():
+                results = []
+                for record in records:
+                    try:
+                        plan.validate(record)
+                        results.append({})
+                    except serializers.ValidationError as e:
+                        results.append(e.detail)
+                return results
+
+            row_time = min(timeit.repeat(row_by_row, number=1, repeat=3))
+            column_time = min(timeit.repeat(lambda: validate_batch(records, plan), number=1, repeat=3))
+
+            self.stdout.write(
+                f"{size:>6} {row_time * 1e3:>16.2f} {column_time * 1e3:>14.2f} "
+                f"{row_time / column_time:>7.1f}x"
+            )
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from api.models import AuthToken
+
+
+class Command(BaseCommand):
+    help = 'Deactivate tokens that expired while still active; run it periodically (e.g. from cron)'
+
+    def handle(self, *args, **options):
+        count = AuthToken.deactivate_expired()
+        self.stdout.write(f'Deactivated {count} expired token(s)')
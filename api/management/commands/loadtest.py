@@ -0,0 +1,70 @@
+import json
+import statistics
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Send concurrent requests to a running server and report throughput and latency. '
+        'Run it against the WSGI and ASGI deployments with the same worker count to compare them.'
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='Full URL, e.g. http://127.0.0.1:8000/api/profile/')
+        parser.add_argument('--method', default='GET')
+        parser.add_argument('--requests', type=int, default=1000, help='Total number of requests')
+        parser.add_argument('--concurrency', type=int, default=50, help='Concurrent client connections')
+        parser.add_argument('--header', action='append', default=[], help='"Name: value", may be repeated')
+        parser.add_argument('--data', help='JSON request body')
+
+    def handle(self, *args, **options):
+        headers = {}
+        for header in options['header']:
+            name, sep, value = header.partition(':')
+            if not sep:
+                raise CommandError(f'Invalid header: {header}')
+            headers[name.strip()] = value.strip()
+
+        body = None
+        if options['data']:
+            body = json.loads(options['data'])
+
+        local = threading.local()
+
+        def send(_):
+            # One keep-alive session per client thread
+            session = getattr(local, 'session', None)
+            if session is None:
+                session = local.session = requests.Session()
+            started = time.perf_counter()
+            try:
+                response = session.request(options['method'], options['url'], headers=headers, json=body)
+                code = response.status_code
+            except requests.RequestException as e:
+                code = type(e).__name__
+            return code, time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            results = list(executor.map(send, range(options['requests'])))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency for _, latency in results)
+        codes = Counter(code for code, _ in results)
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1e3
+
+        self.stdout.write(f"Requests:    {len(results)} in {elapsed:.2f}s")
+        self.stdout.write(f"Throughput:  {len(results) / elapsed:.1f} req/s")
+        self.stdout.write(
+            f"Latency ms:  mean {statistics.mean(latencies) * 1e3:.1f}  p50 {percentile(0.5):.1f}  "
+            f"p95 {percentile(0.95):.1f}  p99 {percentile(0.99):.1f}"
+        )
+        self.stdout.write(f"Status:      {dict(codes)}")
@@ -0,0 +1,32 @@
+import signal
+from django.core.management.base import BaseCommand
+from api.tasks import Worker
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (welcome emails and SMS) from the BackgroundJob table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4, help='Jobs run concurrently by this worker')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--lock-timeout', type=int, default=300,
+                            help='Seconds after which a running job is assumed lost and requeued')
+        parser.add_argument('--once', action='store_true', help='Exit once no jobs are due')
+
+    def handle(self, *args, **options):
+        worker = Worker(
+            threads=options['threads'],
+            poll_interval=options['poll_interval'],
+            lock_timeout=options['lock_timeout'],
+        )
+
+        # Finish running jobs on shutdown instead of abandoning them
+        def shutdown(signum, frame):
+            self.stdout.write('Shutting down after running jobs finish...')
+            worker.stop()
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+
+        self.stdout.write(f'Worker {worker.name} started with {options["threads"]} threads')
+        worker.run(once=options['once'])
+        self.stdout.write(self.style.SUCCESS('Worker stopped'))
@@ -1,17 +1,27 @@
 
 from .models import ApiLog
+from .parsers import get_payload
+from .concurrency import concurrency_limiter, endpoint_class
+from .log_writer import api_log_writer
+from .log_policy import get_log_policy
 import json
+import time
+import uuid
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils import timezone
 from django.utils.deprecation import MiddlewareMixin
 
 class ApiLogMiddleware(MiddlewareMixin):
     """Middleware for logging API requests and responses"""
     
     def process_request(self, request):
-        # Store request data for later use
+        # Store request data for later use; the body is parsed once and shared with DRF
         request.api_log_data = {
             'method': request.method,
             'path': request.path,
-            'body': request.body.decode('utf-8') if request.body else None,
+            'payload': get_payload(request),
             'headers': {key: value for key, value in request.headers.items()},
             'ip_address': self.get_client_ip(request),
             'user_agent': request.META.get('HTTP_USER_AGENT', ''),
@@ -26,6 +36,19 @@ class ApiLogMiddleware(MiddlewareMixin):
         company_id = request.headers.get('X-Company-ID')
         if not company_id:
             return response
+        try:
+            company_id = uuid.UUID(company_id)
+        except ValueError:
+            # Not a company any log could belong to
+            return response
+        
+        # Sample successful responses and shape what is stored per the company's policy
+        policy = get_log_policy(company_id)
+        if policy is None:
+            # Unknown company; its log row could not reference it
+            return response
+        if not policy.should_log(response.status_code):
+            return response
         
         # Get request data
         if hasattr(request, 'api_log_data'):
@@ -34,38 +57,57 @@ class ApiLogMiddleware(MiddlewareMixin):
             request_data = {
                 'method': request.method,
                 'path': request.path,
-                'body': None,
-                'headers': {},
+                'payload': None,
+                'headers': {key: value for key, value in request.headers.items()},
                 'ip_address': self.get_client_ip(request),
                 'user_agent': request.META.get('HTTP_USER_AGENT', ''),
             }
         
-        # Parse request body as JSON
-        try:
-            request_body = json.loads(request_data['body']) if request_data['body'] else None
-        except:
-            request_body = request_data['body']
+        # Reuse the request body already parsed for the view
+        payload = request_data['payload']
+        request_body = payload.log_data() if payload else None
         
-        # Parse response body as JSON
-        try:
-            response_body = json.loads(response.content.decode('utf-8')) if response.content else None
-        except:
-            response_body = response.content.decode('utf-8') if response.content else None
+        # Log the data the response was rendered from rather than re-parsing it
+        response_body = self.get_response_data(response)
         
-        # Create API log
-        ApiLog.objects.create(
+        log = ApiLog(
             company_id=company_id,
             endpoint=request_data['path'],
             method=request_data['method'],
-            request_data=request_body,
-            response_data=response_body,
+            request_data=policy.encode_body(request_body, payload.json_size() if payload else None),
+            response_data=policy.encode_body(response_body, self.get_response_size(response)),
+            headers=policy.filter_headers(request_data['headers']),
             status_code=response.status_code,
             ip_address=request_data['ip_address'],
             user_agent=request_data['user_agent'],
+            created_at=timezone.now(),
         )
+        if getattr(settings, 'API_LOG_ASYNC', False):
+            # Written in batches by a background thread
+            api_log_writer.write(log)
+        else:
+            log.save()
         
         return response
     
+    def get_response_data(self, response):
+        """Get response body for logging, preferring the data a DRF response was rendered from"""
+        if hasattr(response, 'data'):
+            return response.data
+        if getattr(response, 'streaming', False) or not response.content:
+            return None
+        content = response.content.decode('utf-8', errors='replace')
+        try:
+            return json.loads(content)
+        except ValueError:
+            return content
+    
+    def get_response_size(self, response):
+        """Get the size of a rendered JSON response, or None if it was not rendered as JSON"""
+        if getattr(response, 'streaming', False) or 'json' not in response.get('Content-Type', ''):
+            return None
+        return len(response.content)
+    
     def get_client_ip(self, request):
         """Get client IP address from request"""
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
@@ -74,3 +116,57 @@ class ApiLogMiddleware(MiddlewareMixin):
         else:
             ip = request.META.get('REMOTE_ADDR')
         return ip
+
+
+class ConcurrencyLimitMiddleware:
+    """
+    Shed API requests beyond the adaptive concurrency limit of their endpoint
+    class with an immediate 503, instead of letting every request time out
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        name = endpoint_class(request.path)
+        if name is None:
+            return self.get_response(request)
+        if not concurrency_limiter.acquire(name):
+            return self.shed_response()
+
+        started = time.monotonic()
+        failed = True
+        try:
+            response = self.get_response(request)
+            failed = response.status_code >= 500
+            return response
+        finally:
+            concurrency_limiter.release(name, time.monotonic() - started, failed)
+
+    async def __acall__(self, request):
+        name = endpoint_class(request.path)
+        if name is None:
+            return await self.get_response(request)
+        if not concurrency_limiter.acquire(name):
+            return self.shed_response()
+
+        started = time.monotonic()
+        failed = True
+        try:
+            response = await self.get_response(request)
+            failed = response.status_code >= 500
+            return response
+        finally:
+            concurrency_limiter.release(name, time.monotonic() - started, failed)
+
+    def shed_response(self):
+        response = JsonResponse({"error": "Server is busy, please retry"}, status=503)
+        response['Retry-After'] = '1'
+        return response
@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-19 10:39
+
+import rest_framework.utils.encoders
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_authtoken'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='apilog',
+            name='request_data',
+            field=models.JSONField(blank=True, encoder=rest_framework.utils.encoders.JSONEncoder, null=True),
+        ),
+        migrations.AlterField(
+            model_name='apilog',
+            name='response_data',
+            field=models.JSONField(blank=True, encoder=rest_framework.utils.encoders.JSONEncoder, null=True),
+        ),
+    ]
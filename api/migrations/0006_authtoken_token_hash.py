@@ -0,0 +1,52 @@
+# Generated by Django 5.2 on 2026-10-19 11:40
+
+import hashlib
+from django.db import migrations, models
+
+
+def hash_tokens(apps, schema_editor):
+    # Replace every stored token with its digest; clients keep using the tokens they hold
+    AuthToken = apps.get_model('api', 'AuthToken')
+    batch = []
+    for token in AuthToken.objects.only('id', 'token').iterator(chunk_size=1000):
+        token.token_hash = hashlib.sha256(token.token.encode()).hexdigest()
+        batch.append(token)
+        if len(batch) >= 1000:
+            AuthToken.objects.bulk_update(batch, ['token_hash'])
+            batch = []
+    if batch:
+        AuthToken.objects.bulk_update(batch, ['token_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_revokedaccesstoken'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authtoken',
+            name='token_hash',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        # Raw tokens cannot be recovered from their digests, so this migration is irreversible
+        migrations.RunPython(hash_tokens),
+        migrations.AlterField(
+            model_name='authtoken',
+            name='token_hash',
+            field=models.CharField(max_length=64, unique=True),
+        ),
+        migrations.RemoveField(
+            model_name='authtoken',
+            name='token',
+        ),
+        migrations.AddIndex(
+            model_name='authtoken',
+            index=models.Index(fields=['company', 'user_id', 'is_active'], name='api_token_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='authtoken',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['expires_at'], name='api_token_active_expiry_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-19 11:21
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_authtoken_token_hash'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='apilog',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 11:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_apilog_created_at_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apilog',
+            name='headers',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2 on 2026-10-19 11:30
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def partition_api_logs(apps, schema_editor):
+    # Only PostgreSQL has declarative partitioning; other databases keep the plain table
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    from api.log_partitions import partition_bounds, create_partition
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('ALTER TABLE api_apilog RENAME TO api_apilog_unpartitioned')
+        # The primary key of a partitioned table has to include the partition column
+        cursor.execute(
+            'CREATE TABLE api_apilog (LIKE api_apilog_unpartitioned INCLUDING DEFAULTS, PRIMARY KEY (id, created_at)) '
+            'PARTITION BY RANGE (created_at)'
+        )
+        cursor.execute('CREATE SEQUENCE api_apilog_pid_seq OWNED BY api_apilog.id')
+        cursor.execute("ALTER TABLE api_apilog ALTER COLUMN id SET DEFAULT nextval('api_apilog_pid_seq')")
+        cursor.execute('CREATE TABLE api_apilog_default PARTITION OF api_apilog DEFAULT')
+
+        # One partition per interval from the oldest row to the ones created ahead of time
+        cursor.execute('SELECT MIN(created_at) FROM api_apilog_unpartitioned')
+        oldest = cursor.fetchone()[0] or timezone.now()
+        last_start, _ = partition_bounds(timezone.now())
+        for _ in range(getattr(settings, 'API_LOG_PARTITIONS_AHEAD', 2)):
+            last_start = partition_bounds(partition_bounds(last_start)[1])[0]
+        start, end = partition_bounds(oldest)
+        while start <= last_start:
+            create_partition(cursor, start, end)
+            start, end = partition_bounds(end)
+
+        cursor.execute('INSERT INTO api_apilog SELECT * FROM api_apilog_unpartitioned')
+        cursor.execute("SELECT setval('api_apilog_pid_seq', COALESCE(MAX(id), 0) + 1, false) FROM api_apilog")
+        cursor.execute('DROP TABLE api_apilog_unpartitioned')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_apilog_headers'),
+    ]
+
+    operations = [
+        # The partitioned table works like the plain one, so there is nothing to undo
+        migrations.RunPython(partition_api_logs, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='apilog',
+            index=models.Index(fields=['company_id', 'created_at'], name='api_log_company_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='apilog',
+            index=models.Index(fields=['created_at'], name='api_log_time_idx'),
+        ),
+    ]
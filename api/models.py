@@ -1,7 +1,12 @@
 
 from django.db import models
 from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
 from companies.models import Company
+from asgiref.sync import sync_to_async
+from .auth_cache import invalidate_tokens, token_cache_enabled
+from .log_policy import decode_body
+import hashlib
 import uuid
 import secrets
 
@@ -12,44 +17,170 @@ class ApiLog(models.Model):
     company_id = models.UUIDField()
     endpoint = models.CharField(max_length=255)
     method = models.CharField(max_length=10)
-    request_data = models.JSONField(blank=True, null=True)
-    response_data = models.JSONField(blank=True, null=True)
+    request_data = models.JSONField(blank=True, null=True, encoder=JSONEncoder)
+    # Stored from the unrendered response data, so it takes the same encoder as DRF's JSONRenderer
+    response_data = models.JSONField(blank=True, null=True, encoder=JSONEncoder)
+    # Request headers on the company's logging allowlist
+    headers = models.JSONField(blank=True, null=True)
     status_code = models.IntegerField()
     ip_address = models.GenericIPAddressField(blank=True, null=True)
     user_agent = models.TextField(blank=True, null=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Set when the response is logged, not when a batched writer inserts the row
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    
+    class Meta:
+        # On PostgreSQL the table is also partitioned by created_at (see api.log_partitions)
+        indexes = [
+            models.Index(fields=['company_id', 'created_at'], name='api_log_company_time_idx'),
+            models.Index(fields=['created_at'], name='api_log_time_idx'),
+        ]
     
     def __str__(self):
         return f"{self.method} {self.endpoint} - {self.status_code}"
+    
+    def get_request_data(self):
+        """Get the request body, decompressed if the logging policy compressed it"""
+        return decode_body(self.request_data)
+    
+    def get_response_data(self):
+        """Get the response body, decompressed if the logging policy compressed it"""
+        return decode_body(self.response_data)
 
 
 
 class AuthToken(models.Model):
+    """Model for user tokens; only a SHA-256 digest of each token is stored"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     company = models.ForeignKey(Company, on_delete=models.CASCADE)
     user_id = models.CharField(max_length=255)  # Store the user ID from the company's database
-    token = models.CharField(max_length=64, unique=True)
+    token_hash = models.CharField(max_length=64, unique=True)  # Hex SHA-256 of the token given to the client
     created_at = models.DateTimeField(auto_now_add=True)
     expires_at = models.DateTimeField()
     is_active = models.BooleanField(default=True)
 
+    # The raw token, only known on the instance returned by generate_token()
+    token = None
+
+    class Meta:
+        indexes = [
+            # Login and revoke-all deactivate a user's or a company's active tokens
+            models.Index(fields=['company', 'user_id', 'is_active'], name='api_token_user_idx'),
+            # Expiry sweeps only look at tokens that are still active
+            models.Index(fields=['expires_at'], condition=models.Q(is_active=True), name='api_token_active_expiry_idx'),
+        ]
+
     def __str__(self):
-        return f"{self.user_id} - {self.token[:10]}..."
+        return f"{self.user_id} - {self.token_hash[:10]}..."
+
+    @staticmethod
+    def hash_token(token):
+        """Get the digest stored for a raw token"""
+        return hashlib.sha256(token.encode()).hexdigest()
 
     @classmethod
     def generate_token(cls, company, user_id, expiry_days=30):
         # Generate a secure random token
         token_value = secrets.token_hex(32)
         
-        # Deactivate any existing tokens for this user
-        cls.objects.filter(company=company, user_id=user_id, is_active=True).update(is_active=False)
+        # Deactivate any existing tokens for this user, and the access tokens issued from them
+        cls.deactivate(
+            cls.objects.filter(company=company, user_id=user_id, is_active=True),
+            revoke_access=company.jwt_access_tokens
+        )
         
         # Create a new token
         token = cls.objects.create(
             company=company,
             user_id=user_id,
-            token=token_value,
+            token_hash=cls.hash_token(token_value),
             expires_at=timezone.now() + timezone.timedelta(days=expiry_days)
         )
+        token.token = token_value
         
-        return token
\ No newline at end of file
+        return token
+
+    @classmethod
+    async def agenerate_token(cls, company, user_id, expiry_days=30):
+        # Async variant of generate_token for async views
+        return await sync_to_async(cls.generate_token)(company, user_id, expiry_days)
+
+    @classmethod
+    def deactivate(cls, tokens, revoke_access=False):
+        """
+        Deactivate a queryset of tokens with a single UPDATE, returning how many changed.
+
+        Their authentication cache entries are dropped; with revoke_access, the
+        signed access tokens issued from them are revoked as well.
+        """
+        rows = []
+        if revoke_access or token_cache_enabled():
+            rows = list(tokens.values_list('id', 'token_hash'))
+        count = tokens.update(is_active=False)
+        if token_cache_enabled():
+            # Revokes the ids too, which covers the access tokens
+            invalidate_tokens(rows)
+        elif revoke_access and rows:
+            from .access_tokens import revoke_access_token_ids
+            revoke_access_token_ids([token_id for token_id, _ in rows])
+        return count
+
+    @classmethod
+    def revoke_all_for_user(cls, company, user_id):
+        """Deactivate every active token of one user"""
+        return cls.deactivate(
+            cls.objects.filter(company=company, user_id=user_id, is_active=True),
+            revoke_access=company.jwt_access_tokens
+        )
+
+    @classmethod
+    def revoke_all_for_company(cls, company):
+        """Deactivate every active token of a company"""
+        return cls.deactivate(
+            cls.objects.filter(company=company, is_active=True),
+            revoke_access=company.jwt_access_tokens
+        )
+
+    @classmethod
+    def deactivate_expired(cls):
+        """Deactivate tokens that expired while still active"""
+        return cls.deactivate(cls.objects.filter(is_active=True, expires_at__lte=timezone.now()))
+
+
+class RevokedAccessToken(models.Model):
+    """Refresh token whose signed access tokens (and cached authentications) were revoked before they expire"""
+    jti = models.UUIDField(primary_key=True)  # AuthToken.id, carried in the access token's jti claim
+    expires_at = models.DateTimeField(db_index=True)  # When the last access token issued for it expires
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"{self.jti} until {self.expires_at}"
+
+
+class BackgroundJob(models.Model):
+    """Model for side effects queued by the API and run by the runworker command"""
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('dead', 'Dead'),  # Gave up after max_attempts; kept for inspection and manual retry
+    )
+
+    task = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, encoder=JSONEncoder)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=255, blank=True, null=True)
+    locked_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='api_job_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task} #{self.id} - {self.status}"
@@ -0,0 +1,151 @@
+import json
+from django.http.request import RawPostDataException
+from rest_framework import exceptions
+from rest_framework.parsers import BaseParser, JSONParser
+from rest_framework.utils.json import strict_constant
+
+try:
+    import orjson
+except ImportError:
+    # Fall back to the standard library parser
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    # MessagePack support is only enabled when msgpack is installed
+    msgpack = None
+
+MSGPACK_MEDIA_TYPES = ('application/msgpack', 'application/x-msgpack')
+
+
+def loads(body):
+    """
+    Parse a UTF-8 JSON body, rejecting NaN and Infinity like DRF's JSONParser.
+
+    orjson is used when installed; anything it rejects is parsed again with the
+    json module so errors carry DRF's messages and integers beyond 64 bits
+    still load.
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(body.decode('utf-8'), parse_constant=strict_constant)
+
+
+def msgpack_loads(body):
+    """Parse a MessagePack body, raising ValueError if it is malformed"""
+    try:
+        return msgpack.unpackb(body, raw=False)
+    except (ValueError, TypeError, msgpack.UnpackException) as e:
+        raise ValueError(str(e) or type(e).__name__)
+
+
+class ParsedPayload:
+    """
+    A request body, parsed at most once.
+
+    One instance is attached to each request so the logging middleware, DRF's
+    parsers and the fast path all share a single parse. Bodies are JSON unless
+    the request is MessagePack.
+    """
+
+    def __init__(self, body, loads=loads):
+        self.body = body
+        self.loads = loads
+        self._parsed = False
+        self._data = None
+        self._error = None
+
+    def parse(self):
+        """Return the parsed body, raising ValueError if it is malformed"""
+        if not self._parsed:
+            self._parsed = True
+            if self.body:
+                try:
+                    self._data = self.loads(self.body)
+                except ValueError as e:
+                    self._error = e
+        if self._error is not None:
+            raise self._error
+        return self._data
+
+    def json_size(self):
+        """Get the size of the body if it is valid JSON, otherwise None"""
+        if not self.body or self.loads is not loads:
+            return None
+        try:
+            self.parse()
+        except ValueError:
+            return None
+        return len(self.body)
+
+    def log_data(self):
+        """Get the body as stored in ApiLog: the parsed data if possible, otherwise the raw text"""
+        if not self.body:
+            return None
+        try:
+            return self.parse()
+        except ValueError:
+            return self.body.decode('utf-8', errors='replace')
+
+
+def get_payload(request):
+    """Get the shared ParsedPayload for a Django HttpRequest, creating it on first use"""
+    payload = getattr(request, 'parsed_payload', None)
+    if payload is None:
+        if msgpack is not None and request.content_type in MSGPACK_MEDIA_TYPES:
+            payload = ParsedPayload(request.body, msgpack_loads)
+        else:
+            payload = ParsedPayload(request.body)
+        request.parsed_payload = payload
+    return payload
+
+
+class SharedJSONParser(JSONParser):
+    """
+    JSONParser that reuses the request's shared payload instead of parsing the
+    stream again, and parses it with orjson when available.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', 'utf-8')
+        request = parser_context.get('request')
+        if request is None or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            payload = get_payload(request._request)
+        except RawPostDataException:
+            # The body was consumed as a stream; fall back to parsing that stream
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return payload.parse()
+        except ValueError as exc:
+            raise exceptions.ParseError('JSON parse error - %s' % str(exc))
+
+
+class MessagePackParser(BaseParser):
+    """Parses MessagePack request bodies, sharing the request's parsed payload"""
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = (parser_context or {}).get('request')
+        payload = None
+        if request is not None:
+            try:
+                payload = get_payload(request._request)
+            except RawPostDataException:
+                # The body was consumed as a stream; parse that stream instead
+                pass
+        if payload is None:
+            payload = ParsedPayload(stream.read(), msgpack_loads)
+
+        try:
+            return payload.parse()
+        except ValueError as exc:
+            raise exceptions.ParseError('MessagePack parse error - %s' % str(exc))
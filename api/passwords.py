@@ -0,0 +1,120 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import bcrypt
+from django.conf import settings
+
+BCRYPT_PREFIXES = ('$2b$', '$2a$', '$2y$')
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the password hasher queue is full; callers answer 503"""
+
+
+def work_factor(company):
+    """Get the bcrypt cost for a company's passwords"""
+    return company.bcrypt_rounds or getattr(settings, 'PASSWORD_BCRYPT_ROUNDS', 12)
+
+
+def hash_rounds(stored_password):
+    """Get the cost of a bcrypt hash, or None if the password is not a bcrypt hash"""
+    if not stored_password.startswith(BCRYPT_PREFIXES):
+        return None
+    try:
+        return int(stored_password[4:6])
+    except ValueError:
+        return None
+
+
+# Run in the pool's worker processes; they must only depend on bcrypt
+
+def _hashpw(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _checkpw(password, stored_password, rounds):
+    """
+    Check a password against its stored value, and hash it again with the
+    current cost if the stored value is plaintext or uses another cost.
+    Returns (matches, new_hash).
+    """
+    current = hash_rounds(stored_password)
+    if current is not None:
+        matches = bcrypt.checkpw(password.encode('utf-8'), stored_password.encode('utf-8'))
+    else:
+        # Legacy plaintext storage
+        matches = password == stored_password
+    if matches and current != rounds:
+        return True, _hashpw(password, rounds)
+    return matches, None
+
+
+class PasswordHasher:
+    """
+    Process pool for bcrypt, sized to the cores, so hashing does not hold
+    request threads' CPU time or the GIL. At most PASSWORD_HASHER_QUEUE_SIZE
+    jobs wait behind the running ones; beyond that, calls fail fast with
+    PasswordHasherBusy instead of queueing behind a login storm.
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    @property
+    def workers(self):
+        workers = getattr(settings, 'PASSWORD_HASHER_WORKERS', None)
+        return (os.cpu_count() or 1) if workers is None else workers
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                workers = self.workers
+                self._slots = threading.BoundedSemaphore(workers + getattr(settings, 'PASSWORD_HASHER_QUEUE_SIZE', 32))
+                # Forking a threaded server process is unsafe; start clean interpreters instead
+                self._executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+            return self._executor, self._slots
+
+    def run(self, func, *args):
+        if not self.workers:
+            # No pool configured: hash on the calling thread
+            return func(*args)
+
+        executor, slots = self._pool()
+        if not slots.acquire(blocking=False):
+            raise PasswordHasherBusy('Too many password checks in progress')
+        try:
+            return executor.submit(func, *args).result()
+        except BrokenProcessPool:
+            # A worker died; start a fresh pool for the next call
+            self.shutdown()
+            raise
+        finally:
+            slots.release()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+password_hasher = PasswordHasher()
+
+
+def hash_password(company, password):
+    """Hash a password with the company's work factor"""
+    return password_hasher.run(_hashpw, password, work_factor(company))
+
+
+def check_password(company, password, stored_password):
+    """
+    Check a password against its stored value.
+
+    Returns (matches, new_hash); new_hash is set when the stored value should
+    be replaced because it is plaintext or uses an outdated cost.
+    """
+    return password_hasher.run(_checkpw, password, stored_password, work_factor(company))
@@ -0,0 +1,69 @@
+import hashlib
+import json
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+
+def project_profile(user):
+    """Get the user fields returned by the profile endpoint"""
+    return {k: v for k, v in user.items() if k != 'password'}
+
+
+def profile_etag(profile):
+    """Compute a weak ETag from a projected profile, stable across key order and renderers"""
+    body = json.dumps(profile, cls=JSONEncoder, sort_keys=True, separators=(',', ':'))
+    return 'W/"%s"' % hashlib.blake2b(body.encode(), digest_size=16).hexdigest()
+
+
+def etag_matches(etag, if_none_match):
+    """Weak comparison of an ETag against an If-None-Match header"""
+    etags = parse_etags(if_none_match)
+    if '*' in etags:
+        return True
+    opaque = etag.removeprefix('W/')
+    return any(candidate.removeprefix('W/') == opaque for candidate in etags)
+
+
+def _cache_key(company_id, user_id):
+    return f'profile_etag:{company_id}:{user_id}'
+
+
+def get_cached_etag(company_id, user_id):
+    """Get the last ETag computed for a user's profile, if the ETag cache is enabled"""
+    if not getattr(settings, 'PROFILE_ETAG_CACHE_TTL', 0):
+        return None
+    return cache.get(_cache_key(company_id, user_id))
+
+
+def cache_etag(company_id, user_id, etag):
+    ttl = getattr(settings, 'PROFILE_ETAG_CACHE_TTL', 0)
+    if ttl:
+        cache.set(_cache_key(company_id, user_id), etag, ttl)
+
+
+def invalidate_profile_etag(company_id, user_id):
+    """Forget a user's cached ETag; call this from every path that writes user records"""
+    if getattr(settings, 'PROFILE_ETAG_CACHE_TTL', 0):
+        cache.delete(_cache_key(company_id, user_id))
+
+
+def profile_response(profile, etag):
+    """Build a profile response carrying its ETag"""
+    return with_validators(Response({"user": profile}), etag)
+
+
+def not_modified(etag):
+    return with_validators(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+
+
+def with_validators(response, etag):
+    response['ETag'] = etag
+    # The profile depends on who is asking; shared caches must not serve it to others
+    response['Cache-Control'] = 'private, no-cache'
+    patch_vary_headers(response, ['Authorization', 'X-Company-ID'])
+    return response
@@ -0,0 +1,70 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    # Fall back to DRF's json-based rendering
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    # MessagePack support is only enabled when msgpack is installed
+    msgpack = None
+
+# JavaScript line terminators, escaped by DRF so output stays a strict JS subset
+LINE_SEPARATOR = '\u2028'.encode()
+PARAGRAPH_SEPARATOR = '\u2029'.encode()
+
+# DRF's handling of types the fast encoders do not support natively
+encode_default = encoders.JSONEncoder().default
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer backed by orjson when it is installed.
+
+    UUIDs and datetimes are encoded natively, in the same format as DRF's
+    encoder; Decimals and other types fall back to DRF's encoder. Indented
+    output (e.g. for the browsable API) and non-default UNICODE_JSON or
+    COMPACT_JSON settings are rendered by DRF's JSONRenderer.
+    """
+
+    options = (orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=encode_default, option=self.options)
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits; let DRF encode it or raise its own error
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if LINE_SEPARATOR in ret or PARAGRAPH_SEPARATOR in ret:
+            ret = ret.replace(LINE_SEPARATOR, b'\\u2028').replace(PARAGRAPH_SEPARATOR, b'\\u2029')
+        return ret
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Renders responses as MessagePack.
+
+    Types MessagePack has no equivalent for (UUIDs, datetimes, Decimals) go
+    through DRF's JSON encoder, so clients get the same values as from JSON.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=encode_default, use_bin_type=True)
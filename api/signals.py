@@ -0,0 +1,18 @@
+from django.db.models.signals import post_save, post_delete
+from .auth_cache import invalidate_tokens
+
+
+def auth_token_saved(sender, instance, created, **kwargs):
+    """Drop a token's cache entry when it is changed, revoking it everywhere if it was deactivated"""
+    if not created:
+        invalidate_tokens([(instance.id, instance.token_hash)], revoke=not instance.is_active)
+
+
+def auth_token_deleted(sender, instance, **kwargs):
+    """Drop a token's cache entry when it is deleted"""
+    invalidate_tokens([(instance.id, instance.token_hash)])
+
+
+post_save.connect(auth_token_saved, sender='api.AuthToken', dispatch_uid='auth_token_save')
+post_delete.connect(auth_token_deleted, sender='api.AuthToken', dispatch_uid='auth_token_delete')
+
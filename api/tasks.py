@@ -0,0 +1,335 @@
+import os
+import random
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+from email_service.utils import send_email
+from verification.models import VerificationCode
+from verification.utils import send_sms
+from .models import BackgroundJob
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TaskError(Exception):
+    """Raised by a task to report a failure that should be retried"""
+
+
+class Task:
+    """A registered background task and its execution limits"""
+
+    def __init__(self, name, function, concurrency=None, max_attempts=None, on_failure=None):
+        self.name = name
+        self.function = function
+        self.on_failure = on_failure
+        self._concurrency = concurrency
+        self._max_attempts = max_attempts
+
+    @property
+    def concurrency(self):
+        # Settings override the defaults given at registration
+        limits = getattr(settings, 'BACKGROUND_TASK_CONCURRENCY', {})
+        return limits.get(self.name, self._concurrency)
+
+    @property
+    def max_attempts(self):
+        return self._max_attempts or getattr(settings, 'BACKGROUND_TASK_MAX_ATTEMPTS', 5)
+
+    def failed(self, payload, error):
+        """Run the task's on_failure hook once it has given up on a job"""
+        if self.on_failure is None:
+            return
+        try:
+            self.on_failure(error, **payload)
+        except Exception as e:
+            logger.error(f"Error in failure handler of task {self.name}: {str(e)}", exc_info=True)
+
+
+tasks = {}
+
+
+def task(name, concurrency=None, max_attempts=None, on_failure=None):
+    """
+    Register a function as a background task under the given name.
+
+    on_failure(error, **payload) is called when a job is dead-lettered.
+    """
+    def register(function):
+        tasks[name] = Task(name, function, concurrency, max_attempts, on_failure)
+        return function
+    return register
+
+
+@task('send_email', concurrency=8)
+def send_email_task(**kwargs):
+    result = send_email(**kwargs)
+    if not result['success']:
+        raise TaskError(result['error'])
+
+
+@task('send_sms', concurrency=4)
+def send_sms_task(**kwargs):
+    result = send_sms(**kwargs)
+    if not result['success']:
+        raise TaskError(result['error'])
+
+
+def verification_failed(error, verification_id, template_type):
+    VerificationCode.objects.filter(id=verification_id).update(
+        delivery_status='failed',
+        delivery_error=str(error)
+    )
+
+
+@task('send_verification', max_attempts=3, on_failure=verification_failed)
+def send_verification_task(verification_id, template_type):
+    verification = VerificationCode.objects.filter(id=verification_id).first()
+    if verification is None or verification.is_used or verification.is_expired:
+        # Superseded by a newer code, or too late to be of use
+        return
+
+    if verification.email:
+        result = send_email(
+            company_id=verification.company_id,
+            template_type=template_type,
+            recipient=verification.email,
+            context={'code': verification.code}
+        )
+    else:  # phone verification
+        result = send_sms(
+            company_id=verification.company_id,
+            template_type=template_type,
+            phone_number=verification.phone,
+            context={'code': verification.code}
+        )
+
+    if not result['success']:
+        raise TaskError(result['error'])
+    VerificationCode.objects.filter(id=verification_id).update(delivery_status='sent', delivery_error=None)
+
+
+def enqueue(name, **payload):
+    """
+    Queue a task to run in the background.
+
+    When BACKGROUND_TASKS is off the task runs immediately on the calling
+    thread and failures are only logged, as the views behaved before the
+    runner existed.
+    """
+    registered = tasks[name]
+
+    if not getattr(settings, 'BACKGROUND_TASKS', False):
+        try:
+            registered.function(**payload)
+        except Exception as e:
+            logger.error(f"Error running task {name}: {str(e)}", exc_info=True)
+            registered.failed(payload, e)
+        return None
+
+    return BackgroundJob.objects.create(
+        task=name,
+        payload=payload,
+        max_attempts=registered.max_attempts
+    )
+
+
+def welcome_context(data):
+    """Template context for welcome messages: the submitted data without any password fields"""
+    return {key: value for key, value in data.items() if 'password' not in key.lower()}
+
+
+def verification_dispatch_async():
+    """Whether verification codes are delivered by the task runner instead of in the request"""
+    return getattr(settings, 'VERIFICATION_ASYNC_DISPATCH', False) and getattr(settings, 'BACKGROUND_TASKS', False)
+
+
+def queue_verification(verification, template_type):
+    """Hand delivery of a verification code created in the 'queued' state to the task runner"""
+    return enqueue('send_verification', verification_id=verification.id, template_type=template_type)
+
+
+def backoff_delay(attempts):
+    """Seconds to wait before the next attempt: exponential with full jitter, capped"""
+    base = getattr(settings, 'BACKGROUND_TASK_BACKOFF', 5)
+    cap = getattr(settings, 'BACKGROUND_TASK_BACKOFF_MAX', 3600)
+    return random.uniform(0, min(cap, base * 2 ** (attempts - 1)))
+
+
+class Worker:
+    """
+    Claims queued jobs from BackgroundJob and runs them in a thread pool.
+
+    Jobs are claimed with a conditional UPDATE, so several workers can share
+    one jobs table on any database backend. Per-task concurrency limits apply
+    to each worker process.
+    """
+
+    def __init__(self, threads=4, poll_interval=1.0, lock_timeout=300):
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self.lock_timeout = lock_timeout
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self._running = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._next_release = 0.0
+        self._next_purge = 0.0
+
+    def stop(self):
+        self._stopping.set()
+
+    def run(self, once=False):
+        """Run jobs until stop() is called, or until the queue is drained if once is set"""
+        with ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='runworker') as executor:
+            while not self._stopping.is_set():
+                self.release_stale()
+                self.purge_finished()
+                claimed = self.claim(executor)
+                if once and not claimed and not self.busy():
+                    break
+                if not claimed:
+                    self._stopping.wait(self.poll_interval)
+            logger.info("Worker stopping, waiting for running jobs")
+        close_old_connections()
+
+    def busy(self):
+        with self._lock:
+            return any(self._running.values())
+
+    def free_slots(self):
+        """Get how many more jobs of each task this worker may start"""
+        with self._lock:
+            total = self.threads - sum(self._running.values())
+            slots = {}
+            for name, registered in tasks.items():
+                limit = registered.concurrency
+                free = total if limit is None else min(total, limit - self._running.get(name, 0))
+                if free > 0:
+                    slots[name] = free
+            return total, slots
+
+    def claim(self, executor):
+        """Claim due jobs within the free slots and submit them, returning how many were claimed"""
+        total, slots = self.free_slots()
+        if total <= 0 or not slots:
+            return 0
+
+        candidates = BackgroundJob.objects.filter(
+            status='queued',
+            run_at__lte=timezone.now(),
+            task__in=list(slots)
+        ).order_by('run_at').values_list('id', 'task')[:total * 2]
+
+        claimed = 0
+        for job_id, name in candidates:
+            if claimed >= total or slots.get(name, 0) <= 0:
+                continue
+            # Only one worker's UPDATE can move a job out of the queued state
+            won = BackgroundJob.objects.filter(id=job_id, status='queued').update(
+                status='running',
+                locked_by=self.name,
+                locked_at=timezone.now(),
+                attempts=F('attempts') + 1
+            )
+            if not won:
+                continue
+
+            slots[name] -= 1
+            claimed += 1
+            with self._lock:
+                self._running[name] = self._running.get(name, 0) + 1
+            executor.submit(self.execute, job_id, name)
+
+        return claimed
+
+    def execute(self, job_id, name):
+        try:
+            job = BackgroundJob.objects.get(id=job_id)
+            try:
+                tasks[name].function(**job.payload)
+            except Exception as e:
+                self.fail(job, e)
+            else:
+                self.locked(job_id).update(
+                    status='done',
+                    locked_by=None,
+                    locked_at=None,
+                    last_error=None
+                )
+        except Exception as e:
+            logger.error(f"Error updating background job {job_id}: {str(e)}", exc_info=True)
+        finally:
+            with self._lock:
+                self._running[name] -= 1
+            close_old_connections()
+
+    def locked(self, job_id):
+        """Filter to a job only while this worker still holds it, so a requeued job is not overwritten"""
+        return BackgroundJob.objects.filter(id=job_id, status='running', locked_by=self.name)
+
+    def fail(self, job, error):
+        """Schedule a retry with backoff, or dead-letter the job once it is out of attempts"""
+        message = f"{type(error).__name__}: {error}"
+        if job.attempts >= job.max_attempts:
+            logger.error(f"Background job {job.task} #{job.id} failed permanently: {message}")
+            self.locked(job.id).update(
+                status='dead',
+                locked_by=None,
+                locked_at=None,
+                last_error=message
+            )
+            tasks[job.task].failed(job.payload, error)
+            return
+
+        delay = backoff_delay(job.attempts)
+        logger.warning(f"Background job {job.task} #{job.id} failed, retrying in {delay:.1f}s: {message}")
+        self.locked(job.id).update(
+            status='queued',
+            run_at=timezone.now() + timedelta(seconds=delay),
+            locked_by=None,
+            locked_at=None,
+            last_error=message
+        )
+
+    def release_stale(self):
+        """Requeue jobs left running by a worker that died mid-job"""
+        if time.monotonic() < self._next_release:
+            return
+        self._next_release = time.monotonic() + min(self.lock_timeout, 60)
+
+        cutoff = timezone.now() - timedelta(seconds=self.lock_timeout)
+        stale = BackgroundJob.objects.filter(status='running', locked_at__lt=cutoff)
+        # Jobs that already used their last attempt are dead-lettered instead
+        stale.filter(attempts__gte=F('max_attempts')).update(
+            status='dead', locked_by=None, locked_at=None, last_error='Worker lock timed out'
+        )
+        stale.filter(attempts__lt=F('max_attempts')).update(
+            status='queued', locked_by=None, locked_at=None, last_error='Worker lock timed out'
+        )
+
+    def purge_finished(self):
+        """Delete done and dead jobs past their retention, so payloads are not kept indefinitely"""
+        if time.monotonic() < self._next_purge:
+            return
+        self._next_purge = time.monotonic() + 3600
+
+        now = timezone.now()
+        retention = (
+            ('done', getattr(settings, 'BACKGROUND_TASK_DONE_RETENTION_DAYS', 1)),
+            ('dead', getattr(settings, 'BACKGROUND_TASK_DEAD_RETENTION_DAYS', 14)),
+        )
+        for job_status, days in retention:
+            if days:
+                deleted, _ = BackgroundJob.objects.filter(
+                    status=job_status,
+                    updated_at__lt=now - timedelta(days=days)
+                ).delete()
+                if deleted:
+                    logger.info(f"Purged {deleted} {job_status} background job(s)")
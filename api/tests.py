@@ -1,3 +1,143 @@
-from django.test import TestCase
+from datetime import timedelta
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from companies.models import Company
+from .access_tokens import revoked_access_tokens
+from .concurrency import AIMDLimit
+from .auth_cache import cache_token, get_cached_token
+from .custom_validators import CustomValidator, UnsafeValidatorError, ValidatorTimeoutError
+from .log_policy import ENVELOPE_KEY, LogPolicy, decode_body
+from .models import AuthToken, RevokedAccessToken
 
-# Create your tests here.
+
+class CustomValidatorSandboxTests(SimpleTestCase):
+    def assertRejected(self, source):
+        with self.assertRaises(UnsafeValidatorError):
+            CustomValidator(source)
+
+    def test_generator_frame_escape_is_rejected(self):
+        # Walks generator frames back to a module whose globals hold builtins
+        self.assertRejected(
+            "holder = []\n"
+            "def gen():\n"
+            "    yield holder[0].gi_frame.f_back\n"
+            "def validate_custom(value):\n"
+            "    g = gen()\n"
+            "    holder.append(g)\n"
+            "    for f in g:\n"
+            "        while 'builtins' not in f.f_globals:\n"
+            "            f = f.f_back\n"
+            "        return f.f_globals['builtins'].eval(\"__import__('os').getcwd()\", f.f_globals)\n"
+        )
+
+    def test_frame_attributes_are_rejected(self):
+        self.assertRejected("def validate_custom(value):\n    return (x for x in value).gi_frame")
+        self.assertRejected("def validate_custom(value):\n    return validate_custom.gi_code")
+
+    def test_unsafe_syntax_is_rejected(self):
+        self.assertRejected("import os\ndef validate_custom(value):\n    return True")
+        self.assertRejected("def validate_custom(value):\n    def inner():\n        return True\n    return inner()")
+        self.assertRejected("def validate_custom(value):\n    return (lambda: True)()")
+        self.assertRejected("async def validate_custom(value):\n    await value")
+        self.assertRejected("def validate_custom(value):\n    try:\n        pass\n    except Exception:\n        pass")
+        self.assertRejected("class X:\n    pass\ndef validate_custom(value):\n    return True")
+        self.assertRejected("def validate_custom(value):\n    return '{0.__class__.__mro__}'.format(value)")
+        self.assertRejected("def validate_custom(value):\n    return value.__class__")
+
+    def test_plain_validator_runs(self):
+        validator = CustomValidator(
+            "def validate_custom(value):\n"
+            "    parts = value.strip().split('-')\n"
+            "    if len(parts) == 2 and all(part.isdigit() for part in parts):\n"
+            "        return True\n"
+            "    return f'Invalid code: {value}'\n"
+        )
+        self.assertIs(validator('12-34'), True)
+        self.assertEqual(validator('abc'), 'Invalid code: abc')
+
+    def test_time_budget_is_enforced(self):
+        validator = CustomValidator("def validate_custom(value):\n    while True:\n        pass")
+        with self.assertRaises(ValidatorTimeoutError):
+            validator(1)
+
+
+class LogPolicyBodyTests(SimpleTestCase):
+    def test_client_bodies_round_trip(self):
+        policy = LogPolicy({'max_body_bytes': 1000, 'compress_over': 500})
+        for body in ({'_log_size': 1}, {ENVELOPE_KEY: 'zlib', 'data': 'x'}, {ENVELOPE_KEY: 'body'}, 'text', [1, 2]):
+            self.assertEqual(decode_body(policy.encode_body(body)), body)
+            self.assertEqual(decode_body(LogPolicy({'max_body_bytes': 0}).encode_body(body)), body)
+
+    def test_large_bodies_are_truncated_or_compressed(self):
+        body = {'items': ['x' * 10] * 100}
+        self.assertEqual(decode_body(LogPolicy({'max_body_bytes': 0, 'compress_over': 100}).encode_body(body)), body)
+        stored = LogPolicy({'max_body_bytes': 100}).encode_body(body)
+        self.assertTrue(stored['truncated'])
+        self.assertTrue(decode_body(stored).endswith('...[truncated, 1311 bytes]'))
+
+    def test_small_size_hint_skips_measuring(self):
+        body = {'items': ['x' * 10] * 100}
+        policy = LogPolicy({'max_body_bytes': 100})
+        self.assertIs(policy.encode_body(body, size_hint=10), body)
+        self.assertIsNot(policy.encode_body(body, size_hint=1311), body)
+
+
+@override_settings(LOAD_SHEDDING_INITIAL_LIMIT=10, LOAD_SHEDDING_TARGET_LATENCY=0.5, LOAD_SHEDDING_BACKOFF=0.5)
+class AIMDLimitTests(SimpleTestCase):
+    def finish(self, limit, latency, failed=False, count=1):
+        for _ in range(count):
+            limit.in_flight += 1
+            limit.on_done(latency, failed)
+
+    def test_burst_of_slow_requests_cuts_once(self):
+        limit = AIMDLimit('normal')
+        limit.in_flight = 10
+        for _ in range(10):
+            # Admitted before the first completion, so all within one window
+            limit.on_done(1.0, False)
+        self.assertEqual(limit.limit, 5)
+
+    def test_clean_window_grows_by_one(self):
+        limit = AIMDLimit('normal')
+        limit.in_flight = 20
+        self.finish(limit, 0.01, count=9)
+        self.assertEqual(limit.limit, 10)
+        self.finish(limit, 0.01)
+        self.assertEqual(limit.limit, 11)
+
+    def test_failure_restarts_the_window(self):
+        limit = AIMDLimit('normal')
+        limit.in_flight = 20
+        self.finish(limit, 0.01, count=9)
+        self.finish(limit, 0.01, failed=True)
+        self.assertEqual(limit.limit, 5)
+        self.finish(limit, 0.01, count=4)
+        self.assertEqual(limit.limit, 5)
+
+
+@override_settings(AUTH_TOKEN_CACHE_TTL=60)
+class AuthTokenCacheTests(TestCase):
+    def setUp(self):
+        self.company = Company.objects.create(
+            name='Acme', db_type='sqlite', connection_type='string', target_table='users'
+        )
+
+    def test_token_revoked_on_another_worker_is_not_served_from_cache(self):
+        token_obj = AuthToken.generate_token(self.company, '1')
+        cache_token(token_obj)
+        self.assertIsNotNone(get_cached_token(token_obj.token_hash))
+
+        # Another worker deactivates the token; this worker's cache entry is untouched
+        AuthToken.objects.filter(id=token_obj.id).update(is_active=False)
+        RevokedAccessToken.objects.create(jti=token_obj.id, expires_at=timezone.now() + timedelta(minutes=1))
+        revoked_access_tokens.poll(force=True)
+
+        self.assertIsNone(get_cached_token(token_obj.token_hash))
+
+    def test_deactivation_revokes_the_token(self):
+        token_obj = AuthToken.generate_token(self.company, '1')
+        cache_token(token_obj)
+        AuthToken.revoke_all_for_user(self.company, '1')
+
+        self.assertIsNone(get_cached_token(token_obj.token_hash))
+        self.assertTrue(RevokedAccessToken.objects.filter(jti=token_obj.id).exists())
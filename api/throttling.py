@@ -1,12 +1,202 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from rest_framework.throttling import SimpleRateThrottle
+from companies.models import Company
+from companies.cache import tenant_cache, get_company
+import logging
 
-from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
+logger = logging.getLogger(__name__)
 
-class CompanyAnonRateThrottle(AnonRateThrottle):
+
+class ThrottleStore:
+    """
+    Rate limit state shared by every worker process on a node.
+
+    Each key holds one number, its GCRA theoretical arrival time, in a local
+    SQLite file in WAL mode. A check is a single upsert, which SQLite applies
+    atomically across processes, so limits hold for the node as a whole
+    instead of once per worker.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._next_prune = 0.0
+
+    @property
+    def path(self):
+        return getattr(settings, 'THROTTLE_DB_PATH', None) or os.path.join(
+            tempfile.gettempdir(), 'universal_api_throttle.sqlite3'
+        )
+
+    def _connection(self):
+        # One connection per thread, reopened in forked workers
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            # Throttle state is disposable; don't wait for the disk
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute('CREATE TABLE IF NOT EXISTS throttle (key TEXT PRIMARY KEY, tat REAL NOT NULL) WITHOUT ROWID')
+            local.conn, local.pid = conn, os.getpid()
+        return local.conn
+
+    def acquire(self, key, interval, burst, now):
+        """
+        Take one request from the key's allowance.
+
+        Returns 0 if the request is allowed, otherwise the seconds until it would be.
+        """
+        conn = self._connection()
+        allowed = conn.execute(
+            'INSERT INTO throttle (key, tat) VALUES (?1, ?2 + ?3) '
+            'ON CONFLICT (key) DO UPDATE SET tat = max(tat, ?2) + ?3 '
+            'WHERE max(tat, ?2) + ?3 - ?4 <= ?2 '
+            'RETURNING tat',
+            (key, now, interval, burst)
+        ).fetchone()
+        self._prune(conn, now)
+        if allowed:
+            return 0
+        row = conn.execute('SELECT tat FROM throttle WHERE key = ?', (key,)).fetchone()
+        return max(row[0] + interval - burst - now, 0) if row else 0
+
+    def _prune(self, conn, now):
+        # Keys whose arrival time has passed hold no state; drop them once a minute
+        if now < self._next_prune:
+            return
+        self._next_prune = now + 60
+        conn.execute('DELETE FROM throttle WHERE tat < ?', (now,))
+
+    def clear(self):
+        self._connection().execute('DELETE FROM throttle')
+
+
+throttle_store = ThrottleStore()
+
+
+class SharedRateThrottle(SimpleRateThrottle):
+    """
+    GCRA throttle kept in the node-wide ThrottleStore.
+
+    A rate of N/period allows bursts of up to N requests, refilled at one
+    request per period/N seconds, with O(1) state per key.
+    """
+
+    def get_limit(self, request, view):
+        """Get the (key, emission interval, burst tolerance in seconds) for a request, or None to skip it"""
+        if self.rate is None:
+            return None
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return None
+        return key, self.duration / self.num_requests, self.duration
+
+    def allow_request(self, request, view):
+        limit = self.get_limit(request, view)
+        if limit is None:
+            return True
+
+        self.key, interval, tolerance = limit
+        try:
+            self._wait = throttle_store.acquire(self.key, interval, tolerance, time.time())
+        except sqlite3.Error as e:
+            # Never turn a broken throttle store into an outage
+            logger.error(f"Error checking throttle {self.key}: {str(e)}")
+            return True
+        return self._wait == 0
+
+    def wait(self):
+        return self._wait
+
+
+class AnonRateThrottle(SharedRateThrottle):
+    """
+    Throttle for anonymous requests based on client IP
+    """
+    scope = 'anon'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': self.get_ident(request)
+        }
+
+
+class UserRateThrottle(SharedRateThrottle):
+    """
+    Throttle for authenticated requests based on user, or client IP
+    """
+    scope = 'user'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': ident
+        }
+
+
+class CompanyRatePlanMixin:
+    """
+    Apply the rate plan of the company named in X-Company-ID.
+
+    Views name their endpoint scope in throttle_scope. A plan entry for that
+    scope gives the endpoint its own budget; other endpoints share the plan's
+    "default" entry, or the throttle's rate from DEFAULT_THROTTLE_RATES. Plans
+    are parsed once and kept in the tenant config cache.
+    """
+
+    def get_limit(self, request, view):
+        limit = super().get_limit(request, view)
+        company = self.get_company(request)
+        if limit is None or company is None:
+            return limit
+
+        key, interval, tolerance = limit
+        plan = tenant_cache.get(company.id, 'rate_plan', lambda: self.parse_plan(company.rate_plan))
+        scope = getattr(view, 'throttle_scope', None)
+        if scope in plan:
+            interval, tolerance = plan[scope]
+            key = f'{key}_{scope}'
+        elif 'default' in plan:
+            interval, tolerance = plan['default']
+        return key, interval, tolerance
+
+    def get_company(self, request):
+        company_id = request.headers.get('X-Company-ID')
+        if not company_id:
+            return None
+        try:
+            return get_company(company_id)
+        except (Company.DoesNotExist, ValidationError, ValueError):
+            return None
+
+    def parse_plan(self, rate_plan):
+        """Turn {"scope": {"rate": "N/period", "burst": B}} into {"scope": (interval, tolerance)}"""
+        plan = {}
+        for scope, entry in (rate_plan or {}).items():
+            num_requests, duration = self.parse_rate(entry['rate'])
+            interval = duration / num_requests
+            plan[scope] = (interval, interval * entry.get('burst', num_requests))
+        return plan
+
+
+class CompanyAnonRateThrottle(CompanyRatePlanMixin, AnonRateThrottle):
     """
     Throttle for anonymous requests based on company ID
     """
     scope = 'company_anon'
-    
+
     def get_cache_key(self, request, view):
         # Get company ID from request
         company_id = request.headers.get('X-Company-ID')
@@ -17,12 +207,12 @@ class CompanyAnonRateThrottle(AnonRateThrottle):
             }
         return super().get_cache_key(request, view)
 
-class CompanyUserRateThrottle(UserRateThrottle):
+class CompanyUserRateThrottle(CompanyRatePlanMixin, UserRateThrottle):
     """
     Throttle for authenticated requests based on company ID
     """
     scope = 'company_user'
-    
+
     def get_cache_key(self, request, view):
         # Get company ID from request
         company_id = request.headers.get('X-Company-ID')
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 from .views import (
     UniversalSubmitAPIView, 
@@ -7,16 +8,52 @@ from .views import (
     ResendVerificationAPIView,
     LoginAPIView,
     LogoutAPIView,
-    UserProfileAPIView
+    UserProfileAPIView,
+    VerificationStatusAPIView,
+    TokenIntrospectionAPIView,
+    TokenRefreshAPIView,
+    TokenRevokeAPIView,
+    LoadMetricsAPIView
 )
 
+if getattr(settings, 'API_ASYNC_VIEWS', False):
+    # Native async handlers for deployments served through asgi.py
+    from .async_views import (
+        AsyncUniversalSubmitAPIView as UniversalSubmitAPIView,
+        AsyncVerifyAndSubmitAPIView as VerifyAndSubmitAPIView,
+        AsyncPasswordResetRequestAPIView as PasswordResetRequestAPIView,
+        AsyncPasswordResetVerifyAPIView as PasswordResetVerifyAPIView,
+        AsyncResendVerificationAPIView as ResendVerificationAPIView,
+        AsyncLoginAPIView as LoginAPIView,
+        AsyncLogoutAPIView as LogoutAPIView,
+        AsyncUserProfileAPIView as UserProfileAPIView,
+        AsyncVerificationStatusAPIView as VerificationStatusAPIView,
+        AsyncTokenIntrospectionAPIView as TokenIntrospectionAPIView,
+        AsyncTokenRefreshAPIView as TokenRefreshAPIView,
+        AsyncTokenRevokeAPIView as TokenRevokeAPIView,
+        AsyncLoadMetricsAPIView as LoadMetricsAPIView,
+    )
+
+submit_view = UniversalSubmitAPIView.as_view()
+verify_and_submit_view = VerifyAndSubmitAPIView.as_view()
+login_view = LoginAPIView.as_view()
+
+if getattr(settings, 'API_FAST_PATH', False):
+    # Lean dispatch for the hot public endpoints
+    from .fast_views import submit_view, verify_and_submit_view, login_view
+
 urlpatterns = [
-    path('submit/', UniversalSubmitAPIView.as_view(), name='universal-submit'),
-    path('verify-submit/', VerifyAndSubmitAPIView.as_view(), name='verify-and-submit'),
+    path('submit/', submit_view, name='universal-submit'),
+    path('verify-submit/', verify_and_submit_view, name='verify-and-submit'),
     path('password-reset/request/', PasswordResetRequestAPIView.as_view(), name='password-reset-request'),
     path('password-reset/verify/', PasswordResetVerifyAPIView.as_view(), name='password-reset-verify'),
     path('resend-verification/', ResendVerificationAPIView.as_view(), name='resend-verification'),
-    path('login/', LoginAPIView.as_view(), name='login'),
+    path('verification-status/<uuid:verification_id>/', VerificationStatusAPIView.as_view(), name='verification-status'),
+    path('login/', login_view, name='login'),
     path('logout/', LogoutAPIView.as_view(), name='logout'),
     path('profile/', UserProfileAPIView.as_view(), name='profile'),
-]
\ No newline at end of file
+    path('token/introspect/', TokenIntrospectionAPIView.as_view(), name='token-introspect'),
+    path('token/refresh/', TokenRefreshAPIView.as_view(), name='token-refresh'),
+    path('token/revoke/', TokenRevokeAPIView.as_view(), name='token-revoke'),
+    path('metrics/load/', LoadMetricsAPIView.as_view(), name='load-metrics'),
+]
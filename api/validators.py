@@ -1,77 +1,266 @@
+import re
 from rest_framework import serializers
+from companies.cache import tenant_cache
+from .custom_validators import CustomValidator, ValidatorTimeoutError
 
-def validate_data(data, validation_rules):
-    """Validate data against company-specific validation rules"""
+REQUIRED_ERROR = ['This field is required.']
+
+# Marks a field missing from a record in a batch column
+MISSING = object()
+
+# Type checkers bound once per rule set instead of branching on the type name per value
+TYPE_CHECKERS = {
+    'string': (lambda value: isinstance(value, str), 'Must be a string.'),
+    'number': (lambda value: isinstance(value, (int, float)), 'Must be a number.'),
+    'boolean': (lambda value: isinstance(value, bool), 'Must be a boolean.'),
+    # Simple email validation
+    'email': (lambda value: isinstance(value, str) and '@' in value, 'Must be a valid email address.'),
+}
+
+
+class ValidationPlan:
+    """
+    Company validation rules compiled into a flat list of per-field checks.
+
+    Each entry is (field, required, checks), where every check takes the field
+    value and returns an error list or None, and check.column takes a list of
+    values and returns one such result per value. When several checks fail, the
+    last one wins, matching the order rules have always been applied in.
+    """
+
+    def __init__(self, fields):
+        self.fields = fields
+
+    def validate(self, data):
+        """Validate data against the plan, raising serializers.ValidationError on failure"""
+        errors = check_passwords(data)
+
+        for field, required, checks in self.fields:
+            if field in data:
+                value = data[field]
+
+                # Skip validation if field is empty, unless it is required
+                if value is None or value == '':
+                    if required:
+                        errors[field] = REQUIRED_ERROR
+                    continue
+
+                error = None
+                for check in checks:
+                    result = check(value)
+                    if result is not None:
+                        error = result
+                if error is not None:
+                    errors[field] = error
+
+            elif required:
+                errors[field] = REQUIRED_ERROR
+
+        if errors:
+            raise serializers.ValidationError(errors)
+
+        return True
+
+    def validate_batch(self, records):
+        """
+        Validate many records column by column.
+
+        Each rule is dispatched once per column rather than once per record.
+        Returns one errors dict per record, in the format ValidationError uses
+        for validate(); valid records get an empty dict.
+        """
+        row_errors = [check_passwords(record) for record in records]
+
+        for field, required, checks in self.fields:
+            # Split the column into empty cells and values that need checking
+            rows = []
+            values = []
+            for row, record in enumerate(records):
+                value = record.get(field, MISSING)
+                if value is MISSING or value is None or value == '':
+                    if required:
+                        row_errors[row][field] = REQUIRED_ERROR
+                    continue
+                rows.append(row)
+                values.append(value)
+
+            if not values:
+                continue
+
+            field_errors = [None] * len(values)
+            for check in checks:
+                for index, error in enumerate(check.column(values)):
+                    if error is not None:
+                        field_errors[index] = error
+
+            for row, error in zip(rows, field_errors):
+                if error is not None:
+                    row_errors[row][field] = error
+
+        return row_errors
+
+
+def check_passwords(data):
+    """Check if password and confirm_password match, returning an errors dict"""
     errors = {}
-    
-    # Check if password and confirm_password match
     if 'password' in data and 'confirm_password' in data:
         if data['password'] != data['confirm_password']:
             errors['confirm_password'] = ['Passwords do not match.']
     elif 'password' in data and 'confirm_password' not in data:
         errors['confirm_password'] = ['Confirm password is required.']
-    
+    return errors
+
+
+def with_column(check, column=None):
+    """Attach a column version to a check, defaulting to calling it per value"""
+    check.column = column or (lambda values: [check(value) for value in values])
+    return check
+
+
+def compile_type_check(field_type):
+    if field_type not in TYPE_CHECKERS:
+        return None
+    checker, message = TYPE_CHECKERS[field_type]
+    error = [message]
+
+    def check(value):
+        if not checker(value):
+            return error
+
+    def check_column(values):
+        return [None if ok else error for ok in map(checker, values)]
+    return with_column(check, check_column)
+
+
+def compile_length_check(min_length, max_length):
+    if not min_length and not max_length:
+        return None
+    min_error = [f'Must be at least {min_length} characters.']
+    max_error = [f'Must be at most {max_length} characters.']
+
+    def check(value):
+        if not isinstance(value, str):
+            return None
+        error = None
+        if min_length and len(value) < min_length:
+            error = min_error
+        if max_length and len(value) > max_length:
+            error = max_error
+        return error
+
+    def check_column(values):
+        lengths = [len(value) if isinstance(value, str) else None for value in values]
+        return [
+            None if length is None
+            else max_error if max_length and length > max_length
+            else min_error if min_length and length < min_length
+            else None
+            for length in lengths
+        ]
+    return with_column(check, check_column)
+
+
+def compile_pattern_check(pattern):
+    if not pattern:
+        return None
+    error = ['Does not match the required pattern.']
+
+    try:
+        match = re.compile(pattern).match
+    except (re.error, TypeError) as e:
+        # Surface an invalid pattern on use, as re.match would
+        compile_error = e
+
+        def check(value):
+            if isinstance(value, str):
+                raise compile_error
+        return with_column(check)
+
+    def check(value):
+        if isinstance(value, str) and not match(value):
+            return error
+
+    def check_column(values):
+        return [
+            error if isinstance(value, str) and not match(value) else None
+            for value in values
+        ]
+    return with_column(check, check_column)
+
+
+def compile_custom_check(source):
+    if not source:
+        return None
+
+    try:
+        validator = CustomValidator(source)
+    except Exception as e:
+        compile_error = [f'Custom validation error: {str(e)}']
+
+        def check(value):
+            return compile_error
+        return with_column(check)
+
+    def check(value):
+        try:
+            result = validator(value)
+            if result is not True:
+                return [result]
+        except (Exception, ValidatorTimeoutError) as e:
+            return [f'Custom validation error: {str(e)}']
+    return with_column(check)
+
+
+def compile_validation_rules(validation_rules):
+    """Compile a company's validation rules dict into a ValidationPlan"""
+    fields = []
+
     for field, rules in validation_rules.items():
-        if field in data:
-            value = data[field]
-            
-            # Required field
-            if rules.get('required', False) and (value is None or value == ''):
-                errors[field] = ['This field is required.']
-                continue
-            
-            # Skip validation if field is empty and not required
-            if value is None or value == '':
-                continue
-            
-            # Type validation
-            field_type = rules.get('type')
-            if field_type:
-                if field_type == 'string' and not isinstance(value, str):
-                    errors[field] = [f'Must be a string.']
-                elif field_type == 'number' and not (isinstance(value, int) or isinstance(value, float)):
-                    errors[field] = [f'Must be a number.']
-                elif field_type == 'boolean' and not isinstance(value, bool):
-                    errors[field] = [f'Must be a boolean.']
-                elif field_type == 'email':
-                    # Simple email validation
-                    if not isinstance(value, str) or '@' not in value:
-                        errors[field] = [f'Must be a valid email address.']
-            
-            # Min length validation
-            min_length = rules.get('min_length')
-            if min_length and isinstance(value, str) and len(value) < min_length:
-                errors[field] = [f'Must be at least {min_length} characters.']
-            
-            # Max length validation
-            max_length = rules.get('max_length')
-            if max_length and isinstance(value, str) and len(value) > max_length:
-                errors[field] = [f'Must be at most {max_length} characters.']
-            
-            # Pattern validation
-            pattern = rules.get('pattern')
-            if pattern and isinstance(value, str):
-                import re
-                if not re.match(pattern, value):
-                    errors[field] = [f'Does not match the required pattern.']
-            
-            # Custom validation function
-            custom_validator = rules.get('custom_validator')
-            if custom_validator:
-                try:
-                    # Execute custom validation function
-                    exec(custom_validator)
-                    validate_custom = locals()['validate_custom']
-                    result = validate_custom(value)
-                    if result is not True:
-                        errors[field] = [result]
-                except Exception as e:
-                    errors[field] = [f'Custom validation error: {str(e)}']
-        
-        elif rules.get('required', False):
-            errors[field] = ['This field is required.']
-    
-    if errors:
-        raise serializers.ValidationError(errors)
-    
-    return True
+        checks = [
+            compile_type_check(rules.get('type')),
+            compile_length_check(rules.get('min_length'), rules.get('max_length')),
+            compile_pattern_check(rules.get('pattern')),
+            compile_custom_check(rules.get('custom_validator')),
+        ]
+        fields.append((field, bool(rules.get('required', False)), [c for c in checks if c is not None]))
+
+    return ValidationPlan(fields)
+
+
+def get_validation_plan(company):
+    """Get the compiled validation plan for a company, cached until its config changes"""
+    return tenant_cache.get(
+        company.id,
+        'validation_plan',
+        lambda: compile_validation_rules(company.get_validation_rules())
+    )
+
+
+async def aget_validation_plan(company):
+    """Async variant of get_validation_plan()"""
+    async def load():
+        return compile_validation_rules(company.get_validation_rules())
+    return await tenant_cache.aget(company.id, 'validation_plan', load)
+
+
+def validate_data(data, validation_rules):
+    """
+    Validate data against company-specific validation rules
+
+    validation_rules may be a raw rules dict or a compiled ValidationPlan.
+    """
+    if not isinstance(validation_rules, ValidationPlan):
+        validation_rules = compile_validation_rules(validation_rules)
+    return validation_rules.validate(data)
+
+
+def validate_batch(records, validation_rules):
+    """
+    Validate a list of records against company-specific validation rules
+
+    Returns one errors dict per record (empty when the record is valid).
+    validation_rules may be a raw rules dict or a compiled ValidationPlan.
+    """
+    if not isinstance(validation_rules, ValidationPlan):
+        validation_rules = compile_validation_rules(validation_rules)
+    return validation_rules.validate_batch(records)
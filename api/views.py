@@ -1,19 +1,29 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
 from companies.models import Company
-from .db_handlers import insert_data, find_user, update_user_password
-from .validators import validate_data
+from .db_handlers import authenticate_user
+from .validators import get_validation_plan
 from verification.models import VerificationCode
-from email_service.utils import generate_verification_code, send_email
-from verification.utils import generate_verification_code as generate_sms_code, send_sms
-from django.utils import timezone
 from .authentication import ApiKeyAuthentication
 from .throttling import CompanyAnonRateThrottle, CompanyUserRateThrottle
-from rest_framework.permissions import AllowAny, IsAuthenticated
-from .authentication import ApiKeyAuthentication, TokenAuthentication
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
+from rest_framework.authentication import SessionAuthentication, BasicAuthentication
+from .authentication import ApiKeyAuthentication, TokenAuthentication, JWTAuthentication
+from .passwords import PasswordHasherBusy
+from .access_tokens import refresh_access_token, revoke_access_tokens
 from .models import AuthToken
-from .db_handlers import authenticate_user, get_user_by_id
+from .concurrency import concurrency_limiter
+from .log_writer import api_log_writer
+from .profiles import project_profile
+from .handlers import (
+    server_error, hasher_busy, request_company, validation_failed, verification_field_of, field_missing,
+    issue_code, store_submission, use_code, verify_submit_input_error, request_password_reset, reset_password,
+    resend_code, login_identifier, login_response, logout_token, logout_lookup, invalid_token, logged_out,
+    cached_not_modified, profile_result, status_company_error, verification_status, company_key_required,
+    introspection_input, introspect_tokens, refresh_input, refreshed, revoke_tokens,
+)
 
 from rest_framework.permissions import AllowAny
 import logging
@@ -27,111 +37,37 @@ class UniversalSubmitAPIView(APIView):
     authentication_classes = [ApiKeyAuthentication]
     permission_classes = [AllowAny]
     throttle_classes = [CompanyAnonRateThrottle]
-    
+    throttle_scope = 'submit'
+
     def post(self, request):
         try:
-            # Get company ID from request headers
-            company_id = request.headers.get('X-Company-ID')
-            if not company_id:
-                return Response({"error": "X-Company-ID header is required"}, status=status.HTTP_400_BAD_REQUEST)
-            
-            try:
-                # Find company by ID
-                company = Company.objects.get(id=company_id)
-            except Company.DoesNotExist:
-                return Response({"error": "Company not found"}, status=status.HTTP_404_NOT_FOUND)
-            
+            company, error = request_company(request)
+            if error:
+                return error
+
             # Get form data
             data = request.data
-            
+
             # Validate data against company-specific validation rules
-            try:
-                validate_data(data, company.get_validation_rules())
-            except Exception as e:
-                return Response({"error": "Validation failed", "details": e.detail if hasattr(e, 'detail') else str(e)}, 
-                               status=status.HTTP_400_BAD_REQUEST)
-            
+            error = validation_failed(data, get_validation_plan(company))
+            if error:
+                return error
+
             # Handle verification if required
             if company.verification_method != 'none':
-                verification_field = 'email' if company.verification_method == 'email' else 'phone'
-                
-                if verification_field not in data:
-                    return Response(
-                        {"error": f"{verification_field.capitalize()} is required for verification"}, 
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                
-                # Generate verification code
-                code = generate_verification_code()
-                
-                # Create verification code record
-                verification = VerificationCode.objects.create(
-                    company=company,
-                    **{verification_field: data[verification_field]},
-                    code=code,
-                    expires_at=timezone.now() + timezone.timedelta(hours=1)
+                verification_field = verification_field_of(company)
+                error = field_missing(data, verification_field)
+                if error:
+                    return error
+                return issue_code(
+                    company, verification_field, data[verification_field], 'verification', 'Verification code',
+                    requires_verification=True
                 )
-                
-                # Send verification code
-                if verification_field == 'email':
-                    result = send_email(
-                        company_id=company.id,
-                        template_type='verification',
-                        recipient=data[verification_field],
-                        context={'code': code}
-                    )
-                else:  # phone verification
-                    result = send_sms(
-                        company_id=company.id,
-                        template_type='verification',
-                        phone_number=data[verification_field],
-                        context={'code': code}
-                    )
-                    
-                if not result['success']:
-                    verification.delete()
-                    return Response({"error": result['error']}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-                
-                return Response({
-                    "message": f"Verification code sent to {data[verification_field]}",
-                    "verification_id": verification.id,
-                    "requires_verification": True
-                })
-            
-            # Insert data into database
-            try:
-                inserted_id = insert_data(company, data)
-                
-                # Send welcome email if email is provided
-                if 'email' in data:
-                    send_email(
-                        company_id=company.id,
-                        template_type='welcome',
-                        recipient=data['email'],
-                        context=data
-                    )
-                
-                # Send welcome SMS if phone is provided
-                if 'phone' in data:
-                    send_sms(
-                        company_id=company.id,
-                        template_type='welcome',
-                        phone_number=data['phone'],
-                        context=data
-                    )
-                
-                return Response({
-                    "success": True,
-                    "message": "Data submitted successfully",
-                    "id": inserted_id
-                })
-            
-            except Exception as e:
-                logger.error(f"Error in database operation: {str(e)}", exc_info=True)
-                return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+            # Insert data into database and queue the welcome email/SMS
+            return store_submission(company, data)
         except Exception as e:
-            logger.error(f"Unexpected error in submit API: {str(e)}", exc_info=True)
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            return server_error(e, 'submit')
 
 class VerifyAndSubmitAPIView(APIView):
     """
@@ -140,102 +76,38 @@ class VerifyAndSubmitAPIView(APIView):
     authentication_classes = [ApiKeyAuthentication]
     permission_classes = [AllowAny]
     throttle_classes = [CompanyAnonRateThrottle]
-    
+    throttle_scope = 'verify_submit'
+
     def post(self, request):
         try:
-            # Get company ID from request headers
-            company_id = request.headers.get('X-Company-ID')
-            if not company_id:
-                return Response({"error": "X-Company-ID header is required"}, status=status.HTTP_400_BAD_REQUEST)
-            
-            try:
-                # Find company by ID
-                company = Company.objects.get(id=company_id)
-            except Company.DoesNotExist:
-                return Response({"error": "Company not found"}, status=status.HTTP_404_NOT_FOUND)
-            
+            company, error = request_company(request)
+            if error:
+                return error
+
             # Get verification code and form data
             code = request.data.get('verification_code')
             data = request.data.get('data')
-            
-            if not code:
-                return Response({"error": "Verification code is required"}, status=status.HTTP_400_BAD_REQUEST)
-            
-            if not data:
-                return Response({"error": "Form data is required"}, status=status.HTTP_400_BAD_REQUEST)
-            
+            error = verify_submit_input_error(code, data)
+            if error:
+                return error
+
             # Validate data against company-specific validation rules
-            try:
-                validate_data(data, company.get_validation_rules())
-            except Exception as e:
-                return Response({"error": "Validation failed", "details": e.detail if hasattr(e, 'detail') else str(e)}, 
-                               status=status.HTTP_400_BAD_REQUEST)
-            
-            # Determine verification field
-            verification_field = 'email' if company.verification_method == 'email' else 'phone'
-            
-            if verification_field not in data:
-                return Response(
-                    {"error": f"{verification_field.capitalize()} is required for verification"}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Find the verification code
-            query = {
-                'company': company,
-                'code': code,
-                'is_used': False,
-                verification_field: data[verification_field]
-            }
-            
-            try:
-                verification = VerificationCode.objects.get(**query)
-                
-                # Check if code is expired
-                if verification.is_expired:
-                    return Response({"error": "Verification code has expired"}, status=status.HTTP_400_BAD_REQUEST)
-                
-                # Mark code as used
-                verification.is_used = True
-                verification.save()
-                
-                # Insert data into database
-                try:
-                    inserted_id = insert_data(company, data)
-                    
-                    # Send welcome email if email is provided
-                    if 'email' in data:
-                        send_email(
-                            company_id=company.id,
-                            template_type='welcome',
-                            recipient=data['email'],
-                            context=data
-                        )
-                    
-                    # Send welcome SMS if phone is provided
-                    if 'phone' in data:
-                        send_sms(
-                            company_id=company.id,
-                            template_type='welcome',
-                            phone_number=data['phone'],
-                            context=data
-                        )
-                    
-                    return Response({
-                        "success": True,
-                        "message": "Data submitted successfully",
-                        "id": inserted_id
-                    })
-                
-                except Exception as e:
-                    logger.error(f"Error in database operation: {str(e)}", exc_info=True)
-                    return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            
-            except VerificationCode.DoesNotExist:
-                return Response({"error": "Invalid verification code"}, status=status.HTTP_400_BAD_REQUEST)
+            error = validation_failed(data, get_validation_plan(company))
+            if error:
+                return error
+
+            verification_field = verification_field_of(company)
+            error = field_missing(data, verification_field)
+            if error:
+                return error
+
+            _, error = use_code(company, code, verification_field, data)
+            if error:
+                return error
+
+            return store_submission(company, data)
         except Exception as e:
-            logger.error(f"Unexpected error in verify-submit API: {str(e)}", exc_info=True)
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            return server_error(e, 'verify-submit')
 
 class PasswordResetRequestAPIView(APIView):
     """
@@ -244,78 +116,16 @@ class PasswordResetRequestAPIView(APIView):
     authentication_classes = [ApiKeyAuthentication]
     permission_classes = [AllowAny]
     throttle_classes = [CompanyAnonRateThrottle]
-    
+    throttle_scope = 'password_reset'
+
     def post(self, request):
         try:
-            # Get company ID from request headers
-            company_id = request.headers.get('X-Company-ID')
-            if not company_id:
-                return Response({"error": "X-Company-ID header is required"}, status=status.HTTP_400_BAD_REQUEST)
-            
-            try:
-                # Find company by ID
-                company = Company.objects.get(id=company_id)
-            except Company.DoesNotExist:
-                return Response({"error": "Company not found"}, status=status.HTTP_404_NOT_FOUND)
-            
-            # Get identifier (email or phone)
-            data = request.data
-            
-            # Determine verification field based on company settings
-            verification_field = 'email' if company.verification_method == 'email' else 'phone'
-            
-            if verification_field not in data:
-                return Response(
-                    {"error": f"{verification_field.capitalize()} is required for password reset"}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Check if user exists
-            user = find_user(company, {verification_field: data[verification_field]})
-            if not user:
-                return Response(
-                    {"error": f"No user found with this {verification_field}"}, 
-                    status=status.HTTP_404_NOT_FOUND
-                )
-            
-            # Generate verification code
-            code = generate_verification_code()
-            
-            # Create verification code record
-            verification = VerificationCode.objects.create(
-                company=company,
-                **{verification_field: data[verification_field]},
-                code=code,
-                expires_at=timezone.now() + timezone.timedelta(hours=1)
-            )
-            
-            # Send verification code
-            if verification_field == 'email':
-                result = send_email(
-                    company_id=company.id,
-                    template_type='password_reset',
-                    recipient=data[verification_field],
-                    context={'code': code}
-                )
-            else:  # phone verification
-                result = send_sms(
-                    company_id=company.id,
-                    template_type='password_reset',
-                    phone_number=data[verification_field],
-                    context={'code': code}
-                )
-                
-            if not result['success']:
-                verification.delete()
-                return Response({"error": result['error']}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            
-            return Response({
-                "message": f"Password reset code sent to {data[verification_field]}",
-                "verification_id": verification.id
-            })
+            company, error = request_company(request)
+            if error:
+                return error
+            return request_password_reset(company, request.data)
         except Exception as e:
-            logger.error(f"Unexpected error in password-reset-request API: {str(e)}", exc_info=True)
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            return server_error(e, 'password-reset-request')
 
 class PasswordResetVerifyAPIView(APIView):
     """
@@ -324,92 +134,18 @@ class PasswordResetVerifyAPIView(APIView):
     authentication_classes = [ApiKeyAuthentication]
     permission_classes = [AllowAny]
     throttle_classes = [CompanyAnonRateThrottle]
-    
+    throttle_scope = 'password_reset'
+
     def post(self, request):
         try:
-            # Get company ID from request headers
-            company_id = request.headers.get('X-Company-ID')
-            if not company_id:
-                return Response({"error": "X-Company-ID header is required"}, status=status.HTTP_400_BAD_REQUEST)
-            
-            try:
-                # Find company by ID
-                company = Company.objects.get(id=company_id)
-            except Company.DoesNotExist:
-                return Response({"error": "Company not found"}, status=status.HTTP_404_NOT_FOUND)
-            
-            # Get verification code and new password
-            data = request.data
-            code = data.get('verification_code')
-            new_password = data.get('new_password')
-            confirm_password = data.get('confirm_password')
-            
-            if not code:
-                return Response({"error": "Verification code is required"}, status=status.HTTP_400_BAD_REQUEST)
-            
-            if not new_password:
-                return Response({"error": "New password is required"}, status=status.HTTP_400_BAD_REQUEST)
-            
-            if not confirm_password:
-                return Response({"error": "Confirm password is required"}, status=status.HTTP_400_BAD_REQUEST)
-                
-            if new_password != confirm_password:
-                return Response({"error": "Passwords do not match"}, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Determine verification field
-            verification_field = 'email' if company.verification_method == 'email' else 'phone'
-            
-            if verification_field not in data:
-                return Response(
-                    {"error": f"{verification_field.capitalize()} is required for verification"}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Find the verification code
-            query = {
-                'company': company,
-                'code': code,
-                'is_used': False,
-                verification_field: data[verification_field]
-            }
-            
-            try:
-                verification = VerificationCode.objects.get(**query)
-                
-                # Check if code is expired
-                if verification.is_expired:
-                    return Response({"error": "Verification code has expired"}, status=status.HTTP_400_BAD_REQUEST)
-                
-                # Mark code as used
-                verification.is_used = True
-                verification.save()
-                
-                # Find user and update password
-                user = find_user(company, {verification_field: data[verification_field]})
-                if not user:
-                    return Response(
-                        {"error": f"No user found with this {verification_field}"}, 
-                        status=status.HTTP_404_NOT_FOUND
-                    )
-                
-                # Update user's password
-                try:
-                    update_user_password(company, user, new_password)
-                    return Response({
-                        "success": True,
-                        "message": "Password updated successfully"
-                    })
-                except Exception as e:
-                    logger.error(f"Error updating password: {str(e)}", exc_info=True)
-                    return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            
-            except VerificationCode.DoesNotExist:
-                return Response({"error": "Invalid verification code"}, status=status.HTTP_400_BAD_REQUEST)
+            company, error = request_company(request)
+            if error:
+                return error
+            return reset_password(company, request.data)
         except Exception as e:
-            logger.error(f"Unexpected error in password-reset-verify API: {str(e)}", exc_info=True)
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        
-        
+            return server_error(e, 'password-reset-verify')
+
+
 class ResendVerificationAPIView(APIView):
     """
     API endpoint for resending a verification code
@@ -417,98 +153,18 @@ class ResendVerificationAPIView(APIView):
     authentication_classes = [ApiKeyAuthentication]
     permission_classes = [AllowAny]
     throttle_classes = [CompanyAnonRateThrottle]
-    
+    throttle_scope = 'resend_verification'
+
     def post(self, request):
         try:
-            # Get company ID from request headers
-            company_id = request.headers.get('X-Company-ID')
-            if not company_id:
-                return Response({"error": "X-Company-ID header is required"}, status=status.HTTP_400_BAD_REQUEST)
-            
-            try:
-                # Find company by ID
-                company = Company.objects.get(id=company_id)
-            except Company.DoesNotExist:
-                return Response({"error": "Company not found"}, status=status.HTTP_404_NOT_FOUND)
-            
-            # Get identifier (email or phone)
-            data = request.data
-            
-            # Determine verification field based on company settings
-            verification_field = 'email' if company.verification_method == 'email' else 'phone'
-            
-            if verification_field not in data:
-                return Response(
-                    {"error": f"{verification_field.capitalize()} is required for verification"}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Check if user exists in the database
-            user = find_user(company, {verification_field: data[verification_field]})
-            
-            # If user doesn't exist in the database, check if there's a pending verification
-            if not user:
-                # Check if there's a pending verification for this email/phone
-                pending_verification = VerificationCode.objects.filter(
-                    company=company,
-                    **{verification_field: data[verification_field]},
-                    is_used=False
-                ).exists()
-                
-                if not pending_verification:
-                    return Response(
-                        {"error": f"No pending registration found for this {verification_field}"}, 
-                        status=status.HTTP_404_NOT_FOUND
-                    )
-            
-            # Invalidate any existing verification codes
-            VerificationCode.objects.filter(
-                company=company,
-                **{verification_field: data[verification_field]},
-                is_used=False
-            ).update(is_used=True)
-            
-            # Generate new verification code
-            code = generate_verification_code()
-            
-            # Create verification code record
-            verification = VerificationCode.objects.create(
-                company=company,
-                **{verification_field: data[verification_field]},
-                code=code,
-                expires_at=timezone.now() + timezone.timedelta(hours=1)
-            )
-            
-            # Send verification code
-            if verification_field == 'email':
-                result = send_email(
-                    company_id=company.id,
-                    template_type='verification',
-                    recipient=data[verification_field],
-                    context={'code': code}
-                )
-            else:  # phone verification
-                result = send_sms(
-                    company_id=company.id,
-                    template_type='verification',
-                    phone_number=data[verification_field],
-                    context={'code': code}
-                )
-                
-            if not result['success']:
-                verification.delete()
-                return Response({"error": result['error']}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            
-            return Response({
-                "message": f"New verification code sent to {data[verification_field]}",
-                "verification_id": verification.id
-            })
-            
+            company, error = request_company(request)
+            if error:
+                return error
+            return resend_code(company, request.data)
         except Exception as e:
-            logger.error(f"Unexpected error in resend-verification API: {str(e)}", exc_info=True)
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        
-        
+            return server_error(e, 'resend-verification')
+
+
 class LoginAPIView(APIView):
     """
     API endpoint for user login
@@ -516,127 +172,216 @@ class LoginAPIView(APIView):
     authentication_classes = [ApiKeyAuthentication]
     permission_classes = [AllowAny]
     throttle_classes = [CompanyAnonRateThrottle]
-    
+    throttle_scope = 'login'
+
     def post(self, request):
         try:
-            # Get company ID from request headers
-            company_id = request.headers.get('X-Company-ID')
-            if not company_id:
-                return Response({"error": "X-Company-ID header is required"}, status=status.HTTP_400_BAD_REQUEST)
-            
-            try:
-                # Find company by ID
-                company = Company.objects.get(id=company_id)
-            except Company.DoesNotExist:
-                return Response({"error": "Company not found"}, status=status.HTTP_404_NOT_FOUND)
-            
+            company, error = request_company(request)
+            if error:
+                return error
+
             # Get login credentials
             data = request.data
-            
-            # Check if required fields are present
-            if 'password' not in data:
-                return Response({"error": "Password is required"}, status=status.HTTP_400_BAD_REQUEST)
-                
-            # Determine identifier field (email or phone)
-            identifier_field = None
-            identifier_value = None
-            
-            if 'email' in data and data['email']:
-                identifier_field = 'email'
-                identifier_value = data['email']
-            elif 'phone' in data and data['phone']:
-                identifier_field = 'phone'
-                identifier_value = data['phone']
-            else:
-                return Response({"error": "Email or phone is required"}, status=status.HTTP_400_BAD_REQUEST)
-                
+            identifier, error = login_identifier(data)
+            if error:
+                return error
+
             # Authenticate user
-            user = authenticate_user(company, identifier_field, identifier_value, data['password'])
-            
+            try:
+                user = authenticate_user(company, *identifier, data['password'])
+            except PasswordHasherBusy:
+                return hasher_busy()
+
             if not user:
                 return Response({"error": "Invalid credentials"}, status=status.HTTP_401_UNAUTHORIZED)
-                
-            # Get user ID
-            user_id = user[company.user_table_primary_key or 'id']
-            
-            # Generate token
-            token_obj = AuthToken.generate_token(company, user_id)
-            
-            # Return token and user data
-            return Response({
-                "token": token_obj.token,
-                "expires_at": token_obj.expires_at,
-                "user": {k: v for k, v in user.items() if k != 'password'}  # Exclude password from response
-            })
-            
+
+            token_obj = AuthToken.generate_token(company, user.get('id', user.get('_id')))
+            return login_response(company, user, token_obj)
+
         except Exception as e:
-            logging.error(f"Unexpected error in login API: {str(e)}", exc_info=True)
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            return server_error(e, 'login')
 
 class LogoutAPIView(APIView):
     """
     API endpoint for user logout
     """
-    authentication_classes = [ApiKeyAuthentication, TokenAuthentication]
+    authentication_classes = [ApiKeyAuthentication, TokenAuthentication, JWTAuthentication]
     permission_classes = [IsAuthenticated]
-    
+    throttle_classes = [CompanyUserRateThrottle]
+    throttle_scope = 'logout'
+
     def post(self, request):
         try:
-            # Get token from request
-            auth_header = request.headers.get('Authorization')
-            if not auth_header:
-                return Response({"error": "Authorization header is required"}, status=status.HTTP_400_BAD_REQUEST)
-                
-            # Check if the header starts with 'Token '
-            parts = auth_header.split()
-            if parts[0].lower() != 'token' or len(parts) != 2:
-                return Response({"error": "Invalid Authorization header format"}, status=status.HTTP_400_BAD_REQUEST)
-                
-            token = parts[1]
-            
-            # Get company ID from request headers
-            company_id = request.headers.get('X-Company-ID')
-            if not company_id:
-                return Response({"error": "X-Company-ID header is required"}, status=status.HTTP_400_BAD_REQUEST)
-                
-            try:
-                # Find company by ID
-                company = Company.objects.get(id=company_id)
-            except Company.DoesNotExist:
-                return Response({"error": "Company not found"}, status=status.HTTP_404_NOT_FOUND)
-                
+            presented, error = logout_token(request)
+            if error:
+                return error
+
+            company, error = request_company(request)
+            if error:
+                return error
+
             # Deactivate token
+            lookup = logout_lookup(request, *presented, company)
+            if lookup is None:
+                return invalid_token()
             try:
-                token_obj = AuthToken.objects.get(token=token, company=company)
-                token_obj.is_active = False
-                token_obj.save()
-                
-                return Response({"message": "Successfully logged out"})
-                
+                token_obj = AuthToken.objects.get(**lookup)
             except AuthToken.DoesNotExist:
-                return Response({"error": "Invalid token"}, status=status.HTTP_400_BAD_REQUEST)
-                
+                return invalid_token()
+            token_obj.is_active = False
+            token_obj.save()
+            if company.jwt_access_tokens:
+                revoke_access_tokens(token_obj)
+            return logged_out()
+
         except Exception as e:
-            logging.error(f"Unexpected error in logout API: {str(e)}", exc_info=True)
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            return server_error(e, 'logout')
 
 class UserProfileAPIView(APIView):
     """
     API endpoint for getting user profile
     """
-    authentication_classes = [ApiKeyAuthentication, TokenAuthentication]
+    authentication_classes = [ApiKeyAuthentication, TokenAuthentication, JWTAuthentication]
     permission_classes = [IsAuthenticated]
-    
+    throttle_classes = [CompanyUserRateThrottle]
+    throttle_scope = 'profile'
+
     def get(self, request):
         try:
             # User is already authenticated by TokenAuthentication
-            user = request.user
-            
+            token = request.auth if isinstance(request.auth, AuthToken) else None
+            if_none_match = request.headers.get('If-None-Match')
+
+            response = cached_not_modified(token, if_none_match)
+            if response:
+                return response
+
             # Return user data (excluding password)
-            return Response({
-                "user": {k: v for k, v in user.items() if k != 'password'}
-            })
-            
+            return profile_result(project_profile(request.user), token, if_none_match)
+
+        except AuthenticationFailed:
+            # The token's user no longer exists in the company database
+            raise
+        except Exception as e:
+            return server_error(e, 'user profile')
+
+
+class VerificationStatusAPIView(APIView):
+    """
+    API endpoint for checking the delivery state of a verification code.
+
+    Answers immediately; ?wait= long-polling is only offered by the async
+    view, so a WSGI worker is never held waiting for delivery.
+    """
+    authentication_classes = [ApiKeyAuthentication]
+    permission_classes = [AllowAny]
+    throttle_classes = [CompanyAnonRateThrottle]
+    throttle_scope = 'verification_status'
+
+    def get(self, request, verification_id):
+        try:
+            company_id = request.headers.get('X-Company-ID')
+            error = status_company_error(company_id)
+            if error:
+                return error
+
+            row = VerificationCode.objects.filter(id=verification_id, company_id=company_id).values_list(
+                'delivery_status', 'delivery_error'
+            ).first()
+            return verification_status(verification_id, row)
+
+        except Exception as e:
+            return server_error(e, 'verification status')
+
+
+class TokenIntrospectionAPIView(APIView):
+    """
+    API endpoint for resource servers to check many user tokens at once
+
+    Requires the company's X-API-Key.
+    """
+    authentication_classes = [ApiKeyAuthentication]
+    permission_classes = [AllowAny]
+    throttle_classes = [CompanyAnonRateThrottle]
+    throttle_scope = 'token'
+
+    def post(self, request):
+        try:
+            # Only the company itself may introspect its tokens
+            company = request.user
+            if not isinstance(company, Company):
+                return company_key_required()
+
+            query, error = introspection_input(request.data)
+            if error:
+                return error
+            return Response({"tokens": introspect_tokens(company, *query)})
+
+        except Exception as e:
+            return server_error(e, 'token introspection')
+
+
+class TokenRefreshAPIView(APIView):
+    """
+    API endpoint for exchanging a refresh token for a new signed access token
+
+    Only available to companies with JWT access tokens enabled.
+    """
+    authentication_classes = [ApiKeyAuthentication]
+    permission_classes = [AllowAny]
+    throttle_classes = [CompanyAnonRateThrottle]
+    throttle_scope = 'token'
+
+    def post(self, request):
+        try:
+            company, error = request_company(request)
+            if error:
+                return error
+
+            refresh_token, error = refresh_input(company, request.data)
+            if error:
+                return error
+            return refreshed(refresh_access_token(company, refresh_token))
+
+        except Exception as e:
+            return server_error(e, 'token refresh')
+
+
+class TokenRevokeAPIView(APIView):
+    """
+    API endpoint for revoking every token of a user, or of the whole company
+
+    Requires the company's X-API-Key. Send {"user_id": "..."} or {"all": true}.
+    """
+    authentication_classes = [ApiKeyAuthentication]
+    permission_classes = [AllowAny]
+    throttle_classes = [CompanyAnonRateThrottle]
+    throttle_scope = 'token'
+
+    def post(self, request):
+        try:
+            # Only the company itself may revoke its tokens
+            company = request.user
+            if not isinstance(company, Company):
+                return company_key_required()
+            return revoke_tokens(company, request.data)
+
         except Exception as e:
-            logging.error(f"Unexpected error in user profile API: {str(e)}", exc_info=True)
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            return server_error(e, 'token revoke')
+
+
+class LoadMetricsAPIView(APIView):
+    """
+    API endpoint exposing this worker's adaptive concurrency limits and API log writer counters
+
+    Requires a Django staff user (session or basic auth).
+    """
+    authentication_classes = [SessionAuthentication, BasicAuthentication]
+    permission_classes = [IsAdminUser]
+    throttle_classes = []
+
+    def get(self, request):
+        return Response({
+            "endpoint_classes": concurrency_limiter.metrics(),
+            "api_log": api_log_writer.counters(),
+        })
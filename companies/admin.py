@@ -21,4 +21,16 @@ class CompanyAdmin(admin.ModelAdmin):
         ('Validation Rules', {
             'fields': ('validation_rules',)
         }),
+        ('Access Tokens', {
+            'fields': ('jwt_access_tokens',)
+        }),
+        ('Passwords', {
+            'fields': ('bcrypt_rounds',)
+        }),
+        ('Rate Plan', {
+            'fields': ('rate_plan',)
+        }),
+        ('API Logging', {
+            'fields': ('log_policy',)
+        }),
     )
@@ -0,0 +1,236 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import Company, TenantConfigVersion
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TenantConfigCache:
+    """
+    Per-process cache for tenant configuration.
+
+    Entries are grouped by company and remember the company's version from
+    TenantConfigVersion at the time they were loaded. Every worker polls that
+    table at most once per TENANT_CONFIG_POLL_INTERVAL seconds and drops the
+    entries of any company whose version has moved on, so an edit saved on one
+    worker reaches all other workers within that delay. At most
+    TENANT_CONFIG_CACHE_MAX_COMPANIES companies are kept, least recently used
+    dropped first.
+
+    Other per-company caches can register with on_invalidate() to be told
+    whenever a company's configuration is dropped, here or by a poll.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._listeners = []
+        self._lock = threading.RLock()
+        self._poll_lock = threading.Lock()
+        self._next_poll = 0.0
+        self._polled_at = None
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'TENANT_CONFIG_CACHE_TTL', 300)
+
+    @property
+    def max_companies(self):
+        return getattr(settings, 'TENANT_CONFIG_CACHE_MAX_COMPANIES', 10000)
+
+    @property
+    def poll_interval(self):
+        return getattr(settings, 'TENANT_CONFIG_POLL_INTERVAL', 2)
+
+    @property
+    def clock_skew(self):
+        return getattr(settings, 'TENANT_CONFIG_CLOCK_SKEW', 5)
+
+    def _key(self, company_id):
+        """Normalize a company ID, returning None if it is not a valid UUID"""
+        if isinstance(company_id, uuid.UUID):
+            return str(company_id)
+        try:
+            return str(uuid.UUID(str(company_id)))
+        except (TypeError, ValueError, AttributeError):
+            return None
+
+    def get(self, company_id, name, loader):
+        """
+        Get a cached value for a company, calling loader() on a miss.
+
+        Exceptions raised by the loader are not cached and propagate to the caller.
+        """
+        key = self._key(company_id)
+        if key is None:
+            # Let the loader raise the same error the ORM would
+            return loader()
+
+        self.poll()
+
+        hit, value = self._lookup(key, name)
+        if hit:
+            return value
+
+        # Read the version before loading so a concurrent bump is never masked
+        version = self.current_version(key)
+        value = loader()
+        self._store(key, name, version, value)
+        return value
+
+    async def aget(self, company_id, name, loader):
+        """
+        Async variant of get(); loader must be a coroutine function.
+
+        Cache hits are served without leaving the event loop.
+        """
+        key = self._key(company_id)
+        if key is None:
+            return await loader()
+
+        if self.poll_due():
+            await sync_to_async(self.poll)()
+
+        hit, value = self._lookup(key, name)
+        if hit:
+            return value
+
+        version = await TenantConfigVersion.objects.filter(
+            company_id=key
+        ).values_list('version', flat=True).afirst() or 0
+        value = await loader()
+        self._store(key, name, version, value)
+        return value
+
+    def _lookup(self, key, name):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry['expires'] > time.monotonic() and name in entry['values']:
+                self._entries.move_to_end(key)
+                return True, entry['values'][name]
+        return False, None
+
+    def _store(self, key, name, version, value):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry or entry['version'] != version or entry['expires'] <= now:
+                entry = {'version': version, 'expires': now + self.ttl, 'values': {}}
+                self._entries[key] = entry
+            entry['values'][name] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_companies:
+                self._entries.popitem(last=False)
+
+    def current_version(self, company_id):
+        """Read a company's configuration version from the database"""
+        version = TenantConfigVersion.objects.filter(
+            company_id=company_id
+        ).values_list('version', flat=True).first()
+        return version or 0
+
+    def on_invalidate(self, callback):
+        """Call callback(company_id) when a company's entries are dropped; company_id is None for all companies"""
+        self._listeners.append(callback)
+
+    def _notify(self, company_ids):
+        for callback in self._listeners:
+            for company_id in company_ids:
+                try:
+                    callback(company_id)
+                except Exception as e:
+                    logger.error(f"Error in tenant config invalidation listener: {str(e)}")
+
+    def invalidate(self, company_id=None):
+        """Drop cached entries for one company, or for all companies"""
+        if company_id is None:
+            with self._lock:
+                self._entries.clear()
+            self._notify([None])
+            return
+        key = self._key(company_id)
+        if key is not None:
+            with self._lock:
+                self._entries.pop(key, None)
+            self._notify([key])
+
+    def poll_due(self):
+        return time.monotonic() >= self._next_poll
+
+    def poll(self, force=False):
+        """Drop entries whose company version changed since the last poll"""
+        now = time.monotonic()
+        if not force and now < self._next_poll:
+            return
+        if not self._poll_lock.acquire(blocking=False):
+            # Another thread is already polling
+            return
+
+        try:
+            self._next_poll = now + self.poll_interval
+            started_at = timezone.now()
+
+            if self._polled_at is None:
+                # Nothing cached before the first poll can be stale
+                self._polled_at = started_at
+                return
+
+            since = self._polled_at - timedelta(seconds=self.clock_skew)
+            changes = TenantConfigVersion.objects.filter(
+                updated_at__gte=since
+            ).values_list('company_id', 'version')
+
+            changed = []
+            with self._lock:
+                for company_id, version in changes:
+                    key = str(company_id)
+                    changed.append(key)
+                    entry = self._entries.get(key)
+                    if entry and entry['version'] != version:
+                        del self._entries[key]
+            # Listeners may hold state for companies with nothing cached here, so tell them about every change
+            self._notify(changed)
+
+            self._polled_at = started_at
+        except Exception as e:
+            logger.error(f"Error polling tenant config versions: {str(e)}")
+        finally:
+            self._poll_lock.release()
+
+
+tenant_cache = TenantConfigCache()
+
+
+def bump_tenant_version(company_id):
+    """Mark a company's configuration as changed for every worker"""
+    updated = TenantConfigVersion.objects.filter(company_id=company_id).update(
+        version=F('version') + 1,
+        updated_at=timezone.now()
+    )
+    if not updated:
+        TenantConfigVersion.objects.get_or_create(
+            company_id=company_id,
+            defaults={'version': 1, 'updated_at': timezone.now()}
+        )
+
+    # Drop this worker's copy straight away instead of waiting for a poll
+    tenant_cache.invalidate(company_id)
+    transaction.on_commit(lambda: tenant_cache.invalidate(company_id))
+
+
+def get_company(company_id):
+    """Get a company by ID from the tenant cache, raising Company.DoesNotExist if missing"""
+    return tenant_cache.get(company_id, 'company', lambda: Company.objects.get(id=company_id))
+
+
+async def aget_company(company_id):
+    """Async variant of get_company()"""
+    return await tenant_cache.aget(company_id, 'company', lambda: Company.objects.aget(id=company_id))
@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2025-05-02 09:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TenantConfigVersion',
+            fields=[
+                ('company_id', models.UUIDField(primary_key=True, serialize=False)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
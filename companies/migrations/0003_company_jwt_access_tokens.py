@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-19 10:57
+
+import companies.models
+from django.db import migrations, models
+
+
+def generate_signing_keys(apps, schema_editor):
+    # AddField evaluates the callable default once; give every existing company its own key
+    Company = apps.get_model('companies', 'Company')
+    for company in Company.objects.all():
+        company.jwt_signing_key = companies.models.generate_signing_key()
+        company.save(update_fields=['jwt_signing_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0002_tenantconfigversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='jwt_access_tokens',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='company',
+            name='jwt_signing_key',
+            field=models.CharField(default=companies.models.generate_signing_key, editable=False, max_length=128),
+        ),
+        migrations.RunPython(generate_signing_keys, migrations.RunPython.noop),
+    ]
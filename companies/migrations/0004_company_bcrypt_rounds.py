@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-19 11:03
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0003_company_jwt_access_tokens'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='bcrypt_rounds',
+            field=models.PositiveSmallIntegerField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(4), django.core.validators.MaxValueValidator(31)]),
+        ),
+    ]
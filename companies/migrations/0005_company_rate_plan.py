@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-19 11:16
+
+import companies.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0004_company_bcrypt_rounds'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='rate_plan',
+            field=models.JSONField(blank=True, default=dict, validators=[companies.models.validate_rate_plan]),
+        ),
+    ]
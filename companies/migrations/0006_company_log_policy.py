@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-19 11:23
+
+import companies.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0005_company_rate_plan'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='log_policy',
+            field=models.JSONField(blank=True, default=dict, validators=[companies.models.validate_log_policy]),
+        ),
+    ]
@@ -1,7 +1,49 @@
 
+from django.core.exceptions import ValidationError
+from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
 import uuid
 import json
+import secrets
+
+
+def generate_signing_key():
+    return secrets.token_urlsafe(48)
+
+
+def validate_rate_plan(value):
+    """Check a rate plan maps endpoint scopes to {"rate": "N/period", "burst": N}"""
+    if not isinstance(value, dict):
+        raise ValidationError('Rate plan must be an object keyed by endpoint scope')
+    for scope, entry in value.items():
+        if not isinstance(entry, dict) or not isinstance(entry.get('rate'), str):
+            raise ValidationError(f'{scope}: expected {{"rate": "N/period", "burst": N}}')
+        num, _, period = entry['rate'].partition('/')
+        if not num.isdigit() or int(num) < 1 or period[:1] not in ('s', 'm', 'h', 'd'):
+            raise ValidationError(f'{scope}: rate must look like 100/min, 10/s, 5000/day')
+        burst = entry.get('burst', int(num))
+        if not isinstance(burst, int) or isinstance(burst, bool) or burst < 1:
+            raise ValidationError(f'{scope}: burst must be a positive integer')
+
+
+def validate_log_policy(value):
+    """Check an API logging policy only sets known options to sensible values"""
+    if not isinstance(value, dict):
+        raise ValidationError('Log policy must be an object')
+    unknown = set(value) - {'sample_rate', 'max_body_bytes', 'headers', 'compress_over'}
+    if unknown:
+        raise ValidationError(f'Unknown log policy options: {", ".join(sorted(unknown))}')
+    sample_rate = value.get('sample_rate', 1)
+    if not isinstance(sample_rate, (int, float)) or isinstance(sample_rate, bool) or not 0 <= sample_rate <= 1:
+        raise ValidationError('sample_rate must be a number between 0 and 1')
+    for option in ('max_body_bytes', 'compress_over'):
+        size = value.get(option, 0)
+        if not isinstance(size, int) or isinstance(size, bool) or size < 0:
+            raise ValidationError(f'{option} must be a non-negative integer')
+    headers = value.get('headers', [])
+    if not isinstance(headers, list) or not all(isinstance(header, str) for header in headers):
+        raise ValidationError('headers must be a list of header names')
+
 
 class Company(models.Model):
     """Model for storing company information and database credentials"""
@@ -51,6 +93,23 @@ class Company(models.Model):
     # Custom validation rules (stored as JSON)
     validation_rules = models.JSONField(default=dict, blank=True)
     
+    # Short-lived signed access tokens issued alongside refresh tokens at login
+    jwt_access_tokens = models.BooleanField(default=False)
+    jwt_signing_key = models.CharField(max_length=128, default=generate_signing_key, editable=False)
+    
+    # bcrypt cost for user passwords; PASSWORD_BCRYPT_ROUNDS when unset
+    bcrypt_rounds = models.PositiveSmallIntegerField(
+        blank=True,
+        null=True,
+        validators=[MinValueValidator(4), MaxValueValidator(31)]
+    )
+    
+    # Request limits per endpoint scope (see api.throttling); DEFAULT_THROTTLE_RATES when unset
+    rate_plan = models.JSONField(default=dict, blank=True, validators=[validate_rate_plan])
+    
+    # API log sampling, truncation, header and compression options (see api.log_policy); API_LOG_* when unset
+    log_policy = models.JSONField(default=dict, blank=True, validators=[validate_log_policy])
+    
     def __str__(self):
         return self.name
     
@@ -59,3 +118,13 @@ class Company(models.Model):
         if isinstance(self.validation_rules, str):
             return json.loads(self.validation_rules)
         return self.validation_rules
+
+
+class TenantConfigVersion(models.Model):
+    """Per-company version counter, bumped whenever tenant configuration changes"""
+    company_id = models.UUIDField(primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(db_index=True)
+    
+    def __str__(self):
+        return f"{self.company_id} v{self.version}"
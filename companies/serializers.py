@@ -8,7 +8,8 @@ class CompanySerializer(serializers.ModelSerializer):
             'id', 'name', 'api_key', 'db_type', 'connection_type', 
             'connection_string', 'db_host', 'db_port', 'db_name', 
             'db_user', 'db_password', 'target_table', 
-            'verification_method', 'validation_rules'
+            'verification_method', 'validation_rules', 'jwt_access_tokens',
+            'bcrypt_rounds', 'rate_plan', 'log_policy'
         ]
         read_only_fields = ['id', 'api_key']
         extra_kwargs = {
@@ -0,0 +1,24 @@
+from django.db.models.signals import post_save, post_delete
+from .cache import bump_tenant_version
+from .models import Company
+
+# Models whose rows make up a company's cached configuration
+TENANT_CONFIG_MODELS = (
+    'companies.Company',
+    'email_service.EmailConfig',
+    'email_service.EmailTemplate',
+    'verification.SMSConfig',
+    'verification.SMSTemplate',
+)
+
+
+def tenant_config_changed(sender, instance, **kwargs):
+    """Bump the owning company's config version when a config row is saved or deleted"""
+    company_id = instance.pk if isinstance(instance, Company) else instance.company_id
+    if company_id:
+        bump_tenant_version(company_id)
+
+
+for model in TENANT_CONFIG_MODELS:
+    post_save.connect(tenant_config_changed, sender=model, dispatch_uid=f'tenant_config_save:{model}')
+    post_delete.connect(tenant_config_changed, sender=model, dispatch_uid=f'tenant_config_delete:{model}')
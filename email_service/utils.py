@@ -2,7 +2,8 @@ import smtplib
 from django.core.mail import EmailMessage
 import string
 import random
-from .models import EmailTemplate, EmailLog
+from .models import EmailConfig, EmailTemplate, EmailLog
+from companies.cache import tenant_cache, get_company
 import logging
 
 logger = logging.getLogger(__name__)
@@ -94,15 +95,28 @@ def test_email_connection(config):
         except Exception as e:
             return {'success': False, 'error': str(e)}
 
+def get_email_config(company):
+    """Get the company's email configuration from the tenant cache, or None if not set"""
+    def load():
+        try:
+            return EmailConfig.objects.get(company=company)
+        except EmailConfig.DoesNotExist:
+            return None
+    
+    return tenant_cache.get(company.id, 'email_config', load)
+
 def get_template_for_company(company_id, template_type):
     """Get the email template for a company, or use default if not found"""
-    try:
-        template = EmailTemplate.objects.get(company_id=company_id, template_type=template_type)
-        return {
-            'subject': template.subject,
-            'body': template.body
-        }
-    except EmailTemplate.DoesNotExist:
+    def load():
+        template = EmailTemplate.objects.filter(
+            company_id=company_id, template_type=template_type
+        ).values('subject', 'body').first()
+        return dict(template) if template else None
+    
+    template = tenant_cache.get(company_id, f'email_template:{template_type}', load)
+    if template:
+        return template
+    else:
         # Return default template
         return {
             'welcome': {
@@ -134,10 +148,8 @@ def render_template(template, context):
 
 def send_email(company_id, template_type, recipient, context):
     """Send an email using the company's template and email settings"""
-    from companies.models import Company
-    
     try:
-        company = Company.objects.get(id=company_id)
+        company = get_company(company_id)
         
         # Get email template
         template = get_template_for_company(company_id, template_type)
@@ -146,10 +158,7 @@ def send_email(company_id, template_type, recipient, context):
         subject, body = render_template(template, context)
         
         # Get email configuration
-        try:
-            email_config = company.email_config
-        except:
-            email_config = None
+        email_config = get_email_config(company)
         
         # Get sender email
         from_email = email_config.from_email if email_config and email_config.use_custom_email else None
@@ -1,4 +1,5 @@
 
+import importlib.util
 import os
 from pathlib import Path
 from dotenv import load_dotenv
@@ -36,10 +37,15 @@ INSTALLED_APPS = [
     'verification',
 ]
 
+# Shed API requests beyond an adaptive per-endpoint-class concurrency limit (see LOAD_SHEDDING_* below)
+LOAD_SHEDDING = os.getenv('LOAD_SHEDDING', 'False') == 'True'
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    # Before the rest, so shed requests cost as little as possible
+    *(['api.middleware.ConcurrencyLimitMiddleware'] if LOAD_SHEDDING else []),
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -106,6 +112,12 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # REST Framework settings
+# Serve DRF's browsable API (HTML) pages; turn off in production
+API_BROWSABLE = os.getenv('API_BROWSABLE', str(DEBUG)) == 'True'
+
+# Accept and return application/msgpack alongside JSON (needs the msgpack package)
+API_MSGPACK = os.getenv('API_MSGPACK', 'True') == 'True' and importlib.util.find_spec('msgpack') is not None
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
@@ -114,9 +126,22 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # orjson-backed JSON rendering; the browsable API is only offered when API_BROWSABLE is on
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        *(['api.renderers.MessagePackRenderer'] if API_MSGPACK else []),
+        *(['rest_framework.renderers.BrowsableAPIRenderer'] if API_BROWSABLE else []),
+    ],
+    # The JSON parser reuses the body already parsed for API logging
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.SharedJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+        *(['api.parsers.MessagePackParser'] if API_MSGPACK else []),
+    ],
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle'
+        'api.throttling.AnonRateThrottle',
+        'api.throttling.UserRateThrottle'
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '100/day',
@@ -160,3 +185,122 @@ AWS_ACCESS_KEY_ID = os.getenv('AWS_ACCESS_KEY_ID', '')
 AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY', '')
 AWS_REGION = os.getenv('AWS_REGION', 'us-east-1')
 AWS_SNS_SENDER_ID = os.getenv('AWS_SNS_SENDER_ID', 'Verify')
+
+# Tenant configuration cache
+# Cached company settings are dropped on every worker within TENANT_CONFIG_POLL_INTERVAL
+# seconds of an edit, and unconditionally after TENANT_CONFIG_CACHE_TTL seconds.
+TENANT_CONFIG_CACHE_TTL = int(os.getenv('TENANT_CONFIG_CACHE_TTL', 300))
+TENANT_CONFIG_POLL_INTERVAL = float(os.getenv('TENANT_CONFIG_POLL_INTERVAL', 2))
+TENANT_CONFIG_CLOCK_SKEW = float(os.getenv('TENANT_CONFIG_CLOCK_SKEW', 5))
+# Companies kept per worker, least recently used dropped first
+TENANT_CONFIG_CACHE_MAX_COMPANIES = int(os.getenv('TENANT_CONFIG_CACHE_MAX_COMPANIES', 10000))
+
+# Custom validators
+# 'inline' runs custom_validator rules on the request thread; 'process' runs them in a
+# warm pool of CUSTOM_VALIDATOR_WORKERS processes. Either way each call is limited to
+# CUSTOM_VALIDATOR_TIMEOUT seconds.
+CUSTOM_VALIDATOR_MODE = os.getenv('CUSTOM_VALIDATOR_MODE', 'inline')
+CUSTOM_VALIDATOR_TIMEOUT = float(os.getenv('CUSTOM_VALIDATOR_TIMEOUT', 0.05))
+CUSTOM_VALIDATOR_WORKERS = int(os.getenv('CUSTOM_VALIDATOR_WORKERS', 2))
+
+# Serve the /api/ endpoints with native async views. Enable this when running under
+# asgi.py (e.g. uvicorn or gunicorn with uvicorn workers); under WSGI every async view
+# would need its own event loop.
+API_ASYNC_VIEWS = os.getenv('API_ASYNC_VIEWS', 'False') == 'True'
+
+# Serve /api/submit/, /api/verify-submit/ and /api/login/ through a lean dispatcher that
+# skips DRF's generic request handling for JSON requests (see api/fast_views.py)
+API_FAST_PATH = os.getenv('API_FAST_PATH', 'False') == 'True'
+
+# Background tasks
+# With BACKGROUND_TASKS on, welcome emails and SMS are queued in the BackgroundJob table
+# and sent by `python manage.py runworker`; off, they are sent before the response.
+# Failed jobs are retried with exponential backoff (BACKGROUND_TASK_BACKOFF seconds,
+# doubling up to BACKGROUND_TASK_BACKOFF_MAX) and dead-lettered after
+# BACKGROUND_TASK_MAX_ATTEMPTS attempts.
+BACKGROUND_TASKS = os.getenv('BACKGROUND_TASKS', 'False') == 'True'
+BACKGROUND_TASK_MAX_ATTEMPTS = int(os.getenv('BACKGROUND_TASK_MAX_ATTEMPTS', 5))
+BACKGROUND_TASK_BACKOFF = float(os.getenv('BACKGROUND_TASK_BACKOFF', 5))
+BACKGROUND_TASK_BACKOFF_MAX = float(os.getenv('BACKGROUND_TASK_BACKOFF_MAX', 3600))
+# Per-worker limits on concurrently running jobs of each task, e.g. to respect provider rate limits
+BACKGROUND_TASK_CONCURRENCY = {
+    'send_email': int(os.getenv('BACKGROUND_TASK_EMAIL_CONCURRENCY', 8)),
+    'send_sms': int(os.getenv('BACKGROUND_TASK_SMS_CONCURRENCY', 4)),
+}
+# Days to keep finished jobs before workers delete them (0 keeps them)
+BACKGROUND_TASK_DONE_RETENTION_DAYS = int(os.getenv('BACKGROUND_TASK_DONE_RETENTION_DAYS', 1))
+BACKGROUND_TASK_DEAD_RETENTION_DAYS = int(os.getenv('BACKGROUND_TASK_DEAD_RETENTION_DAYS', 14))
+
+# With VERIFICATION_ASYNC_DISPATCH (and BACKGROUND_TASKS) on, verification and password reset
+# codes are sent by the task runner: the views answer 202 with state 'queued' and clients poll
+# /api/verification-status/<id>/ for 'sent' or 'failed' (?wait=<seconds> long-polls with API_ASYNC_VIEWS).
+VERIFICATION_ASYNC_DISPATCH = os.getenv('VERIFICATION_ASYNC_DISPATCH', 'False') == 'True'
+VERIFICATION_STATUS_MAX_WAIT = float(os.getenv('VERIFICATION_STATUS_MAX_WAIT', 10))
+VERIFICATION_STATUS_POLL_INTERVAL = float(os.getenv('VERIFICATION_STATUS_POLL_INTERVAL', 0.5))
+
+# Maximum number of tokens accepted by one /api/token/introspect/ request
+TOKEN_INTROSPECTION_MAX_TOKENS = int(os.getenv('TOKEN_INTROSPECTION_MAX_TOKENS', 100))
+
+# Seconds to remember each user's profile ETag so /api/profile/ revalidations can answer 304
+# without serializing the profile (0 disables). Use a shared CACHES backend with several workers.
+PROFILE_ETAG_CACHE_TTL = int(os.getenv('PROFILE_ETAG_CACHE_TTL', 0))
+
+# Seconds to cache authenticated tokens, capped at each token's expiry (0 disables).
+# Logout and token changes drop entries from CACHES and revoke the token ids, so workers with a
+# per-process backend stop accepting them within ACCESS_TOKEN_REVOCATION_POLL_INTERVAL.
+AUTH_TOKEN_CACHE_TTL = int(os.getenv('AUTH_TOKEN_CACHE_TTL', 0))
+
+# Signed access tokens for companies with jwt_access_tokens enabled: lifetime in seconds, and how
+# often each worker polls for access tokens revoked by logout on other workers
+ACCESS_TOKEN_LIFETIME = int(os.getenv('ACCESS_TOKEN_LIFETIME', 300))
+ACCESS_TOKEN_REVOCATION_POLL_INTERVAL = float(os.getenv('ACCESS_TOKEN_REVOCATION_POLL_INTERVAL', 2))
+
+# Per-worker cache of recently rejected (company, API key) pairs, answered without a lookup
+API_KEY_NEGATIVE_CACHE_SIZE = int(os.getenv('API_KEY_NEGATIVE_CACHE_SIZE', 10000))
+API_KEY_NEGATIVE_CACHE_TTL = int(os.getenv('API_KEY_NEGATIVE_CACHE_TTL', 60))
+
+# Password hashing runs in a process pool (one process per core unless set; 0 hashes inline).
+# Calls beyond the workers plus PASSWORD_HASHER_QUEUE_SIZE waiting jobs are answered with 503.
+PASSWORD_HASHER_WORKERS = int(os.getenv('PASSWORD_HASHER_WORKERS')) if os.getenv('PASSWORD_HASHER_WORKERS') else None
+PASSWORD_HASHER_QUEUE_SIZE = int(os.getenv('PASSWORD_HASHER_QUEUE_SIZE', 32))
+# Default bcrypt cost; companies can override it with bcrypt_rounds
+PASSWORD_BCRYPT_ROUNDS = int(os.getenv('PASSWORD_BCRYPT_ROUNDS', 12))
+
+# Idle tenant database connections kept per company and worker, and seconds before an idle one is closed
+TENANT_DB_POOL_SIZE = int(os.getenv('TENANT_DB_POOL_SIZE', 4))
+TENANT_DB_POOL_MAX_IDLE = int(os.getenv('TENANT_DB_POOL_MAX_IDLE', 300))
+
+# Node-local SQLite file holding rate limit state shared by all workers (default: in the temp directory).
+# Put it on local disk; each node enforces the throttle rates on its own.
+THROTTLE_DB_PATH = os.getenv('THROTTLE_DB_PATH', '')
+
+# Adaptive concurrency limits per worker and endpoint class, used when LOAD_SHEDDING is on. A request slower than
+# the target latency (seconds) or failing with a 5xx multiplies its class's limit by the backoff, at most once per
+# window of requests; a window of fast requests grows it by one.
+LOAD_SHEDDING_TARGET_LATENCY = float(os.getenv('LOAD_SHEDDING_TARGET_LATENCY', 0.5))
+LOAD_SHEDDING_BACKOFF = float(os.getenv('LOAD_SHEDDING_BACKOFF', 0.9))
+LOAD_SHEDDING_INITIAL_LIMIT = int(os.getenv('LOAD_SHEDDING_INITIAL_LIMIT', 20))
+LOAD_SHEDDING_MIN_LIMIT = int(os.getenv('LOAD_SHEDDING_MIN_LIMIT', 2))
+LOAD_SHEDDING_MAX_LIMIT = int(os.getenv('LOAD_SHEDDING_MAX_LIMIT', 200))
+
+# Write API logs from a background thread in batches of API_LOG_BATCH_SIZE, at least every API_LOG_FLUSH_INTERVAL
+# milliseconds. At most API_LOG_QUEUE_SIZE records wait per worker; beyond that the oldest are dropped.
+API_LOG_ASYNC = os.getenv('API_LOG_ASYNC', 'False') == 'True'
+API_LOG_BATCH_SIZE = int(os.getenv('API_LOG_BATCH_SIZE', 200))
+API_LOG_FLUSH_INTERVAL = int(os.getenv('API_LOG_FLUSH_INTERVAL', 500))
+API_LOG_QUEUE_SIZE = int(os.getenv('API_LOG_QUEUE_SIZE', 10000))
+
+# Default API logging policy, overridable per company with Company.log_policy: share of 2xx responses logged
+# (errors always are), stored body size limit in bytes (0 keeps whole bodies), request headers kept (credentials
+# never are), and body size in bytes above which bodies are zlib-compressed (0 disables)
+API_LOG_SAMPLE_RATE = float(os.getenv('API_LOG_SAMPLE_RATE', 1.0))
+API_LOG_MAX_BODY_BYTES = int(os.getenv('API_LOG_MAX_BODY_BYTES', 65536))
+API_LOG_HEADERS = [header for header in os.getenv('API_LOG_HEADERS', 'Content-Type,Accept').split(',') if header]
+API_LOG_COMPRESS_OVER = int(os.getenv('API_LOG_COMPRESS_OVER', 0))
+
+# API logs older than this many days are removed by `manage.py apilog_partitions` (0 keeps all). On PostgreSQL the
+# log table is partitioned by day or month, and the command creates API_LOG_PARTITIONS_AHEAD partitions in advance.
+# Choose the interval before the first migration; changing it later leaves overlapping partition ranges.
+API_LOG_RETENTION_DAYS = int(os.getenv('API_LOG_RETENTION_DAYS', 90))
+API_LOG_PARTITION_INTERVAL = os.getenv('API_LOG_PARTITION_INTERVAL', 'month')
+API_LOG_PARTITIONS_AHEAD = int(os.getenv('API_LOG_PARTITIONS_AHEAD', 2))
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-19 10:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('verification', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='verificationcode',
+            name='delivery_error',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='verificationcode',
+            name='delivery_status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('sent', 'Sent'), ('failed', 'Failed')], default='sent', max_length=10),
+        ),
+    ]
@@ -7,12 +7,21 @@ from django.utils import timezone
 
 class VerificationCode(models.Model):
     """Model for storing verification codes"""
+    DELIVERY_STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    )
+    
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='verification_codes')
     email = models.EmailField(blank=True, null=True)
     phone = models.CharField(max_length=20, blank=True, null=True)
     code = models.CharField(max_length=10)
     is_used = models.BooleanField(default=False)
+    # Codes sent in the request are 'sent'; with async dispatch they start 'queued'
+    delivery_status = models.CharField(max_length=10, choices=DELIVERY_STATUS_CHOICES, default='sent')
+    delivery_error = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     expires_at = models.DateTimeField()
     
@@ -1,19 +1,37 @@
 
 import string
 import random
-from .models import SMSTemplate, SMSLog
+from .models import SMSConfig, SMSTemplate, SMSLog
 from .sms_service import SMSService
+from companies.cache import tenant_cache, get_company
 
 def generate_verification_code():
     """Generate a 6-digit alphanumeric verification code"""
     characters = string.ascii_uppercase + string.digits
     return ''.join(random.choice(characters) for _ in range(6))
 
+def get_sms_config(company):
+    """Get the company's SMS configuration from the tenant cache, or None if not set"""
+    def load():
+        try:
+            return SMSConfig.objects.get(company=company)
+        except SMSConfig.DoesNotExist:
+            return None
+    
+    return tenant_cache.get(company.id, 'sms_config', load)
+
 def get_sms_template_for_company(company_id, template_type):
     """Get the SMS template for a company, or use default if not found"""
-    try:
-        return SMSTemplate.objects.get(company_id=company_id, template_type=template_type)
-    except SMSTemplate.DoesNotExist:
+    def load():
+        template = SMSTemplate.objects.filter(
+            company_id=company_id, template_type=template_type
+        ).values('content').first()
+        return dict(template) if template else None
+    
+    template = tenant_cache.get(company_id, f'sms_template:{template_type}', load)
+    if template:
+        return template
+    else:
         # Return default template
         return {
             'welcome': {
@@ -40,10 +58,8 @@ def render_sms_template(template, context):
 
 def send_sms(company_id, template_type, phone_number, context):
     """Send an SMS using the company's template and SMS provider"""
-    from companies.models import Company
-    
     try:
-        company = Company.objects.get(id=company_id)
+        company = get_company(company_id)
         
         # Get SMS template
         template = get_sms_template_for_company(company_id, template_type)
@@ -52,12 +68,8 @@ def send_sms(company_id, template_type, phone_number, context):
         content = render_sms_template(template, context)
         
         # Get SMS configuration
-        try:
-            sms_config = company.sms_config
-            provider = sms_config.provider if sms_config.use_custom_sms else None
-        except:
-            sms_config = None
-            provider = None
+        sms_config = get_sms_config(company)
+        provider = sms_config.provider if sms_config and sms_config.use_custom_sms else None
         
         # Send SMS
         result = SMSService.send_sms(phone_number, content, provider)